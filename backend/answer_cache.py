@@ -0,0 +1,143 @@
+import os
+import numpy as np
+from datetime import datetime, timezone
+
+
+class AnswerCache:
+    """
+    Semantic cache for first-turn answers.
+    An entry is reused when the new query embedding is within ANSWER_CACHE_THRESHOLD cosine
+    similarity of a cached one, the answer language matches and retrieval returned exactly
+    the same chunk set. Every corpus change (upload/delete) bumps a corpus version stored
+    in Mongo, which drops all entries in every worker.
+    """
+
+    def __init__(self, collection=None, state_collection=None, threshold: float | None = None,
+                 max_entries: int | None = None) -> None:
+        self.enabled = os.getenv("ANSWER_CACHE_ENABLED", "1") != "0"
+        self.threshold = float(threshold or os.getenv("ANSWER_CACHE_THRESHOLD", 0.95))
+        self.max_entries = int(max_entries or os.getenv("ANSWER_CACHE_SIZE", 2000))
+        self.collection = collection
+        self.state_collection = state_collection
+        self._entries = []
+        self._matrix = None
+        self._corpus_version = None
+        self.hits = 0
+        self.misses = 0
+
+    def attach_collections(self, collection, state_collection) -> None:
+        self.collection = collection
+        self.state_collection = state_collection
+
+    async def _current_corpus_version(self) -> int:
+        if self.state_collection is None:
+            return 0
+        state = await self.state_collection.find_one({"_id": "corpus"})
+        return state.get("version", 0) if state else 0
+
+    async def _sync(self) -> int:
+        """Reload entries if another worker (or this one) changed the corpus"""
+        version = await self._current_corpus_version()
+        if version != self._corpus_version:
+            self._entries = []
+            self._matrix = None
+            if self.collection is not None:
+                cursor = self.collection.find({"corpus_version": version}).sort("created_at", -1).limit(self.max_entries)
+                async for doc in cursor:
+                    self._entries.append(doc)
+            self._corpus_version = version
+        return version
+
+    def _vectors(self) -> np.ndarray:
+        if self._matrix is None:
+            matrix = np.asarray([e["query_embedding"] for e in self._entries], dtype=np.float32)
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True) if len(matrix) else None
+            self._matrix = matrix / np.maximum(norms, 1e-12) if norms is not None else matrix
+        return self._matrix
+
+    async def lookup(self, query_vector: list[float], chunk_ids: list[str], language: str) -> dict | None:
+        if not self.enabled:
+            return None
+        try:
+            await self._sync()
+            if not self._entries:
+                self.misses += 1
+                return None
+
+            query = np.asarray(query_vector, dtype=np.float32)
+            query = query / max(float(np.linalg.norm(query)), 1e-12)
+            similarities = self._vectors() @ query
+
+            wanted = sorted(chunk_ids)
+            for idx in np.argsort(-similarities):
+                if similarities[idx] < self.threshold:
+                    break
+                entry = self._entries[idx]
+                if entry["language"] == language and entry["chunk_ids"] == wanted:
+                    self.hits += 1
+                    return {**entry, "similarity": float(similarities[idx])}
+
+        except Exception as e:
+            print(f"Answer cache lookup failed: {e}")
+
+        self.misses += 1
+        return None
+
+    async def store(self, query: str, query_vector: list[float], chunk_ids: list[str], language: str,
+                    answer: str, sources: list[str]) -> None:
+        if not self.enabled or not answer:
+            return
+        try:
+            version = await self._sync()
+            entry = {
+                "query": query,
+                "query_embedding": list(query_vector),
+                "chunk_ids": sorted(chunk_ids),
+                "language": language,
+                "answer": answer,
+                "sources": sources,
+                "corpus_version": version,
+                "created_at": datetime.now(timezone.utc)
+            }
+            if self.collection is not None:
+                await self.collection.insert_one(entry)
+
+            self._entries.insert(0, entry)
+            del self._entries[self.max_entries:]
+            self._matrix = None
+
+        except Exception as e:
+            print(f"Answer cache store failed: {e}")
+
+    async def invalidate(self) -> None:
+        """Call whenever the corpus changes"""
+        try:
+            if self.state_collection is not None:
+                await self.state_collection.update_one(
+                    {"_id": "corpus"},
+                    {"$inc": {"version": 1}, "$set": {"updated_at": datetime.now(timezone.utc)}},
+                    upsert=True
+                )
+            if self.collection is not None:
+                await self.collection.delete_many({})
+        except Exception as e:
+            print(f"Answer cache invalidation failed: {e}")
+        finally:
+            self._entries = []
+            self._matrix = None
+            self._corpus_version = None
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
+
+
+# Shared per-process answer cache
+answer_cache = AnswerCache()
@@ -6,17 +6,39 @@ from pydantic import BaseModel
 from fastapi import FastAPI, HTTPException, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
 from backend.prompts import Prompts
-from datetime import datetime, timezone
+from backend.query_planner import QueryPlanner
+from backend.retriever import Retriever
+from backend.reranker import MMRReranker
+from backend.vector_store import create_vector_backend
+from backend.vector_codec import encode_embedding
+from backend.chunk_writer import ChunkWriter
+from backend.bm25 import lexical_index
+from backend.context_packer import ContextPacker
+from datetime import datetime, timedelta, timezone
 import uuid
+import hashlib
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
 from typing import Dict, Optional, Union, cast, List
 import tempfile
 from backend.calculate_cost import CostProjection
 import langid
 from openai.types.chat import ChatCompletionMessageParam
 from backend.ingestor import Ingestor
+from backend.parse_cache import parse_cache
+from backend.loaders import count_pdf_pages, shutdown_pdf_pool
+from backend.llm_gateway import gateway
+from backend.call_ledger import start_ledger, use_ledger, current_ledger, ledger_stage
+from backend.metrics import metrics, MetricsMiddleware
+from backend.embedding_cache import query_embedding_cache, chunk_embedding_store, cache_key
+from backend.answer_cache import answer_cache
+from backend.ingestion_queue import ingestion_queue, JobProgress, progress_percentage
 import asyncio
-from fastapi.responses import StreamingResponse
+import json
+import weakref
+from collections import Counter
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
+from contextlib import asynccontextmanager
 
 
 
@@ -158,20 +180,10 @@ async def perform_final_verification(document_id: str) -> bool:
         
         # Use the actual embedder and search process
         embedder = Embedder()
-        embedded_query = embedder.embed([test_query])[0]
+        embedded_query = (await embedder.aembed_queries([test_query]))[0]
         
         # Perform the same type of search that the chat endpoint uses
-        results = await db.embeddings.aggregate([
-            {
-                "$vectorSearch": {
-                    "queryVector": embedded_query,
-                    "path": "embedding",
-                    "numCandidates": 100,
-                    "limit": 10,
-                    "index": "vector_index"
-                }
-            }
-        ]).to_list(length=None)
+        results = await vector_backend.search(embedded_query, limit=10, num_candidates=100)
         
         # Check if our document appears in the top results
         for result in results[:5]:  # Check top 5 results
@@ -212,20 +224,10 @@ async def verify_document_searchable(document_id: str, max_retries: int = 30, de
                 if not test_text:
                     continue
                     
-                test_embedding = embedder.embed([test_text])[0]
+                test_embedding = (await embedder.aembed_queries([test_text]))[0]
                 
                 # Try to search for this document's chunks
-                results = await db.embeddings.aggregate([
-                    {
-                        "$vectorSearch": {
-                            "queryVector": test_embedding,
-                            "path": "embedding",
-                            "numCandidates": 100,
-                            "limit": 20,
-                            "index": "vector_index"
-                        }
-                    }
-                ]).to_list(length=None)
+                results = await vector_backend.search(test_embedding, limit=20, num_candidates=100)
                 
                 # Check if any results belong to our document
                 for result in results:
@@ -260,19 +262,22 @@ async def background_index_verification(document_id: str):
     try:
         print(f"Starting background verification for document {document_id}")
         
-        # Initial delay to allow for basic indexing to start
-        await asyncio.sleep(5.0)
+        # Initial delay to allow for basic indexing to start (local backends index on write)
+        if not vector_backend.writes_are_immediate:
+            await asyncio.sleep(5.0)
         
         # Wait for index to be ready with enhanced verification
-        is_searchable = await verify_document_searchable(
-            document_id, 
-            max_retries=30,  # Up to 2.5 minutes of checking
-            delay=3.0
-        )
+        with metrics.span("upload", "verification"):
+            is_searchable = await verify_document_searchable(
+                document_id, 
+                max_retries=30,  # Up to 2.5 minutes of checking
+                delay=3.0
+            )
         
         if is_searchable:
             # Final verification: do one more comprehensive search test
             final_verification = await perform_final_verification(document_id)
+            metrics.verifications.inc(outcome="ready" if final_verification else "final_check_failed")
             
             if final_verification:
                 # Update status to ready
@@ -299,6 +304,7 @@ async def background_index_verification(document_id: str):
                 )
                 print(f"Document {document_id} failed final verification")
         else:
+            metrics.verifications.inc(outcome="not_searchable")
             # Mark as error if verification failed
             await db.documents.update_one(
                 {"document_id": document_id},
@@ -312,6 +318,7 @@ async def background_index_verification(document_id: str):
             print(f"Document {document_id} failed search verification")
             
     except Exception as e:
+        metrics.verifications.inc(outcome="error")
         # Handle verification errors
         await db.documents.update_one(
             {"document_id": document_id},
@@ -411,15 +418,6 @@ def smart_chunk_text_for_tts(text: str, max_chunk_size: int = 400) -> List[str]:
 
 dotenv.load_dotenv()
 
-# Ensure OpenAI client is configured properly
-openai.api_key = os.getenv("OPENAI_API_KEY")
-
-# Create OpenAI client with explicit configuration
-from openai import OpenAI
-openai_client = OpenAI(
-    api_key=os.getenv("OPENAI_API_KEY"),
-)
-
 MONGO_URI = os.getenv("MONGO_URI")
 
 #connecting db
@@ -429,9 +427,103 @@ collection = db["embeddings"]
 messages = db["messages"]
 conversations = db["conversations"]
 documents = db["documents"]
+vector_backend = create_vector_backend(collection)
+query_embedding_cache.attach_collection(db["embedding_cache"])
+chunk_embedding_store.attach_collection(db["chunk_embedding_store"])
+answer_cache.attach_collections(db["answer_cache"], db["corpus_state"])
+
+
+async def refresh_lexical_index():
+    """Pick up chunks written by other workers"""
+    interval = float(os.getenv("LEXICAL_REFRESH_SECONDS", 60))
+    while True:
+        await asyncio.sleep(interval)
+        if ingestion_queue.stats()["running"]:
+            continue  # our own jobs make the counts differ for a while
+        try:
+            await lexical_index.refresh_if_stale(collection)
+        except Exception as e:
+            print(f"BM25 index refresh failed: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await vector_backend.load()
+    await query_embedding_cache.ensure_indexes()
+    await chunk_embedding_store.ensure_indexes()
+    await lexical_index.load(collection)
+    refresher = asyncio.create_task(refresh_lexical_index())
+    # Workers also resume jobs left queued or stalled by a previous run
+    await ingestion_queue.start(db.documents, process_ingestion_job)
+    yield
+    refresher.cancel()
+    await ingestion_queue.stop()
+    shutdown_pdf_pool()
+    # Release pooled OpenAI connections on shutdown
+    await gateway.aclose()
+
+# Uploads are streamed to disk, so the limit is about storage and processing time, not memory
+UPLOAD_MAX_BYTES = int(float(os.getenv("UPLOAD_MAX_MB", 10)) * 1024 * 1024)
+UPLOAD_BLOCK_SIZE = int(os.getenv("UPLOAD_BLOCK_SIZE", 1024 * 1024))
+# Multipart boundaries and part headers on top of the file itself
+UPLOAD_FORM_OVERHEAD = 64 * 1024
+# Routes taking a document upload, as (method, path prefix)
+UPLOAD_ROUTES = (("POST", "/upload-document"), ("PUT", "/documents/"))
+
+def upload_too_large() -> HTTPException:
+    return HTTPException(status_code=413,
+                         detail=f"File too large. Maximum size is {UPLOAD_MAX_BYTES / (1024 * 1024):g}MB")
+
+class UploadLimitMiddleware:
+    """
+    ASGI middleware bounding upload bodies before they are parsed: Starlette spools the whole multipart
+    body to a temp file before the handler runs, so the handler's own size check would come too late.
+    A Content-Length over the limit is refused right away; otherwise the body is counted as it streams in
+    and the request fails with 413 as soon as it goes over.
+    """
+
+    def __init__(self, app, max_bytes: int) -> None:
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not any(
+                scope["method"] == method and scope["path"].startswith(prefix) for method, prefix in UPLOAD_ROUTES):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        try:
+            declared = int(headers.get(b"content-length", 0))
+        except ValueError:
+            declared = 0
+        if declared > self.max_bytes:
+            error = upload_too_large()
+            response = JSONResponse({"detail": error.detail}, status_code=error.status_code)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Raised inside the route, so FastAPI answers it like any HTTPException
+                    raise upload_too_large()
+            return message
 
+        await self.app(scope, limited_receive, send)
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+
+# In-flight requests and per-route latency for /metrics (skipped entirely when METRICS_ENABLED=0)
+if metrics.enabled:
+    app.add_middleware(MetricsMiddleware)
+
+# Refuse oversized uploads before Starlette spools them
+app.add_middleware(UploadLimitMiddleware, max_bytes=UPLOAD_MAX_BYTES + UPLOAD_FORM_OVERHEAD)
 
 # Updated CORS configuration for production
 app.add_middleware(
@@ -460,6 +552,7 @@ port = int(os.getenv("PORT", 8000))
 cost = CostProjection()
 
 USER_ID = 'user123'
+background_tasks = set()
 voice_model = "tts-1"
 text_model = "gpt-4o"
 
@@ -471,78 +564,156 @@ def read_root():
 def health_check():
     return {"status": "healthy"}
 
-@app.post("/chat/{conversation_id}")
-async def chat_with_conversation(conversation_id: str, request: MessageCreate):
+@app.get("/metrics")
+def prometheus_metrics():
+    """Prometheus text exposition of the stage timings and counters of this worker"""
+    if not metrics.enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled (METRICS_ENABLED=0)")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# One lock per conversation with a state update pending, dropped once no update holds it
+conversation_state_locks = weakref.WeakValueDictionary()
+
+def spawn_background(coro) -> asyncio.Task:
+    """Run a coroutine off the response path, keeping a reference until it finishes"""
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+def persist_llm_calls(ledger, endpoint: str, conversation_id: Optional[str] = None,
+                      user_id: Optional[str] = None, message_id: Optional[str] = None):
+    """Write a request's OpenAI call ledger to `llm_calls`, the source of GET /usage/llm-calls"""
+    if ledger is None or not ledger.calls:
+        return
+    spawn_background(db.llm_calls.insert_one({
+        "endpoint": endpoint,
+        "conversation_id": conversation_id,
+        "user_id": user_id,
+        "message_id": message_id,
+        "created_at": datetime.now(timezone.utc),
+        "calls": ledger.calls,
+    }))
+
+async def refresh_conversation_state(conversation_id: str, user_message: str, assistant_message: str, turn: int):
     """
-    Enhanced conversational RAG endpoint that:
-    1. Stores user message
-    2. Retrieves conversation history
-    3. Gets relevant documents
-    4. Generates response with context
-    5. Stores assistant response
+    Update the stored conversation_state from only the newest user/assistant pair.
+    Conversations created before incremental state existed are bootstrapped once from recent history.
+    `turn` is the message count right after this pair was stored. Updates of one conversation run one
+    at a time in this process, so each folds its pair into the state the previous one wrote.
     """
-    prompt = Prompts()
-    embedder = Embedder()
-    query = request.question
+    lock = conversation_state_locks.get(conversation_id)
+    if lock is None:
+        lock = conversation_state_locks[conversation_id] = asyncio.Lock()
+    async with lock:
+        await _fold_conversation_state(conversation_id, user_message, assistant_message, turn)
+
+async def _fold_conversation_state(conversation_id: str, user_message: str, assistant_message: str, turn: int):
+    # Runs after the turn was stored, so its calls go to a ledger of their own
+    ledger = start_ledger()
+    conversation = None
+    try:
+        prompt = Prompts()
+        conversation = await db.conversations.find_one({"conversation_id": conversation_id})
+        if not conversation:
+            return
+        
+        previous_state = conversation.get("conversation_state")
+        
+        if previous_state is None and turn > 2:
+            history_cursor = db.messages.find(
+                {"conversation_id": conversation_id}
+            ).sort("timestamp", -1).limit(10)
+            
+            history_messages = []
+            async for msg in history_cursor:
+                history_messages.append(msg)
+            history_messages.reverse()
+            
+            chat_history = []
+            for msg in history_messages:
+                role = "user" if msg["role"] == "user" else "assistant"
+                chat_history.append({"role": role, "content": [{"type": "text", "text": msg["content"]}]})
+            
+            new_state = await prompt.extract_conversation_context(chat_history=chat_history)
+            if not isinstance(new_state, str):
+                new_state = None
+        else:
+            new_state = await prompt.update_conversation_state(previous_state, user_message, assistant_message)
+        
+        if not new_state:
+            return
+        
+        # Never let an older update overwrite a newer one (e.g. from another worker process)
+        await db.conversations.update_one(
+            {
+                "conversation_id": conversation_id,
+                "$or": [
+                    {"conversation_state_turn": {"$exists": False}},
+                    {"conversation_state_turn": {"$lt": turn}}
+                ]
+            },
+            {
+                "$set": {
+                    "conversation_state": new_state,
+                    "conversation_state_turn": turn
+                }
+            }
+        )
+        
+    except Exception as e:
+        print(f"Conversation state update failed for {conversation_id}: {e}")
+    
+    finally:
+        persist_llm_calls(ledger, "conversation_state", conversation_id,
+                          (conversation or {}).get("user_id"))
+
+async def prepare_chat_turn(conversation_id: str, query: str) -> dict:
+    """
+    Shared retrieval/prompt-building step for the blocking and streaming chat endpoints.
+    Returns the prior message count, retrieved chunks and the message list for the final model call.
+    """
+    planner = QueryPlanner()
+    retriever = Retriever(vector_backend, lexical_index=lexical_index, reranker=MMRReranker())
     
     # Verify conversation exists
-    conversation = await db.conversations.find_one({"conversation_id": conversation_id})
+    with metrics.span("chat", "conversation_fetch"):
+        conversation = await db.conversations.find_one({"conversation_id": conversation_id})
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
     
-    # Step 1: Get conversation history (last x messages for context)
-    history_cursor = db.messages.find(
-        {"conversation_id": conversation_id}
-    ).sort("timestamp", -1).limit(10)
-    
-    history_messages = []
-    async for msg in history_cursor:
-        history_messages.append(msg)
+    # Step 1: Conversation context is the stored conversation_state,
+    # updated incrementally after each answer (see refresh_conversation_state)
+    message_count = conversation.get("message_count", 0)
     
-    # Reverse to get chronological order
-    history_messages.reverse()
-    
-    # Build conversation context
-    chat_history = []
-    for msg in history_messages:
-        role = "user" if msg["role"] == "user" else "assistant"
-        chat_history.append({"role": role, "content": [{"type": "text", "text": msg["content"]}]})
-    
-    conversation_context = prompt.extract_conversation_context(chat_history=chat_history)
+    # Step 2: Plan the search
+    with metrics.span("chat", "planning"):
+        plan = await planner.plan(query, conversation.get("conversation_state"))
+    conversation_context = plan["conversation_context"]
     print(f"CONTEXT-> {conversation_context}")
     
-    # Step 2: Get relevant documents 
-    multi_query = prompt.generate_multi_query(query)
-    embedded_query = embedder.embed(multi_query)[0]
-    
-    #Enhancing query
-    enhanced_prompt = prompt.generate_enhanced_query(user_query=query,chat_history=conversation_context)
-    #print(f"ENHANCED PROMPT -> {enhanced_prompt}")
-    
+    # Get relevant documents: every query variant is embedded and searched, then fused
     try:
-        results = await collection.aggregate([
-            {
-                "$vectorSearch": {
-                    "queryVector": embedded_query,
-                    "path": "embedding",
-                    "numCandidates": 50,
-                    "limit": 5,
-                    "index": "vector_index"  
-                }
-            }
-        ]).to_list(length=None)
+        results = await retriever.retrieve(plan["queries"], top_k=5)
         
     except Exception as e:
         raise HTTPException(
             status_code=503,
-            detail=f"Vector search failed. Please check if 'vector_index' exists in MongoDB Atlas. Error: {str(e)}"
+            detail=f"Vector search failed ({vector_backend.name} backend). For Atlas, check that 'vector_index' exists. Error: {str(e)}"
         )
     
-    top_chunks = [r["content"] for r in results]
-    document_context = "\n\n".join(top_chunks)
+    chunk_ids = [str(r["_id"]) for r in results]
     
     response_lang = detect_language_name(query)
     
+    # First turns over an unchanged corpus can be answered from the semantic answer cache
+    query_vector = None
+    cached_answer = None
+    if message_count == 0:
+        with metrics.span("chat", "answer_cache"):
+            query_vector = (await retriever.embedder.aembed_queries([query]))[0]  # served by the query cache
+            cached_answer = await answer_cache.lookup(query_vector, chunk_ids, response_lang)
+    
     # Step 3: Build enhanced prompt with conversation history
     system_prompt = f"""
     ROLE & SCOPE
@@ -586,81 +757,322 @@ async def chat_with_conversation(conversation_id: str, request: MessageCreate):
 
     
     
+    language_instruction = f"IMPORTANT: Respond strictly in {response_lang}. Never switch languages unless the latest user message switches."
+    
+    document_instruction = """If the ONLY document in Document Context is exactly "This is a root doc for search index":
+        Do not reply any financial questions or any message. Respond ONLY with "Please upload your files from upload panel" in the user's language and keep this behavior continuous until you see another document in Document Context.
+        If "This is a root doc for search index" document is not the only document and there are more documents along with it ignore this nstruction and focus on user query.
+        Document Context: (understand content but ignore its language when answering):\n"""
+    
+    conversation_header = "Conversation Context: use for conversation continuity pay close attention to it:\n"
+    
+    # Fit chunks and conversation context into the model's prompt-token budget
+    with metrics.span("chat", "context_packing"):
+        packed = ContextPacker(text_model, cost=cost).pack(
+            [system_prompt, language_instruction, document_instruction, conversation_header],
+            query, results, conversation_context
+        )
+    top_chunks = [r["content"] for r in packed["chunks"]]
+    document_context = "\n\n".join(top_chunks)
+    print(f"CONTEXT PACKING-> {packed['report']}")
+    
     messages: List[ChatCompletionMessageParam] = cast(List[ChatCompletionMessageParam], [
         {"role": "system", "content": system_prompt},
         
-        {"role": "system", "content": f"IMPORTANT: Respond strictly in {response_lang}. Never switch languages unless the latest user message switches."},
+        {"role": "system", "content": language_instruction},
         
-        {"role": "system", "content": f"""If the ONLY document in Document Context is exactly "This is a root doc for search index":
-        Do not reply any financial questions or any message. Respond ONLY with "Please upload your files from upload panel" in the user's language and keep this behavior continuous until you see another document in Document Context.
-        If "This is a root doc for search index" document is not the only document and there are more documents along with it ignore this nstruction and focus on user query.
-        Document Context: (understand content but ignore its language when answering):\n{document_context}"""},
+        {"role": "system", "content": document_instruction + document_context},
         
-        {"role": "system", "content": f"Conversation Context: use for conversation continuity pay close attention to it:\n{conversation_context}"},
+        {"role": "system", "content": conversation_header + packed["history"]},
         
         {"role": "user", "content": query},
     ])
+    
+    return {
+        "message_count": message_count,
+        "user_id": conversation.get("user_id"),
+        "results": packed["chunks"],
+        "top_chunks": top_chunks,
+        "chunk_ids": chunk_ids,
+        "response_lang": response_lang,
+        "query_vector": query_vector,
+        "cached_answer": cached_answer,
+        "system_prompt": system_prompt,
+        "messages": messages,
+        "planning_usage": plan["usage"],
+        "context_packing": packed["report"],
+    }
 
-    # Step 4: Generate AI response  
-    try:
-        response = openai_client.chat.completions.create(
-            model=text_model,
-            messages=messages,
-            temperature=0.3
-        )
-        answer = response.choices[0].message.content
-        
-        
-        #Step 5: Store user message
-        user_message = {
+def account_turn(turn: dict, answer: str, usage=None, from_cache: bool = False) -> dict:
+    """
+    Token/cost accounting for one chat turn: the final answer call plus the auxiliary planning calls.
+    Uses the API's reported usage when available, tiktoken counts of the real prompt otherwise.
+    """
+    if from_cache:
+        return {"prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0, "auxiliary_tokens": 0,
+                "input_cost": 0.0, "output_cost": 0.0, "source": "answer_cache", "calls": []}
+    
+    counts = cost.usage_tokens(usage)
+    source = "usage"
+    if counts is None:
+        source = "estimate"
+        counts = {
+            "prompt_tokens": cost.count_chat_tokens(turn["messages"], text_model),
+            "completion_tokens": cost.calculate_token(answer, text_model),
+            "cached_tokens": 0,
+        }
+    
+    calls = [
+        *turn["planning_usage"],
+        {"stage": "answer", "model": text_model, **counts,
+         "cost": cost.token_cost(counts["prompt_tokens"], counts["completion_tokens"], text_model, counts["cached_tokens"])}
+    ]
+    auxiliary = turn["planning_usage"]
+    
+    return {
+        **counts,
+        "auxiliary_tokens": sum(c["prompt_tokens"] + c["completion_tokens"] for c in auxiliary),
+        # Everything spent to understand the question is billed to the user message
+        "input_cost": cost.token_cost(counts["prompt_tokens"], 0, text_model, counts["cached_tokens"])
+                      + sum(c["cost"] for c in auxiliary),
+        "output_cost": cost.token_cost(0, counts["completion_tokens"], text_model),
+        "source": source,
+        "calls": calls,
+    }
+
+async def store_chat_turn(conversation_id: str, query: str, answer: str, top_chunks: List[str], accounting: dict,
+                          from_cache: bool = False, context_packing: Optional[dict] = None,
+                          user_id: Optional[str] = None) -> dict:
+    """
+    Persist the user/assistant message pair and bump the conversation metadata.
+    The user message carries the prompt side of the turn (final prompt + planning calls),
+    the assistant message the completion side. Answers served from the answer cache cost nothing.
+    Every OpenAI call made for the turn is kept on the assistant message as `llm_calls`.
+    """
+    ledger = current_ledger()
+    #Step 5: Store user message
+    user_message = {
+    "message_id": str(uuid.uuid4()),
+    "conversation_id": conversation_id,
+    "role": "user",
+    "content": query,
+    "timestamp": datetime.now(timezone.utc),
+    "token_count": accounting["prompt_tokens"] + accounting["auxiliary_tokens"],
+    "message_cost": float(format(accounting["input_cost"], ".3g"))
+    }
+
+    #print(f"User message - Token count: {user_message['token_count']}, Cost: {user_message['message_cost']}")
+    
+    await db.messages.insert_one(user_message)
+    
+    # Step 6: Store assistant response
+    assistant_message = {
         "message_id": str(uuid.uuid4()),
         "conversation_id": conversation_id,
-        "role": "user",
-        "content": query,
+        "role": "assistant",
+        "content": answer,
+        "sources": top_chunks,  # Store the source chunks
         "timestamp": datetime.now(timezone.utc),
-        "token_count": cost.calculate_token(system_prompt) ,
-        "message_cost": cost.calculate_cost(system_prompt,text_model)
-        }
+        "token_count": accounting["completion_tokens"],
+        "message_cost": accounting["output_cost"],
+        "token_usage": {
+            "source": accounting["source"],
+            "prompt_tokens": accounting["prompt_tokens"],
+            "cached_tokens": accounting["cached_tokens"],
+            "completion_tokens": accounting["completion_tokens"],
+            "auxiliary_tokens": accounting["auxiliary_tokens"],
+            "calls": accounting["calls"],
+        },
+        "context_packing": context_packing,
+        "llm_calls": ledger.calls if ledger else [],
+        "from_cache": from_cache
+    }
+    
+    #print(f"Assistant message - Token count: {assistant_message['token_count']}, Cost: {assistant_message['message_cost']}")
+    
+    await db.messages.insert_one(assistant_message)
+    persist_llm_calls(ledger, "chat", conversation_id, user_id, assistant_message["message_id"])
+    
+    # Step 7: Update conversation metadata
+    conversation = await db.conversations.find_one_and_update(
+        {"conversation_id": conversation_id},
+        {
+            "$set": {"updated_at": datetime.now(timezone.utc)},
+            "$inc": {"message_count": 2}  # User + assistant message
+        },
+        projection={"message_count": 1},
+        return_document=True
+    )
+    
+    # Fold the new turn into the conversation state once the answer is out
+    turn = (conversation or {}).get("message_count", 0)
+    spawn_background(refresh_conversation_state(conversation_id, query, answer, turn))
+    
+    return {
+        "user_message": user_message,
+        "assistant_message": assistant_message,
+    }
 
-        #print(f"User message - Token count: {user_message['token_count']}, Cost: {user_message['message_cost']}")
-        
-        await db.messages.insert_one(user_message)
-        
-        # Step 6: Store assistant response
-        assistant_message = {
-            "message_id": str(uuid.uuid4()),
-            "conversation_id": conversation_id,
-            "role": "assistant",
-            "content": answer,
-            "sources": top_chunks,  # Store the source chunks
-            "timestamp": datetime.now(timezone.utc),
-            "token_count": cost.calculate_token(answer),
-            "message_cost": cost.calculate_cost(answer, text_model)
-        }
-        
-        #print(f"Assistant message - Token count: {assistant_message['token_count']}, Cost: {assistant_message['message_cost']}")
-        
-        await db.messages.insert_one(assistant_message)
+def remember_answer(turn: dict, query: str, answer: str):
+    """Offer a fresh first-turn answer to the answer cache, off the response path"""
+    if turn["query_vector"] is not None and not turn["cached_answer"]:
+        spawn_background(answer_cache.store(
+            query, turn["query_vector"], turn["chunk_ids"], turn["response_lang"], answer, turn["top_chunks"]
+        ))
+
+def format_sse(event: str, data: dict) -> str:
+    """Encode a single Server-Sent Event frame"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+@app.post("/chat/{conversation_id}")
+async def chat_with_conversation(conversation_id: str, request: MessageCreate):
+    """
+    Enhanced conversational RAG endpoint that:
+    1. Stores user message
+    2. Retrieves conversation history
+    3. Gets relevant documents
+    4. Generates response with context
+    5. Stores assistant response
+    """
+    query = request.question
+    ledger = start_ledger()
+    turn = await prepare_chat_turn(conversation_id, query)
+    top_chunks = turn["top_chunks"]
+    from_cache = turn["cached_answer"] is not None
+
+    # Step 4: Generate AI response  
+    stored = None
+    try:
+        usage = None
+        if from_cache:
+            answer = turn["cached_answer"]["answer"]
+        else:
+            with ledger_stage("answer"), metrics.span("chat", "generation"):
+                response = await gateway.chat(
+                    model=text_model,
+                    messages=turn["messages"],
+                    temperature=0.3
+                )
+            answer = response.choices[0].message.content or ""
+            usage = response.usage
+            remember_answer(turn, query, answer)
         
-        # Step 7: Update conversation metadata
-        await db.conversations.update_one(
-            {"conversation_id": conversation_id},
-            {
-                "$set": {"updated_at": datetime.now(timezone.utc)},
-                "$inc": {"message_count": 2}  # User + assistant message
-            }
-        )
+        accounting = account_turn(turn, answer, usage, from_cache)
+        with metrics.span("chat", "store"):
+            stored = await store_chat_turn(conversation_id, query, answer, top_chunks, accounting,
+                                           from_cache=from_cache, context_packing=turn["context_packing"],
+                                           user_id=turn["user_id"])
         
         return {
             "answer": answer, 
             "chunks": top_chunks,
             "conversation_id": conversation_id,
-            "message_count": len(history_messages) + 1  # +1 for new assistant message
+            "message_count": turn["message_count"] + 1,  # +1 for new assistant message
+            "from_cache": from_cache,
+            "context_packing": turn["context_packing"]
         }
         
     except Exception as e:
+        if stored is None:
+            persist_llm_calls(ledger, "chat", conversation_id, turn["user_id"])
         raise HTTPException(status_code=500, detail=f"OpenAI Chat Error: {e}")
 
+@app.post("/chat/{conversation_id}/stream")
+async def chat_with_conversation_stream(conversation_id: str, request: MessageCreate):
+    """
+    Streaming variant of the chat endpoint (Server-Sent Events).
+    Emits a `chunks` event with the retrieved sources, one `token` event per answer delta,
+    then a `done` event with the stored message ids and cost (or an `error` event).
+    Messages are persisted once the stream has finished.
+    """
+    query = request.question
+    ledger = start_ledger()
+    turn = await prepare_chat_turn(conversation_id, query)
+    top_chunks = turn["top_chunks"]
+    from_cache = turn["cached_answer"] is not None
+    
+    stream_usage = {}
+    
+    async def generate_tokens():
+        if from_cache:
+            yield turn["cached_answer"]["answer"]
+            return
+        with ledger_stage("answer"), metrics.span("chat", "generation"):
+            async for event in gateway.chat_stream(
+                model=text_model,
+                messages=turn["messages"],
+                temperature=0.3,
+                stream_options={"include_usage": True}
+            ):
+                # With include_usage the last event carries the usage and no choices
+                if getattr(event, "usage", None) is not None:
+                    stream_usage["usage"] = event.usage
+                if not event.choices:
+                    continue
+                delta = event.choices[0].delta.content
+                if delta:
+                    yield delta
+    
+    async def event_stream():
+        # The response body is iterated after the endpoint returned, keep recording into this turn's ledger
+        use_ledger(ledger)
+        yield format_sse("chunks", {
+            "conversation_id": conversation_id,
+            "chunks": top_chunks,
+            "sources": [
+                {
+                    "document_id": r.get("document_id"),
+                    "metadata": r.get("metadata", {}),
+                }
+                for r in turn["results"]
+            ],
+        })
+        
+        answer_parts = []
+        stored = None
+        try:
+            async for delta in generate_tokens():
+                answer_parts.append(delta)
+                yield format_sse("token", {"text": delta})
+            
+            answer = "".join(answer_parts)
+            if not from_cache:
+                remember_answer(turn, query, answer)
+            accounting = account_turn(turn, answer, stream_usage.get("usage"), from_cache)
+            with metrics.span("chat", "store"):
+                stored = await store_chat_turn(conversation_id, query, answer, top_chunks, accounting,
+                                               from_cache=from_cache, context_packing=turn["context_packing"],
+                                               user_id=turn["user_id"])
+            user_message = stored["user_message"]
+            assistant_message = stored["assistant_message"]
+            
+            yield format_sse("done", {
+                "conversation_id": conversation_id,
+                "user_message_id": user_message["message_id"],
+                "assistant_message_id": assistant_message["message_id"],
+                "token_count": user_message["token_count"] + assistant_message["token_count"],
+                "message_cost": float(format(user_message["message_cost"] + assistant_message["message_cost"], ".3g")),
+                "message_count": turn["message_count"] + 1,
+                "from_cache": from_cache,
+                "context_packing": turn["context_packing"]
+            })
+            
+        except Exception as e:
+            print(f"Streaming chat error for conversation {conversation_id}: {e}")
+            if stored is None:
+                # Nothing was stored for this turn, keep its calls visible anyway
+                persist_llm_calls(ledger, "chat", conversation_id, turn["user_id"])
+            yield format_sse("error", {"detail": f"OpenAI Chat Error: {e}"})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
 @app.post("/voice/text-to-speech/chunk/{chunk_index}")
 async def text_to_speech_chunk(chunk_index: int, request: TTSRequest):
     """
@@ -702,7 +1114,11 @@ async def text_to_speech_chunk(chunk_index: int, request: TTSRequest):
         # The voice model automatically handles pronunciation based on text content
         print(f"Creating TTS with voice={request.voice}, detected_lang={detected_lang}")
         
-        response = openai.audio.speech.create(**tts_params)
+        ledger = start_ledger()
+        try:
+            response = await gateway.speech(**tts_params)
+        finally:
+            persist_llm_calls(ledger, "text_to_speech")
         
         def generate_audio():
             try:
@@ -903,7 +1319,11 @@ async def transcribe_audio(
             if language and language != 'auto':
                 whisper_params["language"] = language
             
-            transcript = openai_client.audio.transcriptions.create(**whisper_params)
+            ledger = start_ledger()
+            try:
+                transcript = await gateway.transcribe(**whisper_params)
+            finally:
+                persist_llm_calls(ledger, "transcription")
         
         # Extract information from the response
         transcribed_text = transcript.text
@@ -942,6 +1362,68 @@ async def transcribe_audio(
         if os.path.exists(temp_file_path):
             os.unlink(temp_file_path)
                       
+@app.get("/cache/stats")
+async def cache_stats():
+    """Hit/miss counters for the in-process caches"""
+    return {
+        "embedding_cache": query_embedding_cache.stats(),
+        "chunk_embedding_store": chunk_embedding_store.stats(),
+        "parse_cache": parse_cache.stats(),
+        "answer_cache": answer_cache.stats(),
+        "timestamp": datetime.now(timezone.utc)
+    }
+
+@app.get("/usage/llm-calls")
+async def llm_call_usage(group_by: str = "day", conversation_id: Optional[str] = None,
+                         user_id: Optional[str] = None, days: int = 30):
+    """
+    Aggregated OpenAI call ledger: calls, errors, tokens, cost and latency
+    per conversation, user or day, broken down by pipeline stage and model.
+    """
+    keys = {
+        "conversation": "$conversation_id",
+        "user": "$user_id",
+        "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
+    }
+    if group_by not in keys:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of {', '.join(keys)}")
+    
+    match: Dict = {"created_at": {"$gte": datetime.now(timezone.utc) - timedelta(days=days)}}
+    if conversation_id:
+        match["conversation_id"] = conversation_id
+    if user_id:
+        match["user_id"] = user_id
+    
+    pipeline = [
+        {"$match": match},
+        {"$unwind": "$calls"},
+        {"$group": {
+            "_id": {"key": keys[group_by], "stage": "$calls.stage", "model": "$calls.model"},
+            "calls": {"$sum": 1},
+            "errors": {"$sum": {"$cond": [{"$eq": ["$calls.outcome", "ok"]}, 0, 1]}},
+            "prompt_tokens": {"$sum": "$calls.prompt_tokens"},
+            "completion_tokens": {"$sum": "$calls.completion_tokens"},
+            "cached_tokens": {"$sum": "$calls.cached_tokens"},
+            "cost": {"$sum": "$calls.cost"},
+            "total_duration_ms": {"$sum": "$calls.duration_ms"},
+            "avg_duration_ms": {"$avg": "$calls.duration_ms"},
+            "max_duration_ms": {"$max": "$calls.duration_ms"},
+        }},
+        {"$sort": {"_id.key": -1, "cost": -1}},
+    ]
+    
+    groups = {}
+    async for row in db.llm_calls.aggregate(pipeline):
+        ids = row.pop("_id")
+        group = groups.setdefault(ids["key"], {group_by: ids["key"], "calls": 0, "cost": 0.0,
+                                               "total_duration_ms": 0.0, "stages": []})
+        group["calls"] += row["calls"]
+        group["cost"] += row["cost"]
+        group["total_duration_ms"] += row["total_duration_ms"]
+        group["stages"].append({"stage": ids["stage"], "model": ids["model"], **row})
+    
+    return {"group_by": group_by, "days": days, "groups": list(groups.values())}
+
 @app.get("/test-cost-calculation")
 def test_cost_calculation():
     """Test endpoint to verify cost calculation is working"""
@@ -986,122 +1468,215 @@ async def test_language_detection(request: dict):
         "timestamp": datetime.now(timezone.utc)
     }
     
-@app.post("/upload-document")
-async def upload_document(file: UploadFile = File(...)):
+def pdf_page_count(file_path: str) -> Optional[int]:
+    """Page count for progress reporting, None when the PDF cannot be opened cheaply"""
+    try:
+        return count_pdf_pages(file_path)
+    except Exception:
+        return None
+
+def describe_processing_error(processing_error: Exception) -> str:
+    """User-friendly message for a parsing failure"""
+    error_msg = str(processing_error).lower()
+    
+    if "pi_heif" in error_msg or "pillow_heif" in error_msg:
+        return "This PDF contains image formats that require additional processing libraries. Please try a text-based PDF or convert the file."
+    elif "no module named" in error_msg:
+        return f"Missing processing library for this file type. Please try a different file format."
+    elif "no text content" in error_msg:
+        return "No readable text content found in the file. Please ensure the file contains text."
+    elif "unstructured" in error_msg:
+        return "File processing failed. Please try a simpler PDF or different file format."
+    return f"Document processing error: {str(processing_error)}"
+
+async def embed_and_store_chunks(document_id: str, filename: str, documents_chunks: list, progress: JobProgress,
+                                 extra_fields: Optional[dict] = None) -> dict:
     """
-    Upload and process document with enhanced error handling for cloud deployment
+    Embed chunks batch by batch and bulk insert + index them, the write of one batch overlapping
+    the embedding of the next. `extra_fields` are added to every chunk record.
+    Returns the inserted count, per-chunk write failures and embedding stats.
     """
+    batch_size = int(os.getenv("INGESTION_BATCH_SIZE", 512))
     
-    if not file.filename:
-        raise HTTPException(status_code=400, detail="No filename provided")
-    
-    # Check extension
-    allowed_extensions = ['.pdf', '.txt', '.csv', '.html', '.htm', '.docx']
-    file_ext = os.path.splitext(file.filename)[1].lower()
-    if file_ext not in allowed_extensions:
-        raise HTTPException(status_code=400, detail=f"Unsupported file type. Allowed: {allowed_extensions}")
-    
-    # Read file content and get size
+    embedder = Embedder()
+    writer = ChunkWriter(db.embeddings)
+    chunks_inserted = 0
+    write_failures = []
+    embedding_tokens = 0
+    embedding_seconds = 0.0
+    embedding_retries = 0
+    chunks_reused = 0
+    
+    async def store_batch(batch_offset: int, batch_records: list):
+        """Bulk insert one embedded batch and index what made it in"""
+        nonlocal chunks_inserted
+        with metrics.span("upload", "insert"):
+            inserted, failures = await writer.write(batch_records)
+        if failures:
+            print(f"{len(failures)} of {len(batch_records)} chunks of {filename} failed to insert: {failures[0]['error']}")
+            write_failures.extend({**failure, "index": failure["index"] + batch_offset} for failure in failures)
+        chunks_inserted += len(inserted)
+        
+        # Local backends index on write, Atlas picks the chunks up on its own.
+        # Indexing per batch keeps only one batch of embeddings in memory.
+        with metrics.span("upload", "index_update"):
+            await vector_backend.add(inserted)
+            lexical_index.add(inserted)
+        await progress.update(chunks_inserted=chunks_inserted, chunks_failed=len(write_failures))
+    
+    # Batch N is written while batch N+1 is being embedded
+    pending_write = None
     try:
-        content = await file.read()
-        file_size = len(content)
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Failed to read file: {str(e)}")
+        for start in range(0, len(documents_chunks), batch_size):
+            batch = documents_chunks[start:start + batch_size]
+            
+            try:
+                # Chunks seen in earlier uploads come from the content-addressed store
+                with metrics.span("upload", "embedding"):
+                    embeddings = await embedder.aembed_chunks([doc.page_content for doc in batch])
+            except Exception as e:
+                raise Exception(f"Failed to create embeddings: {str(e)}")
+            chunks_reused += embedder.last_stats["reused"]
+            embedding_tokens += embedder.last_stats["tokens"]
+            embedding_seconds += embedder.last_stats["seconds"]
+            embedding_retries += embedder.last_stats["retries"]
+            await progress.update(chunks_embedded=start + len(batch), chunks_reused=chunks_reused,
+                                  embedding_tokens=embedding_tokens,
+                                  embedding_tokens_per_second=round(embedding_tokens / embedding_seconds, 1) if embedding_seconds else None)
+            
+            batch_records = [
+                {
+                    "document_id": document_id,
+                    "user_id": USER_ID,
+                    "content": doc_chunk.page_content,
+                    # Atlas Vector Search only indexes inline vectors, so the shared vector is copied;
+                    # the hash links the chunk to its entry in the chunk embedding store
+                    "content_hash": cache_key(doc_chunk.page_content, embedder.model_name),
+                    **encode_embedding(embedding),
+                    "metadata": doc_chunk.metadata,
+                    **(extra_fields or {})
+                }
+                for doc_chunk, embedding in zip(batch, embeddings)
+            ]
+            if pending_write is not None:
+                await pending_write
+            pending_write = asyncio.create_task(store_batch(start, batch_records))
+        
+        if pending_write is not None:
+            await pending_write
+    except BaseException:
+        if pending_write is not None and not pending_write.done():
+            pending_write.cancel()
+        raise
     
-    if file_size == 0:
-        raise HTTPException(status_code=400, detail="Empty file")
+    if chunks_inserted == 0:
+        raise Exception(f"Failed to save chunks to database: {write_failures[0]['error'] if write_failures else 'nothing inserted'}")
+    
+    embedding_stats = {
+        "chunks": chunks_inserted,
+        "reused": chunks_reused,
+        "tokens": embedding_tokens,
+        "retries": embedding_retries,
+        "seconds": round(embedding_seconds, 3),
+        "tokens_per_second": round(embedding_tokens / embedding_seconds, 1) if embedding_seconds else None,
+        "chunks_per_second": round((len(documents_chunks) - chunks_reused) / embedding_seconds, 1) if embedding_seconds else None
+    }
+    print(f"Embedded {filename}: {embedding_stats['tokens_per_second']} tokens/s, "
+          f"{embedding_stats['chunks_per_second']} chunks/s, {embedding_retries} retries, {chunks_reused} chunks reused")
     
-    # File size limit (10MB)
-    MAX_FILE_SIZE = 10 * 1024 * 1024
-    if file_size > MAX_FILE_SIZE:
-        raise HTTPException(status_code=413, detail="File too large. Maximum size is 10MB")
+    return {"inserted": chunks_inserted, "failures": write_failures, "embedding_stats": embedding_stats}
+
+async def parse_ingestion_file(job: dict, progress: JobProgress) -> list:
+    """Parse the spooled file into non-empty chunks, reporting pages parsed as it goes"""
+    file_path = job["spool_path"]
     
-    # Create document record
-    document_id = str(uuid.uuid4())
-    document_record = {
-        "document_id": document_id,
-        "filename": file.filename,
-        "file_size": file_size,
-        "status": "processing",
-        "uploaded_at": datetime.now(timezone.utc),
-        "user_id": USER_ID
-    }
+    pages_total = None
+    if file_path.lower().endswith(".pdf"):
+        pages_total = await asyncio.to_thread(pdf_page_count, file_path)
+    await progress.update("parsing", pages_total=pages_total, pages_parsed=0)
+    
+    # Parsing is CPU bound, keep it off the event loop; long PDFs are split across the page pool
+    loop = asyncio.get_running_loop()
+    def report_pages(pages_parsed: int):
+        asyncio.run_coroutine_threadsafe(progress.update(pages_parsed=pages_parsed), loop)
     
+    ingestor = Ingestor("/tmp")
     try:
-        await db.documents.insert_one(document_record)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+        with metrics.span("upload", "parse"):
+            # Re-uploads of the same bytes are served from the parse cache
+            documents_chunks = await asyncio.to_thread(ingestor.ingest_single_file, file_path, report_pages,
+                                                       job.get("replacement_sha256", job.get("sha256")))
+    except Exception as processing_error:
+        raise Exception(describe_processing_error(processing_error))
+    
+    documents_chunks = [doc for doc in documents_chunks if doc.page_content.strip()]
+    if not documents_chunks:
+        raise Exception("No readable content found in the file")
+    
+    await progress.update(pages_parsed=pages_total, parse_cache_hit=ingestor.last_cache_hit)
+    return documents_chunks
+
+async def diff_document_chunks(document_id: str, documents_chunks: list, model: str) -> tuple[list, list, list]:
+    """
+    Chunk-level diff of a new document version against its stored chunks by content hash.
+    Hashes are compared as multisets, so repeated chunks are matched one to one.
+    Returns (new chunks to embed and insert, _ids of stored chunks the new version no longer has,
+    (stored chunk, new chunk) pairs kept as they are).
+    """
+    wanted = Counter(cache_key(doc.page_content, model) for doc in documents_chunks)
+    kept = {}
+    removed_ids = []
+    async for stored in db.embeddings.find({"document_id": document_id},
+                                           {"content_hash": 1, "content": 1, "metadata": 1}):
+        # Chunks stored before content hashing was introduced are hashed on the fly
+        content_hash = stored.get("content_hash") or cache_key(stored.get("content", ""), model)
+        matches = kept.setdefault(content_hash, [])
+        if len(matches) < wanted[content_hash]:
+            matches.append(stored)
+        else:
+            removed_ids.append(stored["_id"])
+    
+    added, unchanged = [], []
+    for doc in documents_chunks:
+        matches = kept.get(cache_key(doc.page_content, model))
+        if matches:
+            unchanged.append((matches.pop(0), doc))
+        else:
+            added.append(doc)
+    return added, removed_ids, unchanged
+
+async def process_ingestion_job(job: dict):
+    """
+    Ingestion worker handler: parse the spooled file, embed and insert its chunks batch by batch,
+    update the search indexes and hand over to index verification.
+    Real progress (pages parsed, chunks embedded/inserted) is written to the document record.
+    """
+    if job.get("mode") == "replace":
+        return await process_replacement_job(job)
+    
+    document_id = job["document_id"]
+    file_path = job["spool_path"]
+    filename = job["filename"]
+    progress = JobProgress(db.documents, document_id)
     
-    # Use temporary file with proper cleanup
-    temp_file_path = None
     try:
-        # Create temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=file_ext) as temp_file:
-            temp_file.write(content)
-            temp_file_path = temp_file.name
+        # A retried job starts from scratch, also in the local indexes the failed attempt fed
+        await db.embeddings.delete_many({"document_id": document_id})
+        await vector_backend.remove(document_id=document_id)
+        lexical_index.remove(document_id=document_id)
         
-        print(f"Processing file: {file.filename} ({file_size} bytes)")
+        documents_chunks = await parse_ingestion_file(job, progress)
         
-        # Process the file
-        ingestor = Ingestor("/tmp")
-        try:
-            documents_chunks = ingestor.ingest_single_file(temp_file_path)
-        except Exception as processing_error:
-            error_msg = str(processing_error).lower()
-            
-            # Provide user-friendly error messages
-            if "pi_heif" in error_msg or "pillow_heif" in error_msg:
-                user_error = "This PDF contains image formats that require additional processing libraries. Please try a text-based PDF or convert the file."
-            elif "no module named" in error_msg:
-                user_error = f"Missing processing library for this file type. Please try a different file format."
-            elif "no text content" in error_msg:
-                user_error = "No readable text content found in the file. Please ensure the file contains text."
-            elif "unstructured" in error_msg:
-                user_error = "File processing failed. Please try a simpler PDF or different file format."
-            else:
-                user_error = f"Document processing error: {str(processing_error)}"
-            
-            raise Exception(user_error)
+        print(f"Extracted {len(documents_chunks)} chunks from {filename}")
+        await progress.update("embedding", chunks_total=len(documents_chunks), chunks_embedded=0, chunks_inserted=0)
         
-        if not documents_chunks:
-            raise Exception("No readable content found in the file")
+        result = await embed_and_store_chunks(document_id, filename, documents_chunks, progress)
+        chunks_inserted = result["inserted"]
+        write_failures = result["failures"]
         
-        print(f"Extracted {len(documents_chunks)} chunks from {file.filename}")
-        
-        # Create embeddings
-        try:
-            embedder = Embedder()
-            texts = [doc.page_content for doc in documents_chunks]
-            
-            if not texts or not any(text.strip() for text in texts):
-                raise Exception("No text content found in extracted chunks")
-            
-            embeddings = embedder.embed(texts)
-            
-        except Exception as e:
-            raise Exception(f"Failed to create embeddings: {str(e)}")
-        
-        # Save chunks to database
-        chunks_inserted = 0
-        try:
-            for doc_chunk, embedding in zip(documents_chunks, embeddings):
-                if not doc_chunk.page_content.strip():
-                    continue  # Skip empty chunks
-                    
-                chunk_record = {
-                    "document_id": document_id,
-                    "content": doc_chunk.page_content,
-                    "embedding": embedding,
-                    "metadata": doc_chunk.metadata
-                }
-                await db.embeddings.insert_one(chunk_record)
-                chunks_inserted += 1
-                
-        except Exception as e:
-            raise Exception(f"Failed to save chunks to database: {str(e)}")
-        
-        if chunks_inserted == 0:
-            raise Exception("No valid content chunks were created")
+        # Cached answers were grounded on the previous corpus
+        await progress.update("indexing")
+        await answer_cache.invalidate()
         
         # Update document status
         await db.documents.update_one(
@@ -1109,50 +1684,312 @@ async def upload_document(file: UploadFile = File(...)):
             {
                 "$set": {
                     "status": "processing_index",
+                    "stage": "verifying",
                     "chunks_count": chunks_inserted,
+                    "chunks_failed": len(write_failures),
+                    "write_errors": write_failures[:5],
+                    "embedding_stats": result["embedding_stats"],
                     "processed_at": datetime.now(timezone.utc)
                 }
             }
         )
         
-        print(f"Successfully processed {file.filename}: {chunks_inserted} chunks created")
+        print(f"Successfully processed {filename}: {chunks_inserted} chunks created")
         
         # Start background verification
-        asyncio.create_task(background_index_verification(document_id))
-        
-        return {
-            "success": True,
-            "document_id": document_id,
-            "filename": file.filename,
-            "chunks_created": chunks_inserted,
-            "status": "processing_index"
-        }
-        
-    except HTTPException:
-        # Re-raise HTTP exceptions as-is
-        raise
+        spawn_background(background_index_verification(document_id))
         
     except Exception as e:
-        print(f"Upload error for {file.filename}: {str(e)}")
+        print(f"Ingestion error for {filename}: {str(e)}")
         
         # Update document status to error
         try:
             await db.documents.update_one(
                 {"document_id": document_id},
-                {"$set": {"status": "error", "error_message": str(e)}}
+                {"$set": {"status": "error", "stage": "failed", "error_message": str(e)}}
             )
         except:
             pass  # Don't let database update errors mask the original error
         
-        raise HTTPException(status_code=500, detail=f"Document processing failed: {str(e)}")
+    finally:
+        # The spooled upload is only needed until the job is done
+        if os.path.exists(file_path):
+            try:
+                os.unlink(file_path)
+            except Exception as cleanup_error:
+                print(f"Warning: Failed to clean up spooled file: {cleanup_error}")
+
+async def process_replacement_job(job: dict):
+    """
+    Replace a document with a new version: re-chunk it, diff the chunks by content hash against
+    the stored ones, embed and insert only the new chunks, then delete only the removed ones.
+    The old version stays searchable until the swap; a failed replacement leaves it untouched.
+    Re-running the job after a crash is safe, the diff picks up where it stopped.
+    """
+    document_id = job["document_id"]
+    file_path = job["spool_path"]
+    filename = job["replacement_filename"]
+    progress = JobProgress(db.documents, document_id)
+    
+    try:
+        documents_chunks = await parse_ingestion_file(job, progress)
+        added, removed_ids, unchanged = await diff_document_chunks(document_id, documents_chunks,
+                                                                   Embedder().model_name)
+        
+        print(f"Replacing {job['filename']} with {filename}: {len(added)} new chunks, "
+              f"{len(removed_ids)} removed, {len(documents_chunks) - len(added)} unchanged")
+        await progress.update("embedding", chunks_total=len(added), chunks_embedded=0, chunks_inserted=0,
+                              chunks_unchanged=len(documents_chunks) - len(added), chunks_removed=len(removed_ids))
+        
+        result = {"inserted": 0, "failures": [], "embedding_stats": None}
+        if added:
+            # Tag the new chunks so a failed replacement can take them out again
+            result = await embed_and_store_chunks(document_id, filename, added, progress,
+                                                  extra_fields={"job_id": job["job_id"]})
+            if result["failures"]:
+                # Swapping now would lose content, keep the old version complete
+                raise Exception(f"{len(result['failures'])} new chunks failed to insert: {result['failures'][0]['error']}")
+        
+        # Swap: the new chunks are in, drop the ones the new version no longer has
+        await progress.update("swapping")
+        if removed_ids:
+            with metrics.span("upload", "index_update"):
+                await db.embeddings.delete_many({"_id": {"$in": removed_ids}})
+                await vector_backend.remove(chunk_ids=removed_ids)
+                lexical_index.remove(chunk_ids=removed_ids)
+        
+        # Unchanged chunks keep their vectors but take the new version's metadata (filename, pages)
+        stale = {stored["_id"]: doc.metadata for stored, doc in unchanged if stored.get("metadata") != doc.metadata}
+        if stale:
+            with metrics.span("upload", "index_update"):
+                await db.embeddings.bulk_write(
+                    [UpdateOne({"_id": chunk_id}, {"$set": {"metadata": metadata}}) for chunk_id, metadata in stale.items()],
+                    ordered=False
+                )
+                metadata_by_id = {str(chunk_id): metadata for chunk_id, metadata in stale.items()}
+                await vector_backend.update_metadata(metadata_by_id)
+                lexical_index.update_metadata(metadata_by_id)
+        
+        # Cached answers were grounded on the previous version
+        if added or removed_ids:
+            await answer_cache.invalidate()
+        
+        chunks_count = await db.embeddings.count_documents({"document_id": document_id})
+        await db.documents.update_one(
+            {"document_id": document_id},
+            {
+                "$set": {
+                    # Unchanged chunks are already searchable, only new ones need verification
+                    "status": "processing_index" if added else "ready",
+                    "stage": "verifying" if added else "done",
+                    "filename": filename,
+                    # The new version's file fields only land once it replaced the old one
+                    "file_size": job.get("replacement_file_size"),
+                    "sha256": job.get("replacement_sha256"),
+                    "chunks_count": chunks_count,
+                    "chunks_failed": 0,
+                    "last_replacement": {
+                        "chunks_added": result["inserted"],
+                        "chunks_removed": len(removed_ids),
+                        "chunks_unchanged": len(documents_chunks) - len(added),
+                        "replaced_at": datetime.now(timezone.utc)
+                    },
+                    "embedding_stats": result["embedding_stats"],
+                    "processed_at": datetime.now(timezone.utc)
+                },
+                "$unset": {"replacement_filename": "", "replacement_file_size": "", "replacement_sha256": "",
+                           "previous_status": "", "mode": "", "error_message": ""}
+            }
+        )
+        
+        print(f"Successfully replaced {filename}: {chunks_count} chunks")
+        
+        if added:
+            spawn_background(background_index_verification(document_id))
+        
+    except Exception as e:
+        print(f"Replacement error for {filename}: {str(e)}")
+        
+        # The previous version is still complete and searchable: drop the half-inserted new chunks
+        # and restore its status
+        try:
+            partial = await db.embeddings.find({"document_id": document_id, "job_id": job["job_id"]},
+                                               {"_id": 1}).to_list(length=None)
+            if partial:
+                partial_ids = [chunk["_id"] for chunk in partial]
+                await db.embeddings.delete_many({"_id": {"$in": partial_ids}})
+                await vector_backend.remove(chunk_ids=partial_ids)
+                lexical_index.remove(chunk_ids=partial_ids)
+            await db.documents.update_one(
+                {"document_id": document_id},
+                {
+                    "$set": {"status": job.get("previous_status", "ready"), "stage": "replace_failed",
+                             "error_message": f"Replacement failed: {str(e)}"},
+                    "$unset": {"replacement_filename": "", "replacement_file_size": "", "replacement_sha256": "",
+                               "previous_status": "", "mode": ""}
+                }
+            )
+        except:
+            pass  # Don't let database update errors mask the original error
         
     finally:
-        # Always clean up temp file
-        if temp_file_path and os.path.exists(temp_file_path):
+        # The spooled upload is only needed until the job is done
+        if os.path.exists(file_path):
             try:
-                os.unlink(temp_file_path)
+                os.unlink(file_path)
             except Exception as cleanup_error:
-                print(f"Warning: Failed to clean up temp file: {cleanup_error}")
+                print(f"Warning: Failed to clean up spooled file: {cleanup_error}")
+
+async def spool_upload(file: UploadFile, spool_path: str) -> tuple[int, str]:
+    """
+    Stream the upload to its spool file block by block, hashing and size-checking as it goes,
+    so memory per upload stays at one block regardless of the file size. Returns (size, sha256 hex).
+    The request body itself is bounded earlier by UploadLimitMiddleware; this check covers the file part.
+    """
+    file_size = 0
+    digest = hashlib.sha256()
+    try:
+        with open(spool_path, "wb") as spool_file:
+            while True:
+                try:
+                    block = await file.read(UPLOAD_BLOCK_SIZE)
+                except Exception as e:
+                    raise HTTPException(status_code=400, detail=f"Failed to read file: {str(e)}")
+                if not block:
+                    break
+                
+                file_size += len(block)
+                if file_size > UPLOAD_MAX_BYTES:
+                    raise upload_too_large()
+                digest.update(block)
+                await asyncio.to_thread(spool_file.write, block)
+    except HTTPException:
+        os.unlink(spool_path)
+        raise
+    except Exception as e:
+        os.unlink(spool_path)
+        raise HTTPException(status_code=500, detail=f"Failed to store upload: {str(e)}")
+    
+    if file_size == 0:
+        os.unlink(spool_path)
+        raise HTTPException(status_code=400, detail="Empty file")
+    
+    return file_size, digest.hexdigest()
+
+@app.post("/upload-document")
+async def upload_document(file: UploadFile = File(...)):
+    """
+    Accept a document for ingestion: the file is spooled to disk and a background job
+    parses, embeds and indexes it. Returns immediately; poll /documents/{document_id}/status for progress.
+    """
+    
+    if not file.filename:
+        raise HTTPException(status_code=400, detail="No filename provided")
+    
+    # Check extension
+    allowed_extensions = ['.pdf', '.txt', '.csv', '.html', '.htm', '.docx']
+    file_ext = os.path.splitext(file.filename)[1].lower()
+    if file_ext not in allowed_extensions:
+        raise HTTPException(status_code=400, detail=f"Unsupported file type. Allowed: {allowed_extensions}")
+    
+    document_id = str(uuid.uuid4())
+    job_id = str(uuid.uuid4())
+    spool_path = ingestion_queue.spool_path(job_id, file_ext)
+    
+    # Persist the upload before acknowledging it, so the job survives a restart
+    file_size, sha256 = await spool_upload(file, spool_path)
+    
+    # Create document record, it doubles as the job record
+    document_record = {
+        "document_id": document_id,
+        "filename": file.filename,
+        "file_size": file_size,
+        "sha256": sha256,
+        "status": "processing",
+        "uploaded_at": datetime.now(timezone.utc),
+        "user_id": USER_ID,
+        "job_id": job_id,
+        "stage": "queued",
+        "spool_path": spool_path,
+        "attempts": 0,
+        "progress": {}
+    }
+    
+    try:
+        await db.documents.insert_one(document_record)
+    except Exception as e:
+        os.unlink(spool_path)
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    
+    await ingestion_queue.submit(document_record)
+    print(f"Queued {file.filename} ({file_size} bytes) as job {job_id}")
+    
+    return {
+        "success": True,
+        "document_id": document_id,
+        "job_id": job_id,
+        "filename": file.filename,
+        "status": "processing",
+        "stage": "queued"
+    }
+
+@app.put("/documents/{document_id}")
+async def replace_document(document_id: str, file: UploadFile = File(...)):
+    """
+    Replace a document with a new version. Only chunks whose content changed are embedded and
+    inserted, chunks the new version no longer has are deleted after that; the old version stays
+    searchable meanwhile. Returns immediately; poll /documents/{document_id}/status for progress.
+    """
+    if not file.filename:
+        raise HTTPException(status_code=400, detail="No filename provided")
+    
+    allowed_extensions = ['.pdf', '.txt', '.csv', '.html', '.htm', '.docx']
+    file_ext = os.path.splitext(file.filename)[1].lower()
+    if file_ext not in allowed_extensions:
+        raise HTTPException(status_code=400, detail=f"Unsupported file type. Allowed: {allowed_extensions}")
+    
+    document = await db.documents.find_one({"document_id": document_id})
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    job_id = str(uuid.uuid4())
+    spool_path = ingestion_queue.spool_path(job_id, file_ext)
+    file_size, sha256 = await spool_upload(file, spool_path)
+    
+    # Claim the document atomically, a document still being ingested cannot be replaced
+    job = await db.documents.find_one_and_update(
+        {"document_id": document_id, "status": {"$nin": ["processing", "processing_index"]}},
+        {"$set": {
+            "status": "processing",
+            "stage": "queued",
+            "mode": "replace",
+            "previous_status": document["status"],
+            "replacement_filename": file.filename,
+            "replacement_file_size": file_size,
+            "replacement_sha256": sha256,
+            "job_id": job_id,
+            "spool_path": spool_path,
+            "attempts": 0,
+            "progress": {},
+            "replace_requested_at": datetime.now(timezone.utc)
+        }},
+        return_document=True
+    )
+    if job is None:
+        os.unlink(spool_path)
+        raise HTTPException(status_code=409, detail="Document is still being processed, try again when it is ready")
+    
+    await ingestion_queue.submit(job)
+    print(f"Queued replacement of {document['filename']} with {file.filename} as job {job_id}")
+    
+    return {
+        "success": True,
+        "document_id": document_id,
+        "job_id": job_id,
+        "filename": file.filename,
+        "status": "processing",
+        "stage": "queued"
+    }
 
 @app.get("/documents")
 async def get_documents(user_id: str = USER_ID, skip: int = 0, limit: int = 50):
@@ -1185,51 +2022,56 @@ async def get_document_status(document_id: str):
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    # Calculate progress percentage based on status
-    progress_percentage = 0
-    if document["status"] == "processing":
-        progress_percentage = 30
-    elif document["status"] == "processing_index":
-        progress_percentage = 70
-    elif document["status"] == "ready":
-        progress_percentage = 100
-    elif document["status"] == "error":
-        progress_percentage = 0
+    progress = document.get("progress") or {}
     
     return {
         "document_id": document_id,
+        "job_id": document.get("job_id"),
         "status": document["status"],
+        "stage": document.get("stage"),
         "filename": document["filename"],
         "uploaded_at": document["uploaded_at"],
         "processed_at": document.get("processed_at"),
         "chunks_count": document.get("chunks_count"),
-        "current_chunks": document.get("chunks_count", 0),  # For this simple case
+        "current_chunks": document.get("chunks_count") or progress.get("chunks_inserted", 0),
+        "progress": progress,
         "error_message": document.get("error_message"),
-        "progress_percentage": progress_percentage
+        "chunks_failed": document.get("chunks_failed", 0),
+        "embedding_stats": document.get("embedding_stats"),
+        "progress_percentage": progress_percentage(document)
     }
 
 @app.delete("/documents/{document_id}")
 async def delete_document(document_id: str):
     """
-    Delete a document and all its associated chunks
+    Delete a document and all its associated chunks.
+    A document whose ingestion job is still queued or running cannot be deleted (409): the worker
+    would keep inserting chunks for a document that no longer exists.
     """
     # Use transaction to ensure both document and embeddings are deleted
     async with await client.start_session() as session:
         async with session.start_transaction():
-            # Delete all embeddings for this document
-            embeddings_result = await db.embeddings.delete_many(
-                {"document_id": document_id},
-                session=session
-            )
-            
-            # Delete the document record
+            # Delete the document record, unless a job still owns it
             doc_result = await db.documents.delete_one(
-                {"document_id": document_id},
+                {"document_id": document_id, "status": {"$nin": ["queued", "processing", "processing_index"]}},
                 session=session
             )
             
             if doc_result.deleted_count == 0:
+                if await db.documents.find_one({"document_id": document_id}, {"_id": 1}, session=session):
+                    raise HTTPException(status_code=409,
+                                        detail="Document is still being processed, try again when it is ready")
                 raise HTTPException(status_code=404, detail="Document not found")
+            
+            # Delete all embeddings for this document
+            embeddings_result = await db.embeddings.delete_many(
+                {"document_id": document_id},
+                session=session
+            )
+    
+    await vector_backend.remove(document_id=document_id)
+    lexical_index.remove(document_id=document_id)
+    await answer_cache.invalidate()
     
     return {
         "success": True,
@@ -1248,6 +2090,9 @@ async def api_health():
         return {
             "status": "healthy",
             "database": "connected",
+            "vector_backend": vector_backend.stats(),
+            "lexical_index": lexical_index.stats(),
+            "ingestion_queue": ingestion_queue.stats(),
             "timestamp": datetime.now(timezone.utc)
         }
     except Exception as e:
@@ -0,0 +1,170 @@
+import os
+import re
+import math
+from collections import Counter
+
+# Words plus code-like tokens such as "KDV-2023/15" or "madde.12"
+_TOKEN_PATTERN = re.compile(r"\w+(?:[-/.]\w+)*", re.UNICODE)
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Lowercase and split into terms. Every I variant (I, İ, ı) folds to "i", so English words with a
+    capital I and Turkish words typed with or without dots match the same term.
+    Compound codes are indexed whole and as their parts, so "KDV-2023/15" matches "kdv" too.
+    """
+    # "İ".lower() would leave a combining dot behind, fold it before lowercasing
+    text = (text or "").replace("İ", "i").replace("I", "i").lower().replace("ı", "i")
+    tokens = []
+    for match in _TOKEN_PATTERN.findall(text):
+        tokens.append(match)
+        if any(sep in match for sep in "-/."):
+            tokens.extend(part for part in re.split(r"[-/.]", match) if part)
+    return tokens
+
+
+class BM25Index:
+    """
+    In-process inverted index with Okapi BM25 scoring over chunk `content`.
+    Maintained incrementally: add() on upload, remove() on delete (postings are dropped eagerly).
+    load() builds a new index off to the side and swaps it in at once, so searches never see a half-built index.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75) -> None:
+        self.enabled = os.getenv("HYBRID_SEARCH", "1") != "0"
+        self.k1 = k1
+        self.b = b
+        self._postings = {}        # term -> {slot: term frequency}
+        self._doc_terms = {}       # slot -> Counter of terms
+        self._doc_lengths = {}     # slot -> token count
+        self._payloads = {}        # slot -> chunk payload
+        self._slots_by_id = {}     # str(_id) -> slot
+        self._next_slot = 0
+        self._total_length = 0
+        # Changes made while load() is rebuilding, replayed onto the new index before the swap
+        self._pending_changes = None
+
+    def __len__(self) -> int:
+        return len(self._payloads)
+
+    async def load(self, collection) -> None:
+        if not self.enabled or self._pending_changes is not None:
+            return
+        fresh = BM25Index(self.k1, self.b)
+        fresh.enabled = self.enabled
+        self._pending_changes = []
+        try:
+            batch = []
+            async for doc in collection.find({}, {"content": 1, "metadata": 1, "document_id": 1, "user_id": 1}):
+                batch.append(doc)
+                if len(batch) >= 1000:
+                    fresh.add(batch)
+                    batch = []
+            fresh.add(batch)
+            # The cursor may have missed chunks added or removed while it ran; replaying is idempotent
+            for method, args in self._pending_changes:
+                getattr(fresh, method)(**args)
+        finally:
+            self._pending_changes = None
+        # No await between the replay and here, so no change can slip in between
+        self.__dict__.update(fresh.__dict__)
+        print(f"BM25 index built over {len(self)} chunks")
+
+    async def refresh_if_stale(self, collection) -> None:
+        """
+        Rebuild when another worker changed the collection behind our back. Callers skip this while
+        their own ingestion is in flight: chunks are in Mongo before they reach add(), so counts differ then.
+        """
+        if self.enabled and await collection.count_documents({}) != len(self):
+            await self.load(collection)
+
+    def clear(self) -> None:
+        self.__init__(self.k1, self.b)
+
+    def add(self, records: list[dict]) -> None:
+        if not self.enabled:
+            return
+        if self._pending_changes is not None:
+            self._pending_changes.append(("add", {"records": records}))
+        for record in records:
+            chunk_id = str(record.get("_id"))
+            if chunk_id in self._slots_by_id:
+                continue
+            terms = Counter(tokenize(record.get("content", "")))
+            slot = self._next_slot
+            self._next_slot += 1
+
+            self._slots_by_id[chunk_id] = slot
+            self._doc_terms[slot] = terms
+            length = sum(terms.values())
+            self._doc_lengths[slot] = length
+            self._total_length += length
+            self._payloads[slot] = {
+                "_id": record.get("_id"),
+                "document_id": record.get("document_id"),
+                "user_id": record.get("user_id"),
+                "content": record.get("content"),
+                "metadata": record.get("metadata", {}),
+            }
+            for term, frequency in terms.items():
+                self._postings.setdefault(term, {})[slot] = frequency
+
+    def remove(self, document_id: str | None = None, chunk_ids: list | None = None) -> None:
+        if self._pending_changes is not None:
+            self._pending_changes.append(("remove", {"document_id": document_id, "chunk_ids": chunk_ids}))
+        wanted = {str(cid) for cid in chunk_ids or []}
+        slots = [
+            slot for slot, payload in self._payloads.items()
+            if (document_id is not None and payload["document_id"] == document_id)
+            or str(payload["_id"]) in wanted
+        ]
+        for slot in slots:
+            for term in self._doc_terms.pop(slot):
+                postings = self._postings[term]
+                postings.pop(slot, None)
+                if not postings:
+                    del self._postings[term]
+            self._total_length -= self._doc_lengths.pop(slot)
+            payload = self._payloads.pop(slot)
+            self._slots_by_id.pop(str(payload["_id"]), None)
+
+    def update_metadata(self, metadata_by_id: dict) -> None:
+        """Replace the payload metadata of indexed chunks, `metadata_by_id` maps str(_id) to the new metadata"""
+        if self._pending_changes is not None:
+            self._pending_changes.append(("update_metadata", {"metadata_by_id": metadata_by_id}))
+        for chunk_id, metadata in metadata_by_id.items():
+            slot = self._slots_by_id.get(chunk_id)
+            if slot is not None:
+                self._payloads[slot] = {**self._payloads[slot], "metadata": metadata}
+
+    def search(self, query: str, limit: int = 10, filters: dict | None = None) -> list[dict]:
+        if not self.enabled or not self._payloads:
+            return []
+
+        n_docs = len(self._payloads)
+        average_length = self._total_length / n_docs
+        scores = {}
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for slot, frequency in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[slot] / average_length)
+                scores[slot] = scores.get(slot, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+        if filters:
+            scores = {
+                slot: score for slot, score in scores.items()
+                if all(self._payloads[slot].get(field) == value for field, value in filters.items())
+            }
+
+        top = sorted(scores, key=scores.get, reverse=True)[:limit]
+        return [{**self._payloads[slot], "bm25_score": scores[slot]} for slot in top]
+
+    def stats(self) -> dict:
+        return {"enabled": self.enabled, "chunks": len(self), "terms": len(self._postings)}
+
+
+# Shared per-process lexical index
+lexical_index = BM25Index()
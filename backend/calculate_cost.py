@@ -1,34 +1,137 @@
+from functools import lru_cache
+import tiktoken
+
+# USD per 1M tokens: (input, cached input, output)
+PRICES = {
+    "gpt-5": (1.25, 0.125, 10.00),
+    "gpt-5-mini": (0.25, 0.025, 2.00),
+    "gpt-5-nano": (0.05, 0.005, 0.40),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "text-embedding-3-small": (0.02, 0.02, 0.0),
+}
+
+# Chat format overhead per message / per reply (OpenAI cookbook values for gpt-4o family)
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str):
+    """
+    Encoders are expensive to build, keep one per model for the process lifetime.
+    Returns None when the encoding files cannot be loaded (offline host), callers then estimate.
+    """
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            # Newer models (gpt-5 family) share the gpt-4o tokenizer
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        print(f"tiktoken encoding for {model} unavailable ({e}), falling back to estimates")
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough fallback: ~4 UTF-8 bytes per token holds better for Turkish than 4 characters"""
+    return int(round(len(text.encode("utf-8")) / 4)) if text else 0
+
+
+@lru_cache(maxsize=4096)
+def _cached_count(encoding_name: str, text: str) -> int:
+    return len(tiktoken.get_encoding(encoding_name).encode(text, disallowed_special=()))
+
+
 class CostProjection:
-    def __init__(self):
-        pass
+    def __init__(self, default_model: str = "gpt-4o"):
+        self.default_model = default_model
 
-    def calculate_token(self, query):
+    def calculate_token(self, query, model=None):
+        """Real token count of a text for the model's tokenizer"""
         if not query:
             return 0
-        
-        char_count = len(query)
-        token_count = char_count / 4
-        
-        return int(round(token_count))  # Ensure integer result
-    
-    def calculate_cost(self, query, model):
-        prices = {
-            "gpt-5": 1.25/1000000,
-            "gpt-5-mini": 0.25/1000000,
-            "gpt-5-nano": 0.05/1000000,
-            "gpt-4o": 5.00/1000000,
-            "gpt-4o-mini": 0.60/1000000
+        encoding = get_encoding(model or self.default_model)
+        if encoding is None:
+            return estimate_tokens(query)
+        # Repeated texts (system prompts, cached answers) are counted once
+        if len(query) <= 20000:
+            return _cached_count(encoding.name, query)
+        return len(encoding.encode(query, disallowed_special=()))
+
+    def count_tokens_batch(self, texts, model=None) -> list[int]:
+        """Count many texts at once, tiktoken encodes the batch on a thread pool"""
+        texts = [t or "" for t in texts]
+        encoding = get_encoding(model or self.default_model)
+        if encoding is None:
+            return [estimate_tokens(t) for t in texts]
+        return [len(tokens) for tokens in encoding.encode_batch(texts, disallowed_special=())]
+
+    def truncate_to_tokens(self, text, max_tokens, model=None) -> str:
+        """Cut a text down to at most max_tokens tokens"""
+        if not text or max_tokens <= 0:
+            return ""
+        encoding = get_encoding(model or self.default_model)
+        if encoding is None:
+            # Walk back from the byte estimate until it fits
+            cut = text[:max_tokens * 4]
+            while cut and estimate_tokens(cut) > max_tokens:
+                cut = cut[:-max(1, len(cut) // 20)]
+            return cut
+        tokens = encoding.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        return encoding.decode(tokens[:max_tokens])
+
+    def count_chat_tokens(self, messages, model=None) -> int:
+        """Prompt tokens of a chat completion request, including per-message overhead"""
+        contents = []
+        for message in messages:
+            content = message.get("content") or ""
+            if isinstance(content, list):
+                content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+            contents.append(content)
+            contents.append(message.get("role", ""))
+        return sum(self.count_tokens_batch(contents, model)) + TOKENS_PER_MESSAGE * len(messages) + TOKENS_PER_REPLY
+
+    def usage_tokens(self, usage) -> dict | None:
+        """Normalize an OpenAI `usage` object (chat or embeddings) into plain counts"""
+        if usage is None:
+            return None
+        details = getattr(usage, "prompt_tokens_details", None)
+        return {
+            "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+            "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+            "cached_tokens": (getattr(details, "cached_tokens", 0) or 0) if details else 0,
         }
-        
-        if model not in prices:
+
+    def token_cost(self, prompt_tokens, completion_tokens, model, cached_tokens=0) -> float:
+        if model not in PRICES:
             return 0.0
-            
-        # Use self instead of creating new instance
-        token_count = self.calculate_token(query)
-        cost = token_count * prices[model]
+        input_price, cached_price, output_price = PRICES[model]
+        cost = ((prompt_tokens - cached_tokens) * input_price
+                + cached_tokens * cached_price
+                + completion_tokens * output_price) / 1_000_000
         return float(format(cost, ".3g"))
 
+    def calculate_cost(self, query, model, output=False):
+        """Cost of a text billed as input (default) or as output tokens"""
+        if model not in PRICES:
+            return 0.0
+        token_count = self.calculate_token(query, model)
+        if output:
+            return self.token_cost(0, token_count, model)
+        return self.token_cost(token_count, 0, model)
+
+    def cost_from_usage(self, usage, model) -> float:
+        """Prefer the API's reported usage over estimates whenever it is available"""
+        counts = self.usage_tokens(usage)
+        if counts is None:
+            return 0.0
+        return self.token_cost(counts["prompt_tokens"], counts["completion_tokens"], model, counts["cached_tokens"])
+
 if __name__ == "__main__":
     a = CostProjection()
     print(a.calculate_token("what is the taxation process in leasing applications"))
-    print(a.calculate_cost("what is the taxation process in leasing applications", "gpt-4o"))
\ No newline at end of file
+    print(a.calculate_cost("what is the taxation process in leasing applications", "gpt-4o"))
+    print(a.calculate_token("leasing uygulamalarında vergilendirme süreci nedir"))
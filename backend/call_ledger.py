@@ -0,0 +1,81 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta, timezone
+from backend.calculate_cost import CostProjection
+
+# Ledger of the request being served and the pipeline stage currently calling OpenAI.
+# Context variables follow the request into awaited coroutines and into tasks it spawns.
+_current_ledger = ContextVar("llm_call_ledger", default=None)
+_current_stage = ContextVar("llm_call_stage", default=None)
+
+_cost = CostProjection()
+
+
+class CallLedger:
+    """
+    Record of every OpenAI call made while serving one request:
+    stage, operation, model, prompt/completion/cached tokens, cost, duration and outcome.
+    Filled by the gateway, persisted by the endpoint next to the message it produced.
+    """
+
+    def __init__(self) -> None:
+        self.calls = []
+
+    def record(self, operation: str, model: str, duration: float, usage=None,
+               outcome: str = "ok", error: str | None = None, **extra) -> dict:
+        counts = _cost.usage_tokens(usage) or {"prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0}
+        entry = {
+            "stage": _current_stage.get() or operation,
+            "operation": operation,
+            "model": model,
+            **counts,
+            "cost": _cost.token_cost(counts["prompt_tokens"], counts["completion_tokens"], model, counts["cached_tokens"]),
+            "duration_ms": round(duration * 1000, 1),
+            "outcome": outcome,
+            "started_at": datetime.now(timezone.utc) - timedelta(seconds=duration),
+            **extra,
+        }
+        if error:
+            entry["error"] = error
+        self.calls.append(entry)
+        return entry
+
+    def summary(self) -> dict:
+        """Totals per stage, the view used to find where latency and budget go"""
+        stages = {}
+        for call in self.calls:
+            totals = stages.setdefault(call["stage"], {
+                "calls": 0, "errors": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                "cached_tokens": 0, "cost": 0.0, "duration_ms": 0.0,
+            })
+            totals["calls"] += 1
+            totals["errors"] += call["outcome"] != "ok"
+            for field in ("prompt_tokens", "completion_tokens", "cached_tokens", "cost", "duration_ms"):
+                totals[field] += call[field]
+        return stages
+
+
+def start_ledger() -> CallLedger:
+    """Open a fresh ledger for the current request"""
+    ledger = CallLedger()
+    _current_ledger.set(ledger)
+    return ledger
+
+
+def use_ledger(ledger: CallLedger | None) -> None:
+    """Re-attach a request's ledger, e.g. inside a response stream iterated by another task"""
+    _current_ledger.set(ledger)
+
+
+def current_ledger() -> CallLedger | None:
+    return _current_ledger.get()
+
+
+@contextmanager
+def ledger_stage(stage: str):
+    """Label the OpenAI calls made inside the block (planning, answer, ...)"""
+    token = _current_stage.set(stage)
+    try:
+        yield
+    finally:
+        _current_stage.reset(token)
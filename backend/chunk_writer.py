@@ -0,0 +1,102 @@
+import os
+import bson
+from pymongo.errors import BulkWriteError
+
+
+class ChunkWriter:
+    """
+    Bulk writer for chunk records: records are grouped into size-bounded `insert_many(ordered=False)`
+    batches instead of one round trip per chunk. A failed document does not stop the rest of its batch;
+    every write returns which records made it in and which failed, so chunk counts stay accurate.
+
+    Configuration (environment):
+    - CHUNK_WRITE_BATCH: records per insert_many (default 500)
+    - CHUNK_WRITE_MAX_BYTES: BSON bytes per insert_many (default 8 MiB, well below the 48 MB message limit)
+    """
+
+    def __init__(self, collection, max_docs=None, max_bytes=None) -> None:
+        self.collection = collection
+        self.max_docs = int(max_docs or os.getenv("CHUNK_WRITE_BATCH", 500))
+        self.max_bytes = int(max_bytes or os.getenv("CHUNK_WRITE_MAX_BYTES", 8 * 1024 * 1024))
+
+    def split(self, records: list[dict]) -> list[list[dict]]:
+        batches, batch, batch_bytes = [], [], 0
+        for record in records:
+            size = len(bson.encode(record))
+            if batch and (len(batch) >= self.max_docs or batch_bytes + size > self.max_bytes):
+                batches.append(batch)
+                batch, batch_bytes = [], 0
+            batch.append(record)
+            batch_bytes += size
+        if batch:
+            batches.append(batch)
+        return batches
+
+    @staticmethod
+    def _failed(batch: list[dict], error: Exception, existing: set | None = None) -> tuple[list[dict], list[dict]]:
+        """
+        Split a batch into (inserted, failures) after insert_many raised. For errors other than
+        BulkWriteError, `existing` holds the _ids found in the collection afterwards.
+        """
+        if isinstance(error, BulkWriteError):
+            failed = {err["index"]: err for err in error.details.get("writeErrors", [])}
+            inserted = [record for i, record in enumerate(batch) if i not in failed]
+            return inserted, [{"index": i, "code": err.get("code"), "error": err.get("errmsg")}
+                              for i, err in failed.items()]
+        # Network or server error: part of the batch may have been applied before the connection dropped
+        existing = existing or set()
+        inserted = [record for record in batch if record.get("_id") in existing]
+        return inserted, [{"index": i, "code": None, "error": str(error)}
+                          for i, record in enumerate(batch) if record.get("_id") not in existing]
+
+    @staticmethod
+    def _lookup(batch: list[dict]) -> dict:
+        # insert_many assigns the _ids before sending, so they are known even when the call failed
+        return {"_id": {"$in": [record["_id"] for record in batch if "_id" in record]}}
+
+    async def _existing_ids(self, batch: list[dict], error: Exception) -> set:
+        if isinstance(error, BulkWriteError):
+            return set()
+        try:
+            found = await self.collection.find(self._lookup(batch), {"_id": 1}).to_list(length=None)
+        except Exception as e:
+            print(f"Could not check which chunks were written ({e}), reporting the batch as failed")
+            return set()
+        return {doc["_id"] for doc in found}
+
+    def _existing_ids_sync(self, batch: list[dict], error: Exception) -> set:
+        if isinstance(error, BulkWriteError):
+            return set()
+        try:
+            return {doc["_id"] for doc in self.collection.find(self._lookup(batch), {"_id": 1})}
+        except Exception as e:
+            print(f"Could not check which chunks were written ({e}), reporting the batch as failed")
+            return set()
+
+    async def write(self, records: list[dict]) -> tuple[list[dict], list[dict]]:
+        """Insert `records`, returns (inserted records, failures as {index, code, error})"""
+        inserted, failures, offset = [], [], 0
+        for batch in self.split(records):
+            try:
+                await self.collection.insert_many(batch, ordered=False)
+                inserted.extend(batch)
+            except Exception as e:
+                ok, failed = self._failed(batch, e, await self._existing_ids(batch, e))
+                inserted.extend(ok)
+                failures.extend({**failure, "index": failure["index"] + offset} for failure in failed)
+            offset += len(batch)
+        return inserted, failures
+
+    def write_sync(self, records: list[dict]) -> tuple[list[dict], list[dict]]:
+        """Same as write() for a synchronous pymongo collection (scripts)"""
+        inserted, failures, offset = [], [], 0
+        for batch in self.split(records):
+            try:
+                self.collection.insert_many(batch, ordered=False)
+                inserted.extend(batch)
+            except Exception as e:
+                ok, failed = self._failed(batch, e, self._existing_ids_sync(batch, e))
+                inserted.extend(ok)
+                failures.extend({**failure, "index": failure["index"] + offset} for failure in failed)
+            offset += len(batch)
+        return inserted, failures
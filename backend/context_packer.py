@@ -0,0 +1,82 @@
+import os
+from backend.calculate_cost import CostProjection
+
+# Prompt-token budgets per model (well under the context window, sized for predictable latency)
+DEFAULT_BUDGETS = {
+    "gpt-4o": 6000,
+    "gpt-4o-mini": 6000,
+    "gpt-5": 8000,
+    "gpt-5-mini": 8000,
+    "gpt-5-nano": 8000,
+}
+
+
+class ContextPacker:
+    """
+    Fills the final prompt within a token budget, in priority order:
+    1. system instructions and 2. the question (always kept),
+    3. retrieved chunks in rank order (the last one that does not fit is truncated, the rest dropped),
+    4. conversation history/state with whatever is left.
+    Budget: PROMPT_TOKEN_BUDGET, or the per-model default.
+    """
+
+    def __init__(self, model: str, budget: int | None = None, min_chunk_tokens: int = 64,
+                 cost: CostProjection | None = None) -> None:
+        self.model = model
+        self.budget = int(budget or os.getenv("PROMPT_TOKEN_BUDGET", 0) or DEFAULT_BUDGETS.get(model, 6000))
+        self.min_chunk_tokens = min_chunk_tokens
+        self.cost = cost or CostProjection(default_model=model)
+
+    def pack(self, fixed_texts: list[str], question: str, chunks: list[dict], history: str) -> dict:
+        """
+        `fixed_texts` are the system instructions (including the empty context wrappers),
+        `chunks` are ranked retrieval results with a `content` field.
+        Returns the kept chunks (possibly one truncated), the fitted history and a token report.
+        """
+        fixed_tokens = sum(self.cost.count_tokens_batch(fixed_texts, self.model))
+        question_tokens = self.cost.calculate_token(question, self.model)
+        remaining = self.budget - fixed_tokens - question_tokens
+
+        chunk_tokens = self.cost.count_tokens_batch([c["content"] for c in chunks], self.model)
+        separator_tokens = 1  # the blank line joining chunks
+        kept = []
+        packed_chunk_tokens = 0
+        truncated = 0
+        for chunk, tokens in zip(chunks, chunk_tokens):
+            needed = tokens + separator_tokens
+            if needed <= remaining:
+                kept.append(chunk)
+                remaining -= needed
+                packed_chunk_tokens += needed
+                continue
+            if remaining - separator_tokens >= self.min_chunk_tokens:
+                content = self.cost.truncate_to_tokens(chunk["content"], remaining - separator_tokens, self.model)
+                kept.append({**chunk, "content": content, "truncated": True})
+                packed_chunk_tokens += remaining
+                remaining = 0
+                truncated = 1
+            break
+
+        history = history or ""
+        history_tokens = self.cost.calculate_token(history, self.model)
+        if history_tokens > remaining:
+            history = self.cost.truncate_to_tokens(history, max(remaining, 0), self.model)
+            history_tokens = self.cost.calculate_token(history, self.model)
+
+        return {
+            "chunks": kept,
+            "history": history,
+            "report": {
+                "model": self.model,
+                "budget": self.budget,
+                "system_tokens": fixed_tokens,
+                "question_tokens": question_tokens,
+                "chunk_tokens": packed_chunk_tokens,
+                "history_tokens": history_tokens,
+                "total_tokens": fixed_tokens + question_tokens + packed_chunk_tokens + history_tokens,
+                "chunks_retrieved": len(chunks),
+                "chunks_packed": len(kept),
+                "chunks_truncated": truncated,
+                "chunks_dropped": len(chunks) - len(kept),
+            }
+        }
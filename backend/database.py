@@ -2,6 +2,8 @@ from pymongo.mongo_client import MongoClient
 from pymongo.operations import SearchIndexModel
 from backend.loaders import Loader
 from backend.embedder import Embedder
+from backend.vector_codec import encode_embedding
+from backend.chunk_writer import ChunkWriter
 import os
 import dotenv
 
@@ -22,14 +24,16 @@ texts = [doc.page_content for doc in docs]
 embedder = Embedder()
 embeddings = embedder.embed(texts)
 
-for doc, emb in zip(docs, embeddings):
-    record = {
+records = [
+    {
         "content": doc.page_content,
-        "embedding": emb, 
+        **encode_embedding(emb),
         "metadata": doc.metadata  
     }
-    collection.insert_one(record)
+    for doc, emb in zip(docs, embeddings)
+]
+inserted, failures = ChunkWriter(collection).write_sync(records)
 
-print("Insertion Completed")
+print(f"Insertion Completed: {len(inserted)} chunks inserted, {len(failures)} failed")
     
 
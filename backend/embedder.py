@@ -1,17 +1,62 @@
 import os
-from langchain_openai import OpenAIEmbeddings
+import asyncio
+from backend.embedding_executor import EmbeddingExecutor
+from backend.embedding_cache import EmbeddingCache, query_embedding_cache, chunk_embedding_store
 
 class Embedder:
-    def __init__(self):
+    def __init__(self, cache: EmbeddingCache | None = None, chunk_store: EmbeddingCache | None = None):
         # Get API key from environment (Docker will provide this)
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
             raise ValueError("OPENAI_API_KEY environment variable not set")
             
-        self.model = OpenAIEmbeddings(
-            model="text-embedding-3-small"
-        )     
+        self.model_name = "text-embedding-3-small"
+        self.cache = cache or query_embedding_cache
+        self.chunk_store = chunk_store or chunk_embedding_store
+        self.executor = EmbeddingExecutor(self.model_name)
+        # Throughput of the last aembed call (tokens/s, chunks/s, batches, retries)
+        self.last_stats = None
       
     def embed(self, chunks):
-        embeddings = self.model.embed_documents(chunks)
-        return embeddings
\ No newline at end of file
+        """Blocking variant for scripts"""
+        return asyncio.run(self.aembed(chunks))
+    
+    async def aembed(self, chunks):
+        """Token-batched, parallel embedding used inside the API request path, keeps input order"""
+        embeddings, self.last_stats = await self.executor.run(list(chunks))
+        return embeddings
+    
+    async def _aembed_through(self, store: EmbeddingCache, texts):
+        """Look texts up in `store`, embed each distinct miss once and store it; returns (vectors, hits)"""
+        texts = list(texts)
+        vectors = await store.get_many(texts, self.model_name)
+        
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            # Embed each distinct missing text once
+            unique = list(dict.fromkeys(texts[i] for i in missing))
+            fresh = await self.aembed(unique)
+            await store.put_many(unique, self.model_name, fresh)
+            by_text = dict(zip(unique, fresh))
+            for i in missing:
+                vectors[i] = by_text[texts[i]]
+        
+        return vectors, len(texts) - len(missing)
+    
+    async def aembed_queries(self, queries):
+        """Embed search queries through the query embedding cache, only misses hit the API"""
+        vectors, _ = await self._aembed_through(self.cache, queries)
+        return vectors
+    
+    async def aembed_chunks(self, chunks):
+        """
+        Embed document chunks through the content-addressed chunk store: chunks already embedded
+        by an earlier upload (or repeated in this one) are reused, only unseen texts hit the API.
+        """
+        self.last_stats = None
+        vectors, reused = await self._aembed_through(self.chunk_store, chunks)
+        if self.last_stats is None:
+            # Every chunk came from the store
+            self.last_stats = {"chunks": 0, "tokens": 0, "batches": 0, "retries": 0, "seconds": 0.0}
+        self.last_stats["reused"] = reused
+        return vectors
@@ -0,0 +1,145 @@
+import os
+import hashlib
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pymongo.errors import BulkWriteError
+from backend.vector_codec import decode_record, encode_embedding
+
+
+def normalize_text(text: str) -> str:
+    """Unicode-normalize and collapse whitespace so trivially different inputs share a key"""
+    text = unicodedata.normalize("NFC", text or "")
+    return " ".join(text.split())
+
+
+def cache_key(text: str, model: str) -> str:
+    return hashlib.sha256(f"{model}\x00{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Two-tier cache for embeddings keyed by normalized text + model name
+    (used for search queries and, as a content-addressed store, for document chunks).
+    - Tier 1: bounded in-process LRU (EMBEDDING_CACHE_SIZE entries, default 5000)
+    - Tier 2: optional Mongo collection shared across workers and restarts
+      (enabled by attach_collection, or EMBEDDING_CACHE_MONGO=0 to disable).
+      Entries expire through a TTL index `ttl_days` after `ttl_field` (0 keeps them forever);
+      with `touch_on_hit` every lookup refreshes `last_used_at`, so only unused entries expire.
+    """
+
+    def __init__(self, max_entries: int | None = None, collection=None, ttl_days: float | None = None,
+                 touch_on_hit: bool = False) -> None:
+        self.max_entries = int(max_entries or os.getenv("EMBEDDING_CACHE_SIZE", 5000))
+        self.collection = collection
+        self.ttl_days = float(ttl_days if ttl_days is not None else os.getenv("EMBEDDING_CACHE_TTL_DAYS", 30))
+        self.touch_on_hit = touch_on_hit
+        self.ttl_field = "last_used_at" if touch_on_hit else "created_at"
+        self._entries = OrderedDict()
+        self.memory_hits = 0
+        self.mongo_hits = 0
+        self.misses = 0
+
+    def attach_collection(self, collection) -> None:
+        if os.getenv("EMBEDDING_CACHE_MONGO", "1") != "0":
+            self.collection = collection
+
+    async def ensure_indexes(self) -> None:
+        """Create the TTL index of the Mongo tier; call once at startup"""
+        if self.collection is None or self.ttl_days <= 0:
+            return
+        try:
+            await self.collection.create_index(self.ttl_field, expireAfterSeconds=int(self.ttl_days * 86400))
+        except Exception as e:
+            # e.g. the index exists with another expiry: drop it to apply the new one
+            print(f"Embedding cache TTL index on {self.collection.name} not created: {e}")
+
+    def _remember(self, key: str, vector: list[float]) -> None:
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_many(self, texts: list[str], model: str) -> list[list[float] | None]:
+        """Look up every text, returns None for misses (same order as texts)"""
+        keys = [cache_key(text, model) for text in texts]
+        found = {}
+        missing = []
+        for key in keys:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                found[key] = self._entries[key]
+            elif key not in missing:
+                missing.append(key)
+
+        self.memory_hits += sum(1 for key in keys if key in found)
+
+        if missing and self.collection is not None:
+            try:
+                async for doc in self.collection.find({"_id": {"$in": missing}}, {"embedding": 1, "embedding_format": 1}):
+                    vector = decode_record(doc).tolist()
+                    found[doc["_id"]] = vector
+                    self._remember(doc["_id"], vector)
+                    self.mongo_hits += 1
+            except Exception as e:
+                print(f"Embedding cache lookup failed, continuing without Mongo tier: {e}")
+
+        if self.touch_on_hit and found and self.collection is not None:
+            try:
+                await self.collection.update_many({"_id": {"$in": list(found)}},
+                                                  {"$set": {"last_used_at": datetime.now(timezone.utc)}})
+            except Exception as e:
+                print(f"Embedding cache touch failed: {e}")
+
+        results = [found.get(key) for key in keys]
+        self.misses += sum(1 for r in results if r is None)
+        return results
+
+    async def put_many(self, texts: list[str], model: str, vectors: list[list[float]]) -> None:
+        docs = []
+        now = datetime.now(timezone.utc)
+        for text, vector in zip(texts, vectors):
+            key = cache_key(text, model)
+            self._remember(key, vector)
+            docs.append({
+                "_id": key,
+                "model": model,
+                **encode_embedding(vector, "float32"),
+                "created_at": now,
+                "last_used_at": now
+            })
+
+        if docs and self.collection is not None:
+            try:
+                await self.collection.insert_many(docs, ordered=False)
+            except BulkWriteError as e:
+                # Duplicate keys from concurrent workers are expected and harmless
+                errors = e.details.get("writeErrors", [])
+                if any(err.get("code") != 11000 for err in errors):
+                    print(f"Embedding cache write failed: {errors[:1]}")
+            except Exception as e:
+                print(f"Embedding cache write failed: {e}")
+
+    def stats(self) -> dict:
+        hits = self.memory_hits + self.mongo_hits
+        total = hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "memory_hits": self.memory_hits,
+            "mongo_hits": self.mongo_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+            "mongo_enabled": self.collection is not None,
+            "ttl_days": self.ttl_days
+        }
+
+
+# Shared per-process cache for query embeddings
+query_embedding_cache = EmbeddingCache()
+
+# Content-addressed store of document chunk embeddings, so re-uploaded text is not embedded again.
+# The Mongo tier is the store, the memory tier only absorbs repeats within a batch of uploads.
+# Entries nobody looked up for CHUNK_STORE_TTL_DAYS expire; that only costs a re-embedding if the text comes back.
+chunk_embedding_store = EmbeddingCache(max_entries=int(os.getenv("CHUNK_STORE_MEMORY_ENTRIES", 1000)),
+                                       ttl_days=float(os.getenv("CHUNK_STORE_TTL_DAYS", 180)), touch_on_hit=True)
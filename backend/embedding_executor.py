@@ -0,0 +1,129 @@
+import os
+import time
+import random
+import asyncio
+import openai
+from backend.llm_gateway import gateway
+from backend.metrics import metrics
+from backend.calculate_cost import CostProjection
+
+# Errors worth waiting out; anything else (bad input, auth) fails the batch right away
+_RETRYABLE = (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError)
+
+cost = CostProjection()
+
+
+def _retry_after(error: Exception) -> float | None:
+    """Server-suggested wait from a 429 response, when present"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class EmbeddingExecutor:
+    """
+    Embeds large text lists through the gateway: texts are packed into batches by real token count,
+    batches run in parallel under a limit, throttled or failed batches are retried with exponential
+    backoff, and results come back in input order together with throughput figures.
+
+    Configuration (environment):
+    - EMBED_BATCH_TOKENS: token budget per request (default 16000)
+    - EMBED_BATCH_MAX_INPUTS: texts per request (default 2048, the API limit)
+    - EMBED_MAX_INPUT_TOKENS: longer texts are truncated (default 8191, the model limit)
+    - EMBED_CONCURRENCY: batches in flight per call (default 4)
+    - EMBED_MAX_RETRIES: retries per batch on 429/timeouts/5xx (default 5)
+    - EMBED_BACKOFF_SECONDS / EMBED_BACKOFF_MAX_SECONDS: backoff base and cap (default 1 / 30)
+    """
+
+    def __init__(self, model: str = "text-embedding-3-small", batch_tokens=None, max_inputs=None,
+                 concurrency=None, max_retries=None) -> None:
+        self.model = model
+        self.batch_tokens = int(batch_tokens or os.getenv("EMBED_BATCH_TOKENS", 16000))
+        self.max_inputs = int(max_inputs or os.getenv("EMBED_BATCH_MAX_INPUTS", 2048))
+        self.max_input_tokens = int(os.getenv("EMBED_MAX_INPUT_TOKENS", 8191))
+        self.concurrency = int(concurrency or os.getenv("EMBED_CONCURRENCY", 4))
+        self.max_retries = int(max_retries if max_retries is not None else os.getenv("EMBED_MAX_RETRIES", 5))
+        self.backoff = float(os.getenv("EMBED_BACKOFF_SECONDS", 1))
+        self.backoff_max = float(os.getenv("EMBED_BACKOFF_MAX_SECONDS", 30))
+
+    def plan_batches(self, texts: list[str]) -> tuple[list[str], list[tuple[int, int]], int]:
+        """
+        Token-count every text and pack consecutive texts into [start, end) batches.
+        Returns the (possibly truncated) texts, the batches and the total token count.
+        """
+        counts = cost.count_tokens_batch(texts, self.model)
+        texts = list(texts)
+        for i, count in enumerate(counts):
+            if count > self.max_input_tokens:
+                texts[i] = cost.truncate_to_tokens(texts[i], self.max_input_tokens, self.model)
+                counts[i] = self.max_input_tokens
+
+        batches = []
+        start, batch_tokens = 0, 0
+        for i, count in enumerate(counts):
+            if i > start and (batch_tokens + count > self.batch_tokens or i - start >= self.max_inputs):
+                batches.append((start, i))
+                start, batch_tokens = i, 0
+            batch_tokens += count
+        if start < len(texts):
+            batches.append((start, len(texts)))
+        return texts, batches, sum(counts)
+
+    async def _embed_batch(self, texts: list[str]) -> tuple[list[list[float]], int]:
+        """Embed one batch, returns the vectors and the number of retries it needed"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                # This loop is the only retry layer, the client's own retries would multiply with it
+                return await gateway.embed(texts, model=self.model, max_retries=0), attempt
+            except _RETRYABLE as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = _retry_after(e) or min(self.backoff_max, self.backoff * 2 ** attempt)
+                delay *= random.uniform(0.8, 1.2)
+                # Counted here and summed into the job's embedding stats, no per-batch output
+                metrics.openai_retries.inc(operation="embedding", error=type(e).__name__)
+                await asyncio.sleep(delay)
+
+    async def run(self, texts: list[str]) -> tuple[list[list[float]], dict]:
+        """Embed `texts` keeping their order; returns (vectors, throughput stats)"""
+        started = time.perf_counter()
+        texts = list(texts)
+        if len(texts) > 64:
+            # Tokenizing a whole document takes a while, keep it off the event loop
+            texts, batches, total_tokens = await asyncio.to_thread(self.plan_batches, texts)
+        else:
+            texts, batches, total_tokens = self.plan_batches(texts)
+        vectors = [None] * len(texts)
+        retries = 0
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run_batch(start: int, end: int):
+            nonlocal retries
+            async with semaphore:
+                batch_vectors, batch_retries = await self._embed_batch(texts[start:end])
+            vectors[start:end] = batch_vectors
+            retries += batch_retries
+
+        tasks = [asyncio.ensure_future(run_batch(start, end)) for start, end in batches]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # One batch gave up, the others would only burn quota
+            for task in tasks:
+                task.cancel()
+            raise
+
+        seconds = time.perf_counter() - started
+        stats = {
+            "chunks": len(texts),
+            "tokens": total_tokens,
+            "batches": len(batches),
+            "retries": retries,
+            "seconds": round(seconds, 3),
+            "tokens_per_second": round(total_tokens / seconds, 1) if seconds else 0.0,
+            "chunks_per_second": round(len(texts) / seconds, 1) if seconds else 0.0,
+        }
+        return vectors, stats
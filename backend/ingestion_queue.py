@@ -0,0 +1,219 @@
+import os
+import uuid
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+# Share of the progress bar given to each stage (verification takes the rest up to 100)
+_STAGE_WEIGHTS = (("parsing", 0, 20), ("embedding", 20, 90))
+# Stages without counters of their own
+_STAGE_PERCENT = {"indexing": 90, "swapping": 90}
+_VERIFYING_PERCENT = 90
+
+
+def progress_percentage(document: dict) -> int:
+    """Progress derived from the counters written by the ingestion worker"""
+    status = document.get("status")
+    if status == "ready":
+        return 100
+    if status == "processing_index":
+        return _VERIFYING_PERCENT
+    if status != "processing":
+        return 0
+
+    progress = document.get("progress") or {}
+    stage = document.get("stage")
+    for name, start, end in _STAGE_WEIGHTS:
+        if stage != name:
+            continue
+        if name == "parsing":
+            done, total = progress.get("pages_parsed") or 0, progress.get("pages_total") or 0
+        else:
+            # embedding and inserting advance together batch by batch
+            total = progress.get("chunks_total") or 0
+            done = ((progress.get("chunks_embedded") or 0) + (progress.get("chunks_inserted") or 0)) / 2
+        return int(start + (end - start) * (done / total if total else 0))
+    if stage in _STAGE_PERCENT:
+        return _STAGE_PERCENT[stage]
+    # Any other stage (a retry starting over, ...) keeps the bar where it was
+    return int(progress.get("percent") or 0)
+
+
+class JobProgress:
+    """Writes a job's stage and counters to its `documents` record; every write doubles as a heartbeat"""
+
+    def __init__(self, documents, document_id: str) -> None:
+        self.documents = documents
+        self.document_id = document_id
+        # Local mirror of the record, to store the percentage stages without counters fall back to
+        self._stage = None
+        self._progress = {}
+
+    async def update(self, stage: str | None = None, **counters) -> None:
+        fields = {"heartbeat_at": datetime.now(timezone.utc)}
+        if stage:
+            fields["stage"] = self._stage = stage
+        self._progress.update(counters)
+        for name, value in counters.items():
+            fields[f"progress.{name}"] = value
+        percent = progress_percentage({"status": "processing", "stage": self._stage, "progress": self._progress})
+        if percent != self._progress.get("percent"):
+            fields["progress.percent"] = self._progress["percent"] = percent
+        try:
+            await self.documents.update_one({"document_id": self.document_id}, {"$set": fields})
+        except Exception as e:
+            print(f"Progress update failed for document {self.document_id}: {e}")
+
+
+class IngestionQueue:
+    """
+    Background ingestion: uploads are spooled to disk and answered with a job id right away,
+    a fixed pool of worker tasks runs the (parse, embed, insert, index) handler with bounded concurrency.
+    Jobs live in the `documents` collection, so a restarted or second worker picks up queued jobs
+    and jobs whose heartbeat went stale (claims are atomic, each job is processed once at a time).
+
+    Configuration (environment):
+    - INGESTION_WORKERS: concurrent ingestion jobs per API process (default 2)
+    - INGESTION_SPOOL_DIR: where uploaded files wait for processing (default ./data/uploads)
+    - INGESTION_STALE_SECONDS: heartbeat age after which a running job is considered lost (default 600)
+    - INGESTION_MAX_ATTEMPTS: attempts before a job is marked as failed (default 3)
+    - INGESTION_RECOVER_SECONDS: how often queued/stale jobs of any process are looked for (default 60)
+    """
+
+    def __init__(self, workers: int | None = None, spool_dir: str | None = None) -> None:
+        self.workers = int(workers or os.getenv("INGESTION_WORKERS", 2))
+        self.spool_dir = spool_dir or os.getenv("INGESTION_SPOOL_DIR", "./data/uploads")
+        self.stale_after = float(os.getenv("INGESTION_STALE_SECONDS", 600))
+        self.max_attempts = int(os.getenv("INGESTION_MAX_ATTEMPTS", 3))
+        self.recover_every = float(os.getenv("INGESTION_RECOVER_SECONDS", 60))
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.documents = None
+        self._handler = None
+        self._queue = None
+        self._tasks = []
+        self._running = 0
+        # Jobs queued or running in this process, so recovery does not queue them twice
+        self._pending = set()
+
+    def spool_path(self, job_id: str, extension: str) -> str:
+        os.makedirs(self.spool_dir, exist_ok=True)
+        return os.path.join(self.spool_dir, f"{job_id}{extension}")
+
+    async def start(self, documents, handler) -> None:
+        """`handler(job)` processes one claimed job; call from the app lifespan"""
+        self.documents = documents
+        self._handler = handler
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        await self.recover()
+        self._tasks.append(asyncio.create_task(self._recover_periodically()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, job: dict) -> None:
+        self._pending.add(job["job_id"])
+        await self._queue.put(job)
+
+    async def recover(self) -> None:
+        """
+        Queue jobs nobody is working on: still queued (e.g. left by a previous run), or running
+        with a stale heartbeat because their worker process died.
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.stale_after)
+        cursor = self.documents.find({
+            "status": "processing",
+            "job_id": {"$exists": True},
+            "$or": [{"stage": "queued"}, {"heartbeat_at": {"$lt": cutoff}}],
+        })
+        recovered = 0
+        async for document in cursor:
+            if document["job_id"] not in self._pending and os.path.exists(document.get("spool_path", "")):
+                await self.submit(document)
+                recovered += 1
+        if recovered:
+            print(f"Ingestion queue recovered {recovered} pending jobs")
+
+    async def _recover_periodically(self) -> None:
+        """A worker process that dies mid-job leaves it stale; without this it would wait for a restart"""
+        while True:
+            await asyncio.sleep(self.recover_every)
+            try:
+                await self.recover()
+            except Exception as e:
+                print(f"Ingestion job recovery failed: {e}")
+
+    async def _claim(self, job: dict) -> dict | None:
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.stale_after)
+        return await self.documents.find_one_and_update(
+            {
+                "document_id": job["document_id"],
+                "job_id": job["job_id"],
+                "status": "processing",
+                "$or": [{"stage": "queued"}, {"heartbeat_at": {"$lt": cutoff}}],
+            },
+            {
+                "$set": {"stage": "starting", "worker": self.worker_id,
+                         "started_at": datetime.now(timezone.utc), "heartbeat_at": datetime.now(timezone.utc)},
+                "$inc": {"attempts": 1},
+            },
+            return_document=True
+        )
+
+    async def _give_up(self, job: dict) -> None:
+        """Fail a job that used up its attempts and drop its spooled upload"""
+        message = f"Ingestion failed after {self.max_attempts} attempts"
+        if job.get("mode") == "replace":
+            # The previous version was never touched, it stays as it was
+            update = {
+                "$set": {"status": job.get("previous_status", "ready"), "stage": "replace_failed",
+                         "error_message": f"Replacement failed: {message}"},
+                "$unset": {"replacement_filename": "", "replacement_file_size": "", "replacement_sha256": "",
+                           "previous_status": "", "mode": ""}
+            }
+        else:
+            update = {"$set": {"status": "error", "stage": "failed", "error_message": message}}
+        await self.documents.update_one({"document_id": job["document_id"], "job_id": job["job_id"]}, update)
+
+        spool_path = job.get("spool_path")
+        if spool_path and os.path.exists(spool_path):
+            try:
+                os.unlink(spool_path)
+            except OSError as e:
+                print(f"Warning: Failed to clean up spooled file: {e}")
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                claimed = await self._claim(job)
+                if claimed is None:
+                    continue  # finished, deleted or taken by another worker
+                if claimed.get("attempts", 1) > self.max_attempts:
+                    await self._give_up(claimed)
+                    continue
+                self._running += 1
+                try:
+                    await self._handler(claimed)
+                finally:
+                    self._running -= 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Ingestion job {job.get('job_id')} crashed: {e}")
+            finally:
+                self._pending.discard(job.get("job_id"))
+                self._queue.task_done()
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "running": self._running,
+        }
+
+
+# Shared per-process ingestion queue
+ingestion_queue = IngestionQueue()
@@ -1,5 +1,6 @@
 
 from backend.loaders import Loader
+from backend.parse_cache import parse_cache, file_sha256
 from langchain_core.documents import Document
 import os
 
@@ -8,6 +9,9 @@ class Ingestor:
     def __init__(self, folder_path: str):
         self.folder_path = folder_path
         self.loader = Loader()
+        self.cache = parse_cache
+        # Whether the last ingest_single_file call was served from the parse cache
+        self.last_cache_hit = False
         
     def ingest_all(self) -> list[Document]:
         documents = []
@@ -28,7 +32,12 @@ class Ingestor:
 
         return documents
     
-    def ingest_single_file(self, file_path: str) -> list[Document]:
+    def ingest_single_file(self, file_path: str, on_progress=None, sha256: str | None = None) -> list[Document]:
+        """
+        `on_progress(pages_parsed)` is called while a PDF is parsed page-parallel.
+        Identical files (same SHA-256, pass it when already known) with the same Loader settings
+        are served from the parse cache.
+        """
         # Check if file exists
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"File not found: {file_path}")
@@ -40,10 +49,19 @@ class Ingestor:
         filename = os.path.basename(file_path)
         ext = os.path.splitext(filename)[-1].lower()
         
+        cache_key = None
+        self.last_cache_hit = False
+        if self.cache.enabled:
+            cache_key = self.cache.key(sha256 or file_sha256(file_path), ext, self.loader.settings())
+            docs = self.cache.get(cache_key)
+            if docs is not None:
+                self.last_cache_hit = True
+                return self._stamp(docs, file_path, filename, ext)
+        
         # Process file based on extension
         try:
             if ext == ".pdf":
-                docs = self.loader.load_pdf(file_path)
+                docs = self.loader.load_pdf(file_path, on_progress)
             elif ext == ".txt":
                 docs = self.loader.load_txt(file_path)
             elif ext == ".csv":
@@ -53,15 +71,22 @@ class Ingestor:
             else:
                 raise ValueError(f"Unsupported file type: {ext}. Supported types: .pdf, .txt, .csv, .html, .htm")
             
-            # Add file path to metadata for tracking
-            for doc in docs:
-                if doc.metadata is None:
-                    doc.metadata = {}
-                doc.metadata['source_file'] = file_path
-                doc.metadata['filename'] = filename
-                doc.metadata['file_extension'] = ext
-            
-            return docs
-            
         except Exception as e:
-            raise Exception(f"Failed to process file {filename}: {str(e)}")
\ No newline at end of file
+            raise Exception(f"Failed to process file {filename}: {str(e)}")
+        
+        if cache_key:
+            self.cache.put(cache_key, docs)
+        return self._stamp(docs, file_path, filename, ext)
+    
+    def _stamp(self, docs: list[Document], file_path: str, filename: str, ext: str) -> list[Document]:
+        # Add file path to metadata for tracking
+        for doc in docs:
+            if doc.metadata is None:
+                doc.metadata = {}
+            if 'source' in doc.metadata:
+                doc.metadata['source'] = file_path  # cached entries carry the path of the first upload
+            doc.metadata['source_file'] = file_path
+            doc.metadata['filename'] = filename
+            doc.metadata['file_extension'] = ext
+        
+        return docs
\ No newline at end of file
@@ -0,0 +1,166 @@
+import os
+import time
+import asyncio
+import dotenv
+import httpx
+from openai import AsyncOpenAI
+from backend.call_ledger import current_ledger
+from backend.metrics import metrics
+
+dotenv.load_dotenv()
+
+
+class LLMGateway:
+    """
+    Single non-blocking entry point for every OpenAI call made while serving requests.
+    All calls share one pooled keep-alive HTTP client and are bounded by a concurrency limit,
+    so a slow generation never freezes the event loop for other users.
+    Each call is recorded in the ledger of the request being served (see call_ledger.py)
+    and in the OpenAI latency/error metrics.
+
+    Configuration (environment):
+    - OPENAI_MAX_CONCURRENCY: max in-flight non-streaming OpenAI requests per worker (default 16)
+    - OPENAI_MAX_STREAMS: max open chat streams per worker (default 16); streams hold their slot for
+      the whole generation, so they get a limit of their own and never starve embeddings, planning or TTS
+    - OPENAI_TIMEOUT: total request timeout in seconds (default 60)
+    - OPENAI_CONNECT_TIMEOUT: connect timeout in seconds (default 5)
+    - OPENAI_MAX_CONNECTIONS / OPENAI_MAX_KEEPALIVE: HTTP pool sizes (default 32 / 16)
+    - OPENAI_MAX_RETRIES: retries done by the OpenAI client on transient errors (default 2)
+    """
+
+    def __init__(self, max_concurrency=None, timeout=None, connect_timeout=None,
+                 max_connections=None, max_keepalive=None, max_retries=None, max_streams=None) -> None:
+        self.max_concurrency = int(max_concurrency or os.getenv("OPENAI_MAX_CONCURRENCY", 16))
+        self.max_streams = int(max_streams or os.getenv("OPENAI_MAX_STREAMS", 16))
+        self.timeout = float(timeout or os.getenv("OPENAI_TIMEOUT", 60))
+        self.connect_timeout = float(connect_timeout or os.getenv("OPENAI_CONNECT_TIMEOUT", 5))
+        self.max_connections = int(max_connections or os.getenv("OPENAI_MAX_CONNECTIONS", 32))
+        self.max_keepalive = int(max_keepalive or os.getenv("OPENAI_MAX_KEEPALIVE", 16))
+        self.max_retries = int(max_retries if max_retries is not None else os.getenv("OPENAI_MAX_RETRIES", 2))
+
+        self._client = None
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._stream_semaphore = asyncio.Semaphore(self.max_streams)
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        """Lazily build the pooled client so importing this module never needs an API key"""
+        if self._client is None:
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive,
+                    keepalive_expiry=30.0
+                ),
+                timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout)
+            )
+            self._client = AsyncOpenAI(
+                api_key=os.getenv("OPENAI_API_KEY"),
+                http_client=http_client,
+                max_retries=self.max_retries,
+                timeout=self.timeout
+            )
+        return self._client
+
+    def _record(self, operation, model, started, usage=None, error=None, **extra) -> None:
+        duration = time.perf_counter() - started
+        metrics.openai_seconds.observe(duration, operation=operation, model=model)
+        if error is not None:
+            metrics.openai_errors.inc(operation=operation, error=type(error).__name__)
+
+        ledger = current_ledger()
+        if ledger is None:
+            return
+        outcome = "ok"
+        if error is not None:
+            outcome = "cancelled" if isinstance(error, asyncio.CancelledError) else "error"
+        ledger.record(operation, model, duration, usage=usage, outcome=outcome,
+                      error=type(error).__name__ if error is not None else None, **extra)
+
+    async def chat(self, **params):
+        """Non-streaming chat completion"""
+        async with self._semaphore:
+            started = time.perf_counter()
+            try:
+                response = await self.client.chat.completions.create(**params)
+            except BaseException as e:
+                self._record("chat", params.get("model"), started, error=e)
+                raise
+        self._record("chat", params.get("model"), started, usage=getattr(response, "usage", None))
+        return response
+
+    async def chat_stream(self, **params):
+        """Streaming chat completion, yields completion chunks as they arrive"""
+        async with self._stream_semaphore:
+            started = time.perf_counter()
+            first_token = None
+            usage = None
+            error = None
+            try:
+                stream = await self.client.chat.completions.create(stream=True, **params)
+                async for chunk in stream:
+                    if first_token is None:
+                        first_token = time.perf_counter()
+                    if getattr(chunk, "usage", None) is not None:
+                        usage = chunk.usage
+                    yield chunk
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                ttft = round((first_token - started) * 1000, 1) if first_token else None
+                self._record("chat_stream", params.get("model"), started, usage=usage, error=error, ttft_ms=ttft)
+
+    async def embed(self, texts: list[str], model: str = "text-embedding-3-small",
+                    max_retries: int | None = None) -> list[list[float]]:
+        """
+        Embed a batch of texts, results keep the input order.
+        `max_retries` overrides the client's own retries, for callers that run their own backoff.
+        """
+        if not texts:
+            return []
+        client = self.client if max_retries is None else self.client.with_options(max_retries=max_retries)
+        async with self._semaphore:
+            started = time.perf_counter()
+            try:
+                response = await client.embeddings.create(model=model, input=texts)
+            except BaseException as e:
+                self._record("embedding", model, started, error=e, inputs=len(texts))
+                raise
+        self._record("embedding", model, started, usage=getattr(response, "usage", None), inputs=len(texts))
+        return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+
+    async def speech(self, **params):
+        """Text-to-speech, returns the binary response content"""
+        async with self._semaphore:
+            started = time.perf_counter()
+            try:
+                response = await self.client.audio.speech.create(**params)
+            except BaseException as e:
+                self._record("speech", params.get("model"), started, error=e)
+                raise
+        # Billed per input character, there is no token usage to report
+        self._record("speech", params.get("model"), started, characters=len(params.get("input", "")))
+        return response
+
+    async def transcribe(self, **params):
+        """Speech-to-text (Whisper)"""
+        async with self._semaphore:
+            started = time.perf_counter()
+            try:
+                transcript = await self.client.audio.transcriptions.create(**params)
+            except BaseException as e:
+                self._record("transcription", params.get("model"), started, error=e)
+                raise
+        self._record("transcription", params.get("model"), started,
+                     audio_seconds=getattr(transcript, "duration", None))
+        return transcript
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+
+# Shared per-process gateway used by api.py, prompts.py and embedder.py
+gateway = LLMGateway()
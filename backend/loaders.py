@@ -4,12 +4,112 @@ from langchain_community.document_loaders.csv_loader import UnstructuredCSVLoade
 from langchain_community.document_loaders import UnstructuredHTMLLoader
 from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
+import threading
+import io
 import os
 
+# Errors from unstructured that mean "use the plain PyPDF2 text extraction instead"
+_FALLBACK_ERROR_TERMS = ('pi_heif', 'pillow_heif', 'heif', 'no module named', 'unstructured', 'partition')
+
+_pdf_pool = None
+_pdf_pool_workers = 0
+# Ingestion jobs parse in several threads at once, only one of them may create the pool
+_pdf_pool_lock = threading.Lock()
+
+
+def _should_fallback(error: Exception) -> bool:
+    error_msg = str(error).lower()
+    return any(term in error_msg for term in _FALLBACK_ERROR_TERMS)
+
+
+def _get_pdf_pool(workers: int) -> ProcessPoolExecutor:
+    """Shared page-parsing pool, spawned lazily (spawn, not fork: the API process runs threads)"""
+    global _pdf_pool, _pdf_pool_workers
+    with _pdf_pool_lock:
+        if _pdf_pool is None or _pdf_pool_workers != workers:
+            if _pdf_pool is not None:
+                _pdf_pool.shutdown(wait=False)
+            _pdf_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pdf_pool_workers = workers
+        return _pdf_pool
+
+
+def shutdown_pdf_pool() -> None:
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is not None:
+            _pdf_pool.shutdown(wait=False, cancel_futures=True)
+            _pdf_pool = None
+
+
+def count_pdf_pages(file_path: str) -> int:
+    from PyPDF2 import PdfReader
+    return len(PdfReader(file_path).pages)
+
+
+def extract_pdf_pages(file_path: str, start: int, end: int, strategy: str = "fast") -> tuple[list[tuple[int, str]], str]:
+    """
+    Text of pages [start, end) as (1-based page number, text) pairs, plus the method used.
+    Runs in a worker process: the range is copied into an in-memory PDF and partitioned by unstructured,
+    falling back to PyPDF2 text extraction like Loader.load_pdf does (on errors and on empty output).
+    """
+    from PyPDF2 import PdfReader, PdfWriter
+
+    reader = PdfReader(file_path)
+    try:
+        from unstructured.partition.pdf import partition_pdf
+
+        writer = PdfWriter()
+        for page in reader.pages[start:end]:
+            writer.add_page(page)
+        buffer = io.BytesIO()
+        writer.write(buffer)
+        buffer.seek(0)
+
+        elements = partition_pdf(file=buffer, strategy=strategy, starting_page_number=start + 1)
+        texts = {}
+        for element in elements:
+            if element.text and element.text.strip():
+                texts.setdefault(element.metadata.page_number or start + 1, []).append(element.text)
+        if texts:
+            return [(page_number, "\n\n".join(parts)) for page_number, parts in sorted(texts.items())], "unstructured_pages"
+        # No text from unstructured (e.g. scanned pages with the fast strategy): PyPDF2 may still find some
+    except Exception as e:
+        if not _should_fallback(e):
+            raise
+
+    pages = []
+    for page_index in range(start, end):
+        try:
+            page_text = reader.pages[page_index].extract_text()
+        except Exception as e:
+            print(f"Warning: Failed to extract text from page {page_index + 1}: {e}")
+            continue
+        if page_text and page_text.strip():
+            pages.append((page_index + 1, page_text))
+    return pages, "fallback_pypdf2_pages"
+
 class Loader:
-    def __init__(self, chunk_size=500, chunk_overlap=100) -> None:
+    def __init__(self, chunk_size=500, chunk_overlap=100, pdf_workers=None, pdf_pages_per_task=None) -> None:
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        # Page-parallel PDF parsing: PDFs longer than one page range are split across worker processes
+        self.pdf_workers = int(pdf_workers if pdf_workers is not None
+                               else os.getenv("PDF_PARSE_WORKERS", min(4, os.cpu_count() or 1)))
+        self.pdf_pages_per_task = int(pdf_pages_per_task or os.getenv("PDF_PAGES_PER_TASK", 8))
+        self.pdf_strategy = "fast"
+
+    def settings(self) -> dict:
+        """Everything that shapes the chunk output, part of the parse cache key"""
+        return {
+            "chunk_size": self.chunk_size,
+            "chunk_overlap": self.chunk_overlap,
+            "pdf_strategy": self.pdf_strategy,
+            # Page-parallel parsing splits chunks at page boundaries
+            "pdf_pages_per_task": self.pdf_pages_per_task if self.pdf_workers > 1 else None,
+        }
 
     def _split_documents(self, documents):
         splitter = RecursiveCharacterTextSplitter(
@@ -25,17 +125,18 @@ class Loader:
             
             with open(file_path, 'rb') as file:
                 pdf = PdfReader(file)
-                text_content = ""
+                page_texts = []
                 
                 for page_num, page in enumerate(pdf.pages):
                     try:
                         page_text = page.extract_text()
                         if page_text and page_text.strip():
-                            text_content += f"{page_text}\n\n"
+                            page_texts.append(page_text)
                     except Exception as e:
                         print(f"Warning: Failed to extract text from page {page_num + 1}: {e}")
                         continue
             
+            text_content = "\n\n".join(page_texts)
             if not text_content.strip():
                 raise Exception("No text content could be extracted from the PDF")
             
@@ -56,14 +157,59 @@ class Loader:
         except Exception as e:
             raise Exception(f"Fallback PDF processing failed: {str(e)}")
 
-    def load_pdf(self, file_path: str) -> list:
+    def load_pdf_pages(self, file_path: str, page_count: int, on_progress=None) -> list:
+        """
+        Parse page ranges in the process pool and split each page on its own, so every chunk
+        carries its `page_number`. `on_progress(pages_parsed)` is called as ranges complete.
+        """
+        ranges = [(start, min(start + self.pdf_pages_per_task, page_count))
+                  for start in range(0, page_count, self.pdf_pages_per_task)]
+        pool = _get_pdf_pool(self.pdf_workers)
+        futures = {pool.submit(extract_pdf_pages, file_path, start, end, self.pdf_strategy): (start, end) for start, end in ranges}
+        
+        results = {}
+        pages_parsed = 0
+        for future in as_completed(futures):
+            start, end = futures[future]
+            results[start] = future.result()
+            pages_parsed += end - start
+            if on_progress:
+                on_progress(pages_parsed)
+        
+        documents = []
+        for start in sorted(results):
+            pages, method = results[start]
+            for page_number, text in pages:
+                documents.append(Document(
+                    page_content=text.strip(),
+                    metadata={
+                        "source": file_path,
+                        "filename": os.path.basename(file_path),
+                        "page_number": page_number,
+                        "processing_method": method
+                    }
+                ))
+        
+        if not documents:
+            raise Exception("No text content could be extracted from the PDF")
+        return self._split_documents(documents)
+
+    def load_pdf(self, file_path: str, on_progress=None) -> list:
         """Load PDF with fallback processing for problematic files"""
+        if self.pdf_workers > 1:
+            try:
+                page_count = count_pdf_pages(file_path)
+            except Exception:
+                page_count = 0  # let the single-pass loader report the problem
+            if page_count > self.pdf_pages_per_task:
+                return self.load_pdf_pages(file_path, page_count, on_progress)
+        
         try:
             # First, try the standard unstructured approach with safe settings
             loader = UnstructuredPDFLoader(
                 file_path=file_path, 
                 mode="single",
-                strategy="fast",  # Use fast strategy
+                strategy=self.pdf_strategy,  # Use fast strategy
             )
             documents = loader.load()
             
@@ -74,21 +220,13 @@ class Loader:
             return self._split_documents(documents)
             
         except Exception as e:
-            error_msg = str(e).lower()
-            
-            # Check for known problematic dependencies
-            if any(term in error_msg for term in ['pi_heif', 'pillow_heif', 'heif', 'no module named']):
+            # Known problematic dependencies and other unstructured errors: try the fallback
+            if _should_fallback(e):
                 print(f"Unstructured PDF processing failed ({e}), trying fallback method...")
                 return self._fallback_pdf_processing(file_path)
             
-            # For other unstructured errors, also try fallback
-            elif 'unstructured' in error_msg or 'partition' in error_msg:
-                print(f"Unstructured processing error ({e}), trying fallback method...")
-                return self._fallback_pdf_processing(file_path)
-            
-            else:
-                # Re-raise other types of errors
-                raise e
+            # Re-raise other types of errors
+            raise e
 
     def load_csv(self, file_path: str) -> list:
         loader = UnstructuredCSVLoader(file_path=file_path, mode="elements")
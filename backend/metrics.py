@@ -0,0 +1,230 @@
+import os
+import time
+import threading
+from bisect import bisect_left
+
+# Seconds, from a Mongo lookup up to a long generation or ingestion
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, registry, name: str, documentation: str, labelnames=()) -> None:
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        if not self.registry.enabled:
+            return
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, registry, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> None:
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # per-bucket (non-cumulative) counts, the last slot is +Inf, then sum and count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = [(key, (list(state[0]), state[1], state[2])) for key, state in self._values.items()]
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += bucket_count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class _Span:
+    __slots__ = ("registry", "pipeline", "stage", "started")
+
+    def __init__(self, registry, pipeline: str, stage: str) -> None:
+        self.registry = registry
+        self.pipeline = pipeline
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry.stage_seconds.observe(time.perf_counter() - self.started,
+                                            pipeline=self.pipeline, stage=self.stage)
+        if exc_type is not None:
+            self.registry.stage_errors.inc(pipeline=self.pipeline, stage=self.stage)
+        return False
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class MetricsRegistry:
+    """
+    Minimal in-process Prometheus registry (counters, gauges, histograms) rendered in the text format.
+    Disabled with METRICS_ENABLED=0: spans become a shared no-op and every update returns immediately.
+    Values are per process, scrape each worker separately.
+    """
+
+    def __init__(self, enabled: bool | None = None) -> None:
+        self.enabled = enabled if enabled is not None else os.getenv("METRICS_ENABLED", "1") != "0"
+        self._metrics = {}
+
+        self.stage_seconds = self.histogram(
+            "rag_stage_duration_seconds", "Duration of pipeline stages.", ("pipeline", "stage"))
+        self.stage_errors = self.counter(
+            "rag_stage_errors_total", "Pipeline stages that raised.", ("pipeline", "stage"))
+        self.in_flight = self.gauge(
+            "http_requests_in_flight", "HTTP requests currently being served.")
+        self.requests = self.counter(
+            "http_requests_total", "HTTP requests served.", ("method", "route", "status"))
+        self.request_seconds = self.histogram(
+            "http_request_duration_seconds", "HTTP request duration, streaming bodies included.", ("method", "route"))
+        self.openai_seconds = self.histogram(
+            "openai_request_duration_seconds", "OpenAI call duration.", ("operation", "model"))
+        self.openai_errors = self.counter(
+            "openai_errors_total", "OpenAI calls that failed or were cancelled.", ("operation", "error"))
+        self.openai_retries = self.counter(
+            "openai_retries_total", "OpenAI calls retried by our own backoff loops.", ("operation", "error"))
+        self.verifications = self.counter(
+            "index_verification_total", "Background index verification outcomes.", ("outcome",))
+
+    def _register(self, metric):
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames=()) -> Gauge:
+        return self._register(Gauge(self, name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def span(self, pipeline: str, stage: str):
+        """Time a block as one stage of a pipeline (chat, upload, ...)"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, pipeline, stage)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting in-flight requests and request durations per route template"""
+
+    def __init__(self, app, registry: MetricsRegistry | None = None) -> None:
+        self.app = app
+        self.registry = registry or metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.registry.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        registry = self.registry
+        registry.in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            registry.in_flight.dec()
+            # The router stores the matched route in the scope, its path template keeps cardinality bounded
+            route = getattr(scope.get("route"), "path", "unmatched")
+            registry.request_seconds.observe(time.perf_counter() - started, method=scope["method"], route=route)
+            registry.requests.inc(method=scope["method"], route=route, status=status["code"])
+
+
+# Shared per-process registry
+metrics = MetricsRegistry()
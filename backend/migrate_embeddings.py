@@ -0,0 +1,67 @@
+"""
+Rewrite stored chunk embeddings in another storage format.
+
+Usage:
+    python -m backend.migrate_embeddings --format float32
+    python -m backend.migrate_embeddings --format int8 --batch-size 1000
+    python -m backend.migrate_embeddings --format double --dry-run
+"""
+import argparse
+import os
+import dotenv
+from pymongo import MongoClient, UpdateOne
+from backend.vector_codec import FORMATS, check_backend_format, decode_record, encode_embedding
+
+
+def migrate(collection, fmt: str, batch_size: int = 500, dry_run: bool = False) -> dict:
+    query = {"embedding": {"$exists": True}, "embedding_format": {"$ne": fmt}}
+    if fmt == "double":
+        # Legacy documents have no embedding_format field at all
+        query = {"embedding_format": {"$exists": True, "$ne": "double"}}
+
+    pending = collection.count_documents(query)
+    print(f"{pending} chunks to convert to {fmt}")
+    if dry_run or not pending:
+        return {"pending": pending, "converted": 0, "failed": 0}
+
+    converted = failed = 0
+    operations = []
+    cursor = collection.find(query, {"embedding": 1, "embedding_scale": 1, "embedding_format": 1})
+    for doc in cursor:
+        try:
+            fields = encode_embedding(decode_record(doc), fmt)
+            update = {"$set": fields}
+            if "embedding_scale" not in fields and "embedding_scale" in doc:
+                update["$unset"] = {"embedding_scale": ""}
+            operations.append(UpdateOne({"_id": doc["_id"]}, update))
+        except Exception as e:
+            failed += 1
+            print(f"Skipping chunk {doc['_id']}: {e}")
+
+        if len(operations) >= batch_size:
+            converted += collection.bulk_write(operations, ordered=False).modified_count
+            operations = []
+            print(f"Converted {converted}/{pending}")
+
+    if operations:
+        converted += collection.bulk_write(operations, ordered=False).modified_count
+
+    print(f"Migration finished: {converted} converted, {failed} failed")
+    return {"pending": pending, "converted": converted, "failed": failed}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert stored chunk embeddings to a compact format")
+    parser.add_argument("--format", choices=FORMATS, default="float32")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    dotenv.load_dotenv()
+    try:
+        # Converting to a format the configured backend cannot search would take every chunk out of retrieval
+        check_backend_format(os.getenv("VECTOR_BACKEND", "atlas").lower(), args.format)
+    except ValueError as e:
+        parser.error(str(e))
+    client = MongoClient(os.getenv("MONGO_URI"))
+    migrate(client["support_assistant"]["embeddings"], args.format, args.batch_size, args.dry_run)
@@ -0,0 +1,114 @@
+import os
+import gzip
+import json
+import hashlib
+import threading
+from langchain_core.documents import Document
+
+# Bump when loader output changes in a way the settings key does not capture
+_FORMAT_VERSION = 1
+
+
+def file_sha256(file_path: str, block_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ParseCache:
+    """
+    On-disk cache of parsed chunk lists keyed by the file's SHA-256 plus the Loader settings
+    that shape the output (chunk size/overlap, PDF strategy and mode). Entries are gzipped JSON,
+    a hit refreshes the entry's mtime and the oldest entries are evicted past the size limit.
+
+    Configuration (environment):
+    - PARSE_CACHE_ENABLED: `0` disables the cache
+    - PARSE_CACHE_DIR: cache directory (default ./data/parse_cache)
+    - PARSE_CACHE_MAX_MB: total size of the cache files (default 256)
+    """
+
+    def __init__(self, directory: str | None = None, max_bytes: int | None = None) -> None:
+        self.enabled = os.getenv("PARSE_CACHE_ENABLED", "1") != "0"
+        self.directory = directory or os.getenv("PARSE_CACHE_DIR", "./data/parse_cache")
+        self.max_bytes = int(max_bytes or float(os.getenv("PARSE_CACHE_MAX_MB", 256)) * 1024 * 1024)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, sha256: str, extension: str, settings: dict) -> str:
+        fingerprint = json.dumps({"sha256": sha256, "extension": extension, "settings": settings,
+                                  "version": _FORMAT_VERSION}, sort_keys=True)
+        return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json.gz")
+
+    def get(self, key: str) -> list[Document] | None:
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                entries = json.load(f)
+            os.utime(path)  # keep recently used entries away from eviction
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception as e:
+            print(f"Parse cache entry {key} unreadable, parsing again: {e}")
+            self.misses += 1
+            return None
+        self.hits += 1
+        return [Document(page_content=content, metadata=metadata) for content, metadata in entries]
+
+    def put(self, key: str, documents: list[Document]) -> None:
+        if not self.enabled:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._path(key)
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with gzip.open(temp_path, "wt", encoding="utf-8", compresslevel=6) as f:
+                json.dump([[doc.page_content, doc.metadata] for doc in documents], f,
+                          ensure_ascii=False, separators=(",", ":"), default=str)
+            os.replace(temp_path, path)
+            self._evict()
+        except Exception as e:
+            print(f"Parse cache write failed: {e}")
+
+    def _evict(self) -> None:
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.directory):
+                if not name.endswith(".json.gz"):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, name in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.unlink(os.path.join(self.directory, name))
+                    total -= size
+                except FileNotFoundError:
+                    pass
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Shared per-process parse cache
+parse_cache = ParseCache()
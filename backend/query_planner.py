@@ -0,0 +1,45 @@
+import os
+import asyncio
+from backend.prompts import Prompts
+
+
+class QueryPlanner:
+    """
+    Query-planning stage of the chat pipeline.
+    Issues the one auxiliary gpt-4o-mini call still on the request path (multi-query expansion)
+    under a timeout, and falls back to the raw query when it fails or is too slow.
+    The conversation context is read from the stored conversation state instead of a call.
+    """
+
+    def __init__(self, prompts: Prompts | None = None, timeout: float | None = None) -> None:
+        self.prompts = prompts or Prompts()
+        self.timeout = float(timeout or os.getenv("QUERY_PLANNING_TIMEOUT", 8))
+
+    async def _with_timeout(self, name: str, coro, fallback):
+        try:
+            return await asyncio.wait_for(coro, timeout=self.timeout)
+        except asyncio.TimeoutError:
+            print(f"Query planning: {name} timed out after {self.timeout}s, using fallback")
+        except Exception as e:
+            print(f"Query planning: {name} failed ({e}), using fallback")
+        return fallback
+
+    async def plan(self, query: str, conversation_state: str | None = None) -> dict:
+        """
+        Returns {"conversation_context": str, "queries": [str, ...], "usage": [per-call token usage]}.
+        The conversation context comes from the stored, incrementally updated
+        conversation_state, so no extraction call is needed on the request path.
+        The original query is always the first search query.
+        """
+        multi_query = await self._with_timeout("multi_query", self.prompts.generate_multi_query(query), [query])
+
+        queries = [query]
+        for q in multi_query or []:
+            if isinstance(q, str) and q.strip() and q.strip() not in queries:
+                queries.append(q.strip())
+
+        return {
+            "conversation_context": conversation_state or "",
+            "queries": queries,
+            "usage": list(self.prompts.usage_log),
+        }
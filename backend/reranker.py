@@ -0,0 +1,102 @@
+import os
+import numpy as np
+from backend.vector_codec import decode_record
+
+
+def mmr_order(relevance: np.ndarray, vectors: np.ndarray, k: int, lambda_mult: float = 0.7) -> list[int]:
+    """
+    Maximal Marginal Relevance selection order.
+    `relevance` is one score per candidate, `vectors` holds L2-normalised rows
+    (all-zero rows for candidates without a vector, which then count as novel).
+    Each pick costs one matrix-vector product to refresh the max similarity to the selection.
+    """
+    n = len(relevance)
+    k = min(k, n)
+    selected = []
+    max_similarity = np.zeros(n, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+
+    for _ in range(k):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * max_similarity
+        scores = np.where(available, scores, -np.inf)
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_similarity, vectors @ vectors[best], out=max_similarity)
+
+    return selected
+
+
+def overlap_length(head: str, tail: str, min_overlap: int = 30, max_overlap: int = 400) -> int:
+    """Length of the longest suffix of `head` that is a prefix of `tail` (0 if shorter than min_overlap)"""
+    upper = min(len(head), len(tail), max_overlap)
+    for size in range(upper, min_overlap - 1, -1):
+        if head.endswith(tail[:size]):
+            return size
+    return 0
+
+
+def _source(chunk: dict):
+    return (chunk.get("metadata") or {}).get("source_file") or chunk.get("document_id")
+
+
+class MMRReranker:
+    """
+    Diversity re-ranking of over-fetched candidates.
+    Picks a top-k with MMR (relevance = fused retrieval score, redundancy = cosine between chunk vectors)
+    and collapses adjacent overlapping chunks of the same source file into one passage,
+    so the prompt does not carry the splitter's chunk_overlap twice.
+    """
+
+    def __init__(self, lambda_mult: float | None = None, min_overlap: int = 30) -> None:
+        self.lambda_mult = float(lambda_mult if lambda_mult is not None else os.getenv("MMR_LAMBDA", 0.7))
+        self.min_overlap = min_overlap
+
+    def _try_merge(self, kept: dict, candidate: dict) -> bool:
+        if _source(kept) is None or _source(kept) != _source(candidate):
+            return False
+        first, second = kept["content"], candidate["content"]
+        if second in first:
+            merged = first
+        elif first in second:
+            merged = second
+        elif size := overlap_length(first, second, self.min_overlap):
+            merged = first + second[size:]
+        elif size := overlap_length(second, first, self.min_overlap):
+            merged = second + first[size:]
+        else:
+            return False
+        kept["content"] = merged
+        kept.setdefault("merged_ids", []).append(candidate.get("_id"))
+        return True
+
+    def rerank(self, candidates: list[dict], top_k: int) -> list[dict]:
+        """
+        `candidates` are ranked chunks carrying a relevance score (`rrf_score` or `score`)
+        and, when available, their stored `embedding`. Returns top_k chunks without embeddings.
+        """
+        if not candidates:
+            return []
+
+        relevance = np.asarray(
+            [c.get("rrf_score", c.get("score", 0.0)) or 0.0 for c in candidates], dtype=np.float32
+        )
+        relevance = relevance / max(float(relevance.max()), 1e-12)
+
+        dim = next((len(decode_record(c)) for c in candidates if c.get("embedding") is not None), 0)
+        vectors = np.zeros((len(candidates), dim), dtype=np.float32)
+        for i, candidate in enumerate(candidates):
+            if candidate.get("embedding") is not None:
+                vector = decode_record(candidate)
+                vectors[i] = vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+        selected = []
+        for index in mmr_order(relevance, vectors, len(candidates), self.lambda_mult):
+            candidate = {k: v for k, v in candidates[index].items() if k not in ("embedding", "embedding_scale")}
+            if any(self._try_merge(kept, candidate) for kept in selected):
+                continue
+            selected.append(candidate)
+            if len(selected) >= top_k:
+                break
+
+        return selected
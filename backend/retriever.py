@@ -0,0 +1,92 @@
+import os
+import asyncio
+from backend.embedder import Embedder
+from backend.bm25 import BM25Index
+from backend.reranker import MMRReranker
+from backend.metrics import metrics
+
+
+def reciprocal_rank_fusion(result_lists: list[list[dict]], k: int = 60, key: str = "_id") -> list[dict]:
+    """
+    Merge several ranked result lists with reciprocal-rank fusion.
+    Each document scores sum(1 / (k + rank)) over the lists it appears in;
+    duplicates (same `key`) are collapsed to the first copy seen.
+    """
+    fused = {}
+    scores = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results, start=1):
+            doc_key = str(doc.get(key))
+            if doc_key not in fused:
+                fused[doc_key] = doc
+                scores[doc_key] = 0.0
+            scores[doc_key] += 1.0 / (k + rank)
+
+    ranked = sorted(fused, key=lambda doc_key: scores[doc_key], reverse=True)
+    merged = []
+    for doc_key in ranked:
+        doc = dict(fused[doc_key])
+        doc["rrf_score"] = scores[doc_key]
+        merged.append(doc)
+    return merged
+
+
+class Retriever:
+    """
+    Multi-query retrieval stage: embeds every query variant in one batched call,
+    runs the vector searches concurrently and fuses them with RRF.
+    The search itself is delegated to a vector backend (see vector_store.py).
+    When a BM25 index is given, its lexical hits for the original query join the fusion (hybrid search).
+    With a reranker, every list is over-fetched (fetch_k per query, vectors included) and the fused
+    candidates are diversified with MMR before the final top_k is taken.
+    """
+
+    def __init__(self, backend, embedder: Embedder | None = None, num_candidates: int = 50, rrf_k: int = 60,
+                 lexical_index: BM25Index | None = None, reranker: MMRReranker | None = None,
+                 fetch_multiplier: int | None = None) -> None:
+        self.backend = backend
+        self.lexical_index = lexical_index
+        self.reranker = reranker
+        self.fetch_multiplier = int(fetch_multiplier or os.getenv("RETRIEVAL_FETCH_MULTIPLIER", 4))
+        self.embedder = embedder or Embedder()
+        self.num_candidates = num_candidates
+        self.rrf_k = rrf_k
+
+    async def vector_search(self, query_vector: list[float], limit: int, num_candidates: int | None = None,
+                            filters: dict | None = None, include_vectors: bool = False) -> list[dict]:
+        return await self.backend.search(
+            query_vector,
+            limit=limit,
+            num_candidates=max(num_candidates or self.num_candidates, limit),
+            filters=filters,
+            include_vectors=include_vectors
+        )
+
+    async def retrieve(self, queries: list[str], top_k: int = 5) -> list[dict]:
+        """Return the top_k fused chunks for all query variants"""
+        queries = [q for q in queries if q and q.strip()]
+        if not queries:
+            return []
+
+        fetch_k = top_k * self.fetch_multiplier if self.reranker else top_k
+        with metrics.span("chat", "query_embedding"):
+            vectors = await self.embedder.aembed_queries(queries)
+        with metrics.span("chat", "vector_search"):
+            result_lists = list(await asyncio.gather(*[
+                self.vector_search(vector, limit=fetch_k, include_vectors=self.reranker is not None)
+                for vector in vectors
+            ]))
+
+        if self.lexical_index is not None:
+            # Exact terms (contract codes, article numbers) the embedding may miss
+            with metrics.span("chat", "lexical_search"):
+                lexical_hits = self.lexical_index.search(queries[0], limit=fetch_k)
+            if lexical_hits:
+                result_lists.append(lexical_hits)
+
+        if self.reranker:
+            with metrics.span("chat", "rerank"):
+                return self.reranker.rerank(reciprocal_rank_fusion(result_lists, k=self.rrf_k), top_k)
+        if len(result_lists) == 1:
+            return result_lists[0][:top_k]
+        return reciprocal_rank_fusion(result_lists, k=self.rrf_k)[:top_k]
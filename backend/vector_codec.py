@@ -0,0 +1,83 @@
+import os
+import numpy as np
+from bson.binary import Binary
+
+# Header bytes of the BSON binary vector subtype (dtype, padding)
+_FLOAT32_HEADER = b"\x27\x00"
+_INT8_HEADER = b"\x03\x00"
+VECTOR_SUBTYPE = 9
+
+# Storage formats for chunk embeddings:
+# - double:  legacy Python list of doubles (~12 KB per 1536-d vector)
+# - float32: BSON binary vector (float32), indexable by Atlas Vector Search (~6 KB)
+# - int8:    BSON binary vector (int8) + per-vector `embedding_scale` (~1.5 KB);
+#            cosine similarity is scale-invariant, so Atlas can index it directly
+# - float16: raw little-endian float16 bytes (~3 KB), local/IVF backends only
+FORMATS = ("double", "float32", "int8", "float16")
+# Formats Atlas Vector Search can index
+ATLAS_FORMATS = ("double", "float32", "int8")
+
+
+def storage_format() -> str:
+    fmt = os.getenv("EMBEDDING_STORAGE_FORMAT", "float32").lower()
+    if fmt not in FORMATS:
+        print(f"Unknown EMBEDDING_STORAGE_FORMAT '{fmt}', using float32")
+        return "float32"
+    return fmt
+
+
+def check_backend_format(backend: str, fmt: str | None = None) -> None:
+    """Raise ValueError when `fmt` cannot be searched by the given vector backend"""
+    fmt = fmt or storage_format()
+    if backend == "atlas" and fmt not in ATLAS_FORMATS:
+        raise ValueError(f"Embedding storage format '{fmt}' cannot be indexed by Atlas Vector Search; "
+                         f"use one of {', '.join(ATLAS_FORMATS)} or VECTOR_BACKEND=local/ivf")
+
+
+def encode_embedding(vector, fmt: str | None = None) -> dict:
+    """Return the chunk fields (`embedding`, `embedding_format`, optional `embedding_scale`) for a vector"""
+    fmt = fmt or storage_format()
+    array = np.asarray(vector, dtype=np.float32)
+
+    if fmt == "double":
+        return {"embedding": array.astype(np.float64).tolist(), "embedding_format": "double"}
+    if fmt == "float32":
+        data = _FLOAT32_HEADER + array.astype("<f4").tobytes()
+        return {"embedding": Binary(data, VECTOR_SUBTYPE), "embedding_format": "float32"}
+    if fmt == "int8":
+        scale = float(np.abs(array).max()) / 127.0 or 1.0
+        quantized = np.clip(np.rint(array / scale), -127, 127).astype(np.int8)
+        return {
+            "embedding": Binary(_INT8_HEADER + quantized.tobytes(), VECTOR_SUBTYPE),
+            "embedding_format": "int8",
+            "embedding_scale": scale
+        }
+    if fmt == "float16":
+        return {"embedding": Binary(array.astype("<f2").tobytes()), "embedding_format": "float16"}
+    raise ValueError(f"Unsupported embedding storage format: {fmt}")
+
+
+def decode_embedding(value, scale: float | None = None, fmt: str | None = None) -> np.ndarray:
+    """Decode any stored embedding format back to a float32 array"""
+    if isinstance(value, np.ndarray):
+        return value.astype(np.float32, copy=False)
+    if isinstance(value, (list, tuple)):
+        return np.asarray(value, dtype=np.float32)
+
+    raw = bytes(value)
+    subtype = getattr(value, "subtype", None)
+    if subtype == VECTOR_SUBTYPE:
+        header, body = raw[:2], raw[2:]
+        if header[:1] == _FLOAT32_HEADER[:1]:
+            return np.frombuffer(body, dtype="<f4").astype(np.float32)
+        if header[:1] == _INT8_HEADER[:1]:
+            return np.frombuffer(body, dtype=np.int8).astype(np.float32) * np.float32(scale or 1.0)
+        raise ValueError(f"Unsupported BSON vector dtype: {header[:1]!r}")
+    if fmt in (None, "float16"):
+        return np.frombuffer(raw, dtype="<f2").astype(np.float32)
+    raise ValueError(f"Cannot decode embedding stored as {fmt}")
+
+
+def decode_record(record: dict) -> np.ndarray:
+    """Decode the embedding of a chunk document, whatever format it was written in"""
+    return decode_embedding(record["embedding"], record.get("embedding_scale"), record.get("embedding_format"))
@@ -0,0 +1,635 @@
+import os
+import uuid
+import pickle
+import asyncio
+import numpy as np
+from backend.vector_codec import check_backend_format, decode_record
+
+
+class AtlasVectorBackend:
+    """
+    Retrieval through the MongoDB Atlas `vector_index` ($vectorSearch).
+    Atlas indexes writes itself (eventually), so add/remove are no-ops here.
+    """
+
+    name = "atlas"
+    writes_are_immediate = False
+
+    def __init__(self, collection, index_name: str = "vector_index") -> None:
+        self.collection = collection
+        self.index_name = index_name
+
+    async def load(self) -> None:
+        pass
+
+    async def search(self, query_vector: list[float], limit: int, num_candidates: int | None = None,
+                     filters: dict | None = None, include_vectors: bool = False) -> list[dict]:
+        vector_search = {
+            "queryVector": list(query_vector),
+            "path": "embedding",
+            "numCandidates": max(num_candidates or limit * 10, limit),
+            "limit": limit,
+            "index": self.index_name
+        }
+        if filters:
+            # Filter fields must be declared as "filter" paths in the Atlas index definition
+            vector_search["filter"] = {field: {"$eq": value} for field, value in filters.items()}
+
+        pipeline = [
+            {"$vectorSearch": vector_search},
+            {"$addFields": {"score": {"$meta": "vectorSearchScore"}}},
+        ]
+        if not include_vectors:
+            pipeline.append({"$project": {"embedding": 0}})
+        return await self.collection.aggregate(pipeline).to_list(length=None)
+
+    async def add(self, records: list[dict]) -> None:
+        pass
+
+    async def remove(self, document_id: str | None = None, chunk_ids: list | None = None) -> None:
+        pass
+
+    async def update_metadata(self, metadata_by_id: dict) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "index": self.index_name}
+
+
+class LocalVectorBackend:
+    """
+    In-process exact cosine search over the `embeddings` collection.
+    Vectors live in one contiguous float32 matrix memory-mapped from VECTOR_STORE_PATH,
+    chunk payloads (content/metadata) are kept alongside so a search needs no network hop.
+    Writes are applied immediately, so new chunks are searchable as soon as they are inserted.
+    On disk, row metadata is a full snapshot (meta.pkl) plus an append-only journal of adds, deletes
+    and metadata updates (journal.pkl); the snapshot is only rewritten on rebuild, compaction, retraining
+    or once the journal has grown past half the corpus. Disk writes run off the event loop, in order.
+    Each worker keeps its own copy; use it with a single API worker or rebuild on restart.
+    """
+
+    name = "local"
+    writes_are_immediate = True
+    # Per-row arrays kept in step with the vector matrix, with their fill value
+    _row_fields = {"_alive": False, "_document_ids": None, "_user_ids": None}
+
+    def __init__(self, collection, path: str | None = None, dim: int = 1536) -> None:
+        self.collection = collection
+        self.path = path or os.getenv("VECTOR_STORE_PATH", "./data/vector_store")
+        self.dim = dim
+        self._vectors = np.zeros((0, dim), dtype=np.float32)
+        self._alive = np.zeros(0, dtype=bool)
+        self._document_ids = np.zeros(0, dtype=object)
+        self._user_ids = np.zeros(0, dtype=object)
+        self._payloads = []
+        self._size = 0
+        # Bumped whenever row numbers change (compaction, rebuild)
+        self._layout = 0
+        self._journal_rows = 0
+        self._persist_lock = asyncio.Lock()
+        # Growing the matrix writes a new file; the snapshot names the one it belongs to
+        self._vectors_name = "vectors.f32"
+        self._reallocated = False
+
+    @property
+    def _vectors_file(self) -> str:
+        return os.path.join(self.path, self._vectors_name)
+
+    @property
+    def _meta_file(self) -> str:
+        return os.path.join(self.path, "meta.pkl")
+
+    @property
+    def _journal_file(self) -> str:
+        return os.path.join(self.path, "journal.pkl")
+
+    # ---- persistence -------------------------------------------------
+
+    def _allocate(self, capacity: int) -> None:
+        """Grow the memory-mapped matrix (and per-row arrays) to at least `capacity` rows"""
+        capacity = max(capacity, 1024)
+        os.makedirs(self.path, exist_ok=True)
+        old_vectors = self._vectors[:self._size].copy() if self._size else None
+
+        # A fresh file, so the current snapshot (and a flush still running on the old map) stay valid
+        self._vectors_name = f"vectors-{uuid.uuid4().hex[:12]}.f32"
+        self._reallocated = True
+        vectors = np.memmap(self._vectors_file, dtype=np.float32, mode="w+", shape=(capacity, self.dim))
+        if old_vectors is not None:
+            vectors[:self._size] = old_vectors
+        self._vectors = vectors
+
+        for field, fill in self._row_fields.items():
+            array = getattr(self, field)
+            grown = np.full(capacity, fill, dtype=array.dtype)
+            grown[:self._size] = array[:self._size]
+            setattr(self, field, grown)
+
+    def _snapshot(self) -> dict:
+        """Copy of the row metadata, taken on the event loop so later writes cannot leak into it"""
+        return {
+            "dim": self.dim,
+            "size": self._size,
+            "vectors_file": self._vectors_name,
+            "alive": self._alive[:self._size].copy(),
+            "document_ids": self._document_ids[:self._size].copy(),
+            "user_ids": self._user_ids[:self._size].copy(),
+            "payloads": list(self._payloads),
+            **self._extra_meta(),
+        }
+
+    def _write_snapshot(self, vectors, snapshot: dict) -> None:
+        if isinstance(vectors, np.memmap):
+            vectors.flush()
+        os.makedirs(self.path, exist_ok=True)
+        tmp_file = self._meta_file + ".tmp"
+        with open(tmp_file, "wb") as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, self._meta_file)
+        # Everything journaled so far is part of the snapshot now
+        if os.path.exists(self._journal_file):
+            os.unlink(self._journal_file)
+        # Matrix files of earlier snapshots
+        for name in os.listdir(self.path):
+            if name.startswith("vectors") and name.endswith(".f32") and name != snapshot["vectors_file"]:
+                os.unlink(os.path.join(self.path, name))
+
+    def _append_journal(self, vectors, entry: dict) -> None:
+        # Vectors first: a journaled row always has its vector on disk
+        if isinstance(vectors, np.memmap):
+            vectors.flush()
+        with open(self._journal_file, "ab") as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    async def _persist(self, entry: dict | None = None, rows: int = 0) -> None:
+        """
+        Journal one change (`entry` touching `rows` rows), or write a full snapshot when `entry` is None
+        or the journal has grown past half the corpus. Data is captured now, written in a thread.
+        """
+        self._journal_rows += rows
+        vectors = self._vectors
+        if entry is None or self._reallocated or self._journal_rows > max(10000, self._size // 2):
+            self._journal_rows = 0
+            self._reallocated = False
+            write, payload = self._write_snapshot, self._snapshot()
+        else:
+            write, payload = self._append_journal, entry
+        async with self._persist_lock:
+            await asyncio.to_thread(write, vectors, payload)
+
+    def _replay(self, entry: dict) -> None:
+        if entry["op"] == "add":
+            start, count = entry["start"], len(entry["payloads"])
+            rows = slice(start, start + count)
+            self._alive[rows] = True
+            for field, values in entry["fields"].items():
+                getattr(self, field)[rows] = values
+            del self._payloads[start:]
+            self._payloads.extend(entry["payloads"])
+            self._size = start + count
+        elif entry["op"] == "remove":
+            self._alive[entry["rows"]] = False
+        elif entry["op"] == "metadata":
+            for row, metadata in zip(entry["rows"], entry["metadata"]):
+                self._payloads[row] = {**self._payloads[row], "metadata": metadata}
+
+    def _load_snapshot(self) -> bool:
+        if not os.path.exists(self._meta_file):
+            return False
+        with open(self._meta_file, "rb") as f:
+            meta = pickle.load(f)
+        self._vectors_name = meta.get("vectors_file", "vectors.f32")
+        if meta["dim"] != self.dim or not os.path.exists(self._vectors_file):
+            return False
+
+        # The matrix file is sized to the capacity it was last grown to
+        capacity = os.path.getsize(self._vectors_file) // (4 * self.dim)
+        self._size = meta["size"]
+        self._vectors = np.memmap(self._vectors_file, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._alive[:self._size] = meta["alive"]
+        self._document_ids = np.full(capacity, None, dtype=object)
+        self._document_ids[:self._size] = meta["document_ids"]
+        self._user_ids = np.full(capacity, None, dtype=object)
+        self._user_ids[:self._size] = meta["user_ids"]
+        self._payloads = meta["payloads"]
+        self._restore_extra_meta(meta, capacity)
+
+        if os.path.exists(self._journal_file):
+            with open(self._journal_file, "rb") as f:
+                while True:
+                    try:
+                        self._replay(pickle.load(f))
+                    except EOFError:
+                        break
+                    except pickle.UnpicklingError:
+                        break  # torn last entry from a crash; the staleness check in load() catches the gap
+        return True
+
+    def _extra_meta(self) -> dict:
+        return {}
+
+    def _restore_extra_meta(self, meta: dict, capacity: int) -> None:
+        pass
+
+    async def load(self) -> None:
+        """Open the on-disk snapshot, rebuilding it from Mongo if it is missing or stale"""
+        try:
+            if self._load_snapshot():
+                stored = await self.collection.count_documents({})
+                if stored == int(self._alive.sum()):
+                    print(f"Local vector store loaded {stored} vectors from {self.path}")
+                    return
+                print(f"Local vector store snapshot is stale ({int(self._alive.sum())} vs {stored} chunks), rebuilding")
+        except Exception as e:
+            print(f"Local vector store snapshot unreadable ({e}), rebuilding")
+
+        await self.rebuild()
+
+    async def rebuild(self) -> None:
+        self._size = 0
+        self._layout += 1
+        self._payloads = []
+        self._vectors = np.zeros((0, self.dim), dtype=np.float32)
+        for field in self._row_fields:
+            setattr(self, field, getattr(self, field)[:0])
+        self._on_rebuild()
+
+        batch = []
+        cursor = self.collection.find({}, {
+            "content": 1, "metadata": 1, "document_id": 1, "user_id": 1,
+            "embedding": 1, "embedding_scale": 1, "embedding_format": 1
+        })
+        async for doc in cursor:
+            batch.append(doc)
+            if len(batch) >= 1000:
+                self._append(batch)
+                batch = []
+        if batch:
+            self._append(batch)
+        await self._persist()
+        print(f"Local vector store rebuilt with {self._size} vectors")
+
+    def _on_rebuild(self) -> None:
+        pass
+
+    # ---- writes ------------------------------------------------------
+
+    def _append(self, records: list[dict]) -> None:
+        records = [r for r in records if r.get("embedding") is not None]
+        if not records:
+            return
+        needed = self._size + len(records)
+        if needed > len(self._alive):
+            self._allocate(max(needed, len(self._alive) * 2))
+
+        # Accepts every stored format (double lists, BSON float32/int8 vectors, float16 bytes)
+        matrix = np.stack([decode_record(r) for r in records])
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        rows = slice(self._size, needed)
+        matrix = matrix / np.maximum(norms, 1e-12)
+        self._vectors[rows] = matrix
+        self._alive[rows] = True
+        self._document_ids[rows] = [r.get("document_id") for r in records]
+        self._user_ids[rows] = [r.get("user_id") for r in records]
+        self._payloads.extend({
+            "_id": r.get("_id"),
+            "document_id": r.get("document_id"),
+            "content": r.get("content"),
+            "metadata": r.get("metadata", {}),
+        } for r in records)
+        self._on_append(rows, matrix)
+        self._size = needed
+
+    def _on_append(self, rows: slice, matrix: np.ndarray) -> None:
+        """Hook for index structures built on top of the matrix"""
+        pass
+
+    def _add_entry(self, start: int) -> dict:
+        """Journal entry for the rows appended since `start`"""
+        rows = slice(start, self._size)
+        return {
+            "op": "add",
+            "start": start,
+            "payloads": self._payloads[start:self._size],
+            "fields": {field: getattr(self, field)[rows].copy() for field in self._row_fields if field != "_alive"},
+        }
+
+    async def add(self, records: list[dict]) -> None:
+        start = self._size
+        self._append(records)
+        if self._size > start:
+            await self._persist(self._add_entry(start), rows=self._size - start)
+
+    async def remove(self, document_id: str | None = None, chunk_ids: list | None = None) -> None:
+        if not self._size:
+            return
+        mask = np.zeros(self._size, dtype=bool)
+        if document_id is not None:
+            mask |= self._document_ids[:self._size] == document_id
+        if chunk_ids:
+            wanted = {str(cid) for cid in chunk_ids}
+            mask |= np.fromiter((str(p["_id"]) in wanted for p in self._payloads), dtype=bool, count=self._size)
+        mask &= self._alive[:self._size]
+        if not mask.any():
+            return
+        self._alive[:self._size][mask] = False
+
+        # Compact once tombstones dominate
+        dead = self._size - int(self._alive[:self._size].sum())
+        if dead > 1024 and dead > self._size // 4:
+            self._compact()
+            await self._persist()
+        else:
+            removed = np.flatnonzero(mask)
+            await self._persist({"op": "remove", "rows": removed}, rows=len(removed))
+
+    async def update_metadata(self, metadata_by_id: dict) -> None:
+        """Replace the payload metadata of live chunks, `metadata_by_id` maps str(_id) to the new metadata"""
+        rows = [int(row) for row in np.flatnonzero(self._alive[:self._size])
+                if str(self._payloads[row]["_id"]) in metadata_by_id]
+        if not rows:
+            return
+        metadata = [metadata_by_id[str(self._payloads[row]["_id"])] for row in rows]
+        self._replay({"op": "metadata", "rows": rows, "metadata": metadata})
+        await self._persist({"op": "metadata", "rows": rows, "metadata": metadata}, rows=len(rows))
+
+    def _compact(self) -> None:
+        keep = np.flatnonzero(self._alive[:self._size])
+        vectors = np.array(self._vectors[keep])
+        rows = {field: getattr(self, field)[keep] for field in self._row_fields}
+        payloads = [self._payloads[i] for i in keep]
+
+        self._size = 0
+        for field in self._row_fields:
+            setattr(self, field, getattr(self, field)[:0])
+        self._allocate(len(keep) * 2)
+
+        self._vectors[:len(keep)] = vectors
+        for field, values in rows.items():
+            getattr(self, field)[:len(keep)] = values
+        self._payloads = payloads
+        self._size = len(keep)
+        self._layout += 1
+        self._on_compact()
+
+    def _on_compact(self) -> None:
+        pass
+
+    # ---- reads -------------------------------------------------------
+
+    def _candidate_mask(self, filters: dict | None) -> np.ndarray:
+        mask = self._alive[:self._size].copy()
+        for field, value in (filters or {}).items():
+            if field == "document_id":
+                mask &= self._document_ids[:self._size] == value
+            elif field == "user_id":
+                mask &= self._user_ids[:self._size] == value
+            else:
+                raise ValueError(f"Unsupported local vector filter: {field}")
+        return mask
+
+    async def search(self, query_vector: list[float], limit: int, num_candidates: int | None = None,
+                     filters: dict | None = None, include_vectors: bool = False) -> list[dict]:
+        if not self._size:
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+        scores = self._vectors[:self._size] @ query
+        mask = self._candidate_mask(filters)
+        scores = np.where(mask, scores, -np.inf)
+
+        available = int(mask.sum())
+        k = min(limit, available)
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        return [self._result(i, float(scores[i]), include_vectors) for i in top]
+
+    def _result(self, row: int, score: float, include_vectors: bool) -> dict:
+        result = {**self._payloads[row], "score": score}
+        if include_vectors:
+            result["embedding"] = np.array(self._vectors[row])
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.name,
+            "vectors": int(self._alive[:self._size].sum()),
+            "tombstones": int(self._size - self._alive[:self._size].sum()),
+            "path": self.path
+        }
+
+
+class IVFVectorBackend(LocalVectorBackend):
+    """
+    Approximate nearest-neighbour search (IVF: inverted file over spherical k-means cells)
+    on top of the local memory-mapped store.
+    - Inserts are assigned to their nearest cell on write, deletes are tombstones.
+    - Centroids and cell assignments are part of the on-disk snapshot, so startup does not retrain.
+    - Recall/latency is tuned like Atlas numCandidates: a search probes enough cells to cover
+      roughly `num_candidates` vectors (at least IVF_MIN_NPROBE cells), then ranks them exactly.
+    - (Re)training runs in a background thread; searches keep using exact search (or the previous
+      centroids) until the new quantizer is swapped in.
+    Until IVF_TRAIN_MIN vectors exist it falls back to exact search.
+    """
+
+    name = "ivf"
+    _row_fields = {**LocalVectorBackend._row_fields, "_assignments": -1}
+
+    def __init__(self, collection, path: str | None = None, dim: int = 1536, nlist: int | None = None,
+                 min_nprobe: int | None = None, train_min: int | None = None) -> None:
+        super().__init__(collection, path=path or os.getenv("VECTOR_STORE_PATH", "./data/vector_store_ivf"), dim=dim)
+        self.nlist = int(nlist or os.getenv("IVF_NLIST", 0))  # 0 = derive from corpus size
+        self.min_nprobe = int(min_nprobe or os.getenv("IVF_MIN_NPROBE", 4))
+        self.train_min = int(train_min or os.getenv("IVF_TRAIN_MIN", 2000))
+        self._assignments = np.zeros(0, dtype=np.int32)
+        self._centroids = None
+        self._trained_size = 0
+        self._lists = None
+        self._training = None
+
+    # ---- training ----------------------------------------------------
+
+    @staticmethod
+    def _nearest(matrix: np.ndarray, centroids: np.ndarray, batch: int = 8192) -> np.ndarray:
+        out = np.empty(len(matrix), dtype=np.int32)
+        for start in range(0, len(matrix), batch):
+            out[start:start + batch] = np.argmax(matrix[start:start + batch] @ centroids.T, axis=1)
+        return out
+
+    def _assign(self, matrix: np.ndarray) -> np.ndarray:
+        return self._nearest(matrix, self._centroids)
+
+    def _fit(self, vectors, alive: np.ndarray, iterations: int = 10,
+             sample_size: int = 50000) -> tuple[np.ndarray, np.ndarray]:
+        """Spherical k-means over a sample of `alive` rows; returns (centroids, assignments of alive rows)"""
+        nlist = self.nlist or int(max(16, 4 * np.sqrt(len(alive))))
+        nlist = min(nlist, len(alive))
+        rng = np.random.default_rng(0)
+        sample = np.array(vectors[rng.choice(alive, size=min(sample_size, len(alive)), replace=False)])
+
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)]
+        for _ in range(iterations):
+            labels = self._nearest(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            counts = np.bincount(labels, minlength=nlist)
+            empty = counts == 0
+            # Re-seed empty cells with random samples
+            sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+            centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+
+        centroids = centroids.astype(np.float32)
+        return centroids, self._nearest(np.array(vectors[alive]), centroids)
+
+    async def train(self) -> None:
+        """
+        (Re)train the coarse quantizer on the live vectors in a worker thread and swap it in.
+        Searches keep using the previous quantizer (or exact search) until then; rows added meanwhile
+        are assigned at the swap, and a compaction during training restarts it.
+        """
+        while True:
+            alive = np.flatnonzero(self._alive[:self._size])
+            if len(alive) < self.train_min:
+                self._centroids = None
+                self._lists = None
+                return
+            layout, size = self._layout, self._size
+            centroids, assignments = await asyncio.to_thread(self._fit, self._vectors, alive)
+            if layout == self._layout:
+                break
+
+        self._centroids = centroids
+        self._assignments[:self._size] = -1
+        self._assignments[alive] = assignments
+        if self._size > size:
+            self._assignments[size:self._size] = self._assign(np.array(self._vectors[size:self._size]))
+        self._trained_size = len(alive)
+        self._lists = None
+        print(f"IVF index trained: {len(centroids)} cells over {len(alive)} vectors")
+
+    def _needs_training(self) -> bool:
+        alive = int(self._alive[:self._size].sum())
+        # Train once enough data exists, retrain when the corpus has grown 4x since
+        return (self._centroids is None and alive >= self.train_min) or \
+            (self._centroids is not None and alive > 4 * self._trained_size)
+
+    async def _train_in_background(self) -> None:
+        try:
+            await self.train()
+            await self._persist()  # every assignment changed
+        except Exception as e:
+            print(f"IVF training failed, still serving the previous index: {e}")
+        finally:
+            self._training = None
+
+    def _inverted_lists(self) -> list[np.ndarray]:
+        if self._lists is None:
+            assignments = self._assignments[:self._size]
+            order = np.argsort(assignments, kind="stable")
+            bounds = np.searchsorted(assignments[order], np.arange(len(self._centroids) + 1))
+            self._lists = [order[bounds[c]:bounds[c + 1]] for c in range(len(self._centroids))]
+        return self._lists
+
+    # ---- hooks -------------------------------------------------------
+
+    def _on_append(self, rows: slice, matrix: np.ndarray) -> None:
+        if self._centroids is not None:
+            self._assignments[rows] = self._assign(matrix)
+            self._lists = None
+
+    def _on_compact(self) -> None:
+        self._lists = None
+
+    def _on_rebuild(self) -> None:
+        self._centroids = None
+        self._lists = None
+
+    async def rebuild(self) -> None:
+        await super().rebuild()
+        await self.train()
+        await self._persist()
+
+    async def add(self, records: list[dict]) -> None:
+        start = self._size
+        self._append(records)
+        if self._size > start:
+            await self._persist(self._add_entry(start), rows=self._size - start)
+        # Training runs off the event loop and off the ingestion path
+        if self._training is None and self._needs_training():
+            self._training = asyncio.create_task(self._train_in_background())
+
+    def _extra_meta(self) -> dict:
+        return {
+            "assignments": self._assignments[:self._size].copy(),
+            "centroids": self._centroids,
+            "trained_size": self._trained_size,
+        }
+
+    def _restore_extra_meta(self, meta: dict, capacity: int) -> None:
+        self._assignments = np.full(capacity, -1, dtype=np.int32)
+        if "assignments" in meta:
+            self._assignments[:self._size] = meta["assignments"]
+        self._centroids = meta.get("centroids")
+        self._trained_size = meta.get("trained_size", 0)
+        self._lists = None
+
+    # ---- reads -------------------------------------------------------
+
+    async def search(self, query_vector: list[float], limit: int, num_candidates: int | None = None,
+                     filters: dict | None = None, include_vectors: bool = False) -> list[dict]:
+        if self._centroids is None or not self._size:
+            return await super().search(query_vector, limit, num_candidates=num_candidates, filters=filters,
+                                        include_vectors=include_vectors)
+
+        query = np.asarray(query_vector, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+        lists = self._inverted_lists()
+        average_list = max(1.0, self._size / len(lists))
+        wanted = max(num_candidates or limit * 10, limit)
+        nprobe = min(len(lists), max(self.min_nprobe, int(np.ceil(wanted / average_list))))
+
+        centroid_scores = self._centroids @ query
+        probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        candidates = np.concatenate([lists[c] for c in probe])
+        if not len(candidates):
+            return []
+
+        mask = self._candidate_mask(filters)[candidates]
+        candidates = candidates[mask]
+        if not len(candidates):
+            return []
+
+        scores = np.asarray(self._vectors[candidates]) @ query
+        k = min(limit, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        return [self._result(candidates[i], float(scores[i]), include_vectors) for i in top]
+
+    def stats(self) -> dict:
+        return {
+            **super().stats(),
+            "trained": self._centroids is not None,
+            "cells": 0 if self._centroids is None else len(self._centroids),
+            "min_nprobe": self.min_nprobe
+        }
+
+
+def create_vector_backend(collection):
+    """Pick the retrieval backend from VECTOR_BACKEND (atlas | local | ivf)"""
+    backend = os.getenv("VECTOR_BACKEND", "atlas").lower()
+    if backend == "local":
+        return LocalVectorBackend(collection)
+    if backend == "ivf":
+        return IVFVectorBackend(collection)
+    if backend != "atlas":
+        print(f"Unknown VECTOR_BACKEND '{backend}', falling back to atlas")
+    # Chunks written in a format Atlas cannot index would silently drop out of retrieval
+    check_backend_format("atlas")
+    return AtlasVectorBackend(collection)
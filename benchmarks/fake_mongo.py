@@ -0,0 +1,443 @@
+"""
+In-memory stand-in for the parts of Motor (AsyncIOMotorClient) the API uses, including a local
+`$vectorSearch` aggregation stage with exact cosine scoring, so the app can be driven without MongoDB.
+Query/update support is limited to the operators the backend issues; anything else raises NotImplementedError.
+"""
+import asyncio
+import copy
+from datetime import datetime
+from types import SimpleNamespace
+import numpy as np
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from backend.vector_codec import decode_record
+
+_MISSING = object()
+
+
+def _get(doc, path: str):
+    value = doc
+    for part in path.split("."):
+        if isinstance(value, dict) and part in value:
+            value = value[part]
+        else:
+            return _MISSING
+    return value
+
+
+def _set(doc, path: str, value) -> None:
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.setdefault(part, {})
+    doc[parts[-1]] = value
+
+
+def _unset(doc, path: str) -> None:
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(parts[-1], None)
+
+
+def _compare(value, op: str, operand) -> bool:
+    if op == "$exists":
+        return (value is not _MISSING) == bool(operand)
+    if op == "$in":
+        return _equals(value, operand)
+    if op == "$nin":
+        return not _equals(value, operand)
+    if op == "$eq":
+        return _equals(value, [operand])
+    if op == "$ne":
+        return not _equals(value, [operand])
+    if value is _MISSING or value is None:
+        return False
+    try:
+        if op == "$lt":
+            return value < operand
+        if op == "$lte":
+            return value <= operand
+        if op == "$gt":
+            return value > operand
+        if op == "$gte":
+            return value >= operand
+    except TypeError:
+        return False
+    raise NotImplementedError(f"Query operator {op} is not supported by the fake Mongo")
+
+
+def _equals(value, candidates) -> bool:
+    """True if the field value (or any element of an array value) equals one of the candidates"""
+    values = value if isinstance(value, list) else [value]
+    for candidate in candidates:
+        if candidate is None and value is _MISSING:
+            return True
+        if any(v == candidate for v in values if v is not _MISSING):
+            return True
+    return False
+
+
+def matches(doc: dict, query: dict | None) -> bool:
+    for key, condition in (query or {}).items():
+        if key == "$or":
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+        elif key == "$and":
+            if not all(matches(doc, sub) for sub in condition):
+                return False
+        elif isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition):
+            value = _get(doc, key)
+            if not all(_compare(value, op, operand) for op, operand in condition.items()):
+                return False
+        elif not _equals(_get(doc, key), [condition]):
+            return False
+    return True
+
+
+def project(doc: dict, projection: dict | None) -> dict:
+    if not projection:
+        return dict(doc)
+    included = {k for k, v in projection.items() if v and k != "_id"}
+    if included:
+        result = {k: doc[k] for k in included if k in doc}
+        if projection.get("_id", 1) and "_id" in doc:
+            result["_id"] = doc["_id"]
+        return result
+    return {k: v for k, v in doc.items() if projection.get(k, 1)}
+
+
+def apply_update(doc: dict, update: dict, inserting: bool = False) -> None:
+    for op, fields in update.items():
+        if op == "$set":
+            for path, value in fields.items():
+                _set(doc, path, copy.deepcopy(value))
+        elif op == "$setOnInsert":
+            if inserting:
+                for path, value in fields.items():
+                    _set(doc, path, copy.deepcopy(value))
+        elif op == "$inc":
+            for path, amount in fields.items():
+                current = _get(doc, path)
+                _set(doc, path, (0 if current is _MISSING else current) + amount)
+        elif op == "$unset":
+            for path in fields:
+                _unset(doc, path)
+        elif op == "$push":
+            for path, value in fields.items():
+                current = _get(doc, path)
+                items = [] if current is _MISSING else current
+                if isinstance(value, dict) and "$each" in value:
+                    items.extend(value["$each"])
+                else:
+                    items.append(value)
+                _set(doc, path, items)
+        else:
+            raise NotImplementedError(f"Update operator {op} is not supported by the fake Mongo")
+
+
+def _sort_key(value):
+    # Mixed/missing values sort first, like MongoDB's null ordering
+    if value is _MISSING or value is None:
+        return (0, 0)
+    if isinstance(value, datetime):
+        return (2, value.timestamp())
+    return (1, value)
+
+
+class FakeCursor:
+    def __init__(self, docs: list[dict]) -> None:
+        self._docs = docs
+        self._sort = []
+        self._skip = 0
+        self._limit = 0
+
+    def sort(self, key, direction=1):
+        self._sort = list(key) if isinstance(key, list) else [(key, direction)]
+        return self
+
+    def skip(self, count: int):
+        self._skip = count
+        return self
+
+    def limit(self, count: int):
+        self._limit = count
+        return self
+
+    def _results(self) -> list[dict]:
+        docs = self._docs
+        for key, direction in reversed(self._sort):
+            docs = sorted(docs, key=lambda d: _sort_key(_get(d, key)), reverse=direction == -1)
+        docs = docs[self._skip:]
+        return docs[:self._limit] if self._limit else docs
+
+    async def to_list(self, length=None):
+        await asyncio.sleep(0)
+        docs = self._results()
+        return docs[:length] if length else docs
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        await asyncio.sleep(0)
+        for doc in self._results():
+            yield doc
+
+
+class FakeCollection:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._docs = {}
+        self._version = 0
+        self._vector_cache = None
+        self.indexes = {}
+
+    def _touch(self) -> None:
+        self._version += 1
+
+    def _matching(self, query) -> list[dict]:
+        return [doc for doc in self._docs.values() if matches(doc, query)]
+
+    async def insert_one(self, document: dict, session=None):
+        await asyncio.sleep(0)
+        document.setdefault("_id", ObjectId())
+        if document["_id"] in self._docs:
+            raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name}")
+        self._docs[document["_id"]] = copy.deepcopy(document)
+        self._touch()
+        return SimpleNamespace(inserted_id=document["_id"], acknowledged=True)
+
+    async def insert_many(self, documents: list[dict], ordered: bool = True, session=None):
+        await asyncio.sleep(0)
+        inserted, errors = [], []
+        for index, document in enumerate(documents):
+            document.setdefault("_id", ObjectId())
+            if document["_id"] in self._docs:
+                errors.append({"index": index, "code": 11000, "errmsg": "E11000 duplicate key error"})
+                if ordered:
+                    break
+                continue
+            self._docs[document["_id"]] = copy.deepcopy(document)
+            inserted.append(document["_id"])
+        self._touch()
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(inserted)})
+        return SimpleNamespace(inserted_ids=inserted, acknowledged=True)
+
+    def find(self, query: dict | None = None, projection: dict | None = None, session=None) -> FakeCursor:
+        return FakeCursor([project(doc, projection) for doc in self._matching(query)])
+
+    async def find_one(self, query: dict | None = None, projection: dict | None = None, session=None):
+        await asyncio.sleep(0)
+        for doc in self._docs.values():
+            if matches(doc, query):
+                return project(doc, projection)
+        return None
+
+    async def count_documents(self, query: dict, limit: int = 0, session=None) -> int:
+        await asyncio.sleep(0)
+        count = len(self._matching(query)) if query else len(self._docs)
+        return min(count, limit) if limit else count
+
+    def _upsert(self, query: dict, update: dict) -> dict:
+        doc = {k: v for k, v in query.items() if not k.startswith("$") and not isinstance(v, dict)}
+        doc.setdefault("_id", ObjectId())
+        apply_update(doc, update, inserting=True)
+        self._docs[doc["_id"]] = doc
+        return doc
+
+    async def update_one(self, query: dict, update: dict, upsert: bool = False, session=None):
+        await asyncio.sleep(0)
+        for doc in self._docs.values():
+            if matches(doc, query):
+                apply_update(doc, update)
+                self._touch()
+                return SimpleNamespace(matched_count=1, modified_count=1, upserted_id=None)
+        if upsert:
+            doc = self._upsert(query, update)
+            self._touch()
+            return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=doc["_id"])
+        return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=None)
+
+    async def update_many(self, query: dict, update: dict, upsert: bool = False, session=None):
+        await asyncio.sleep(0)
+        docs = self._matching(query)
+        for doc in docs:
+            apply_update(doc, update)
+        if not docs and upsert:
+            self._upsert(query, update)
+        self._touch()
+        return SimpleNamespace(matched_count=len(docs), modified_count=len(docs), upserted_id=None)
+
+    async def create_index(self, keys, **options) -> str:
+        """Recorded only, nothing is enforced (TTL expiry included)"""
+        name = keys if isinstance(keys, str) else "_".join(f"{field}_{order}" for field, order in keys)
+        self.indexes[name] = options
+        return name
+
+    async def bulk_write(self, requests: list, ordered: bool = True, session=None):
+        """UpdateOne/UpdateMany operations only (what the app issues)"""
+        await asyncio.sleep(0)
+        modified = 0
+        for request in requests:
+            docs = self._matching(request._filter)
+            if isinstance(request, UpdateOne):
+                docs = docs[:1]
+            for doc in docs:
+                apply_update(doc, request._doc)
+            modified += len(docs)
+        self._touch()
+        return SimpleNamespace(matched_count=modified, modified_count=modified)
+
+    async def find_one_and_update(self, query: dict, update: dict, return_document=False, upsert: bool = False,
+                                  projection: dict | None = None, session=None):
+        await asyncio.sleep(0)
+        for doc in self._docs.values():
+            if matches(doc, query):
+                before = copy.deepcopy(doc)
+                apply_update(doc, update)
+                self._touch()
+                return project(doc if return_document else before, projection)
+        if upsert:
+            doc = self._upsert(query, update)
+            self._touch()
+            return project(doc, projection) if return_document else None
+        return None
+
+    async def delete_one(self, query: dict, session=None):
+        await asyncio.sleep(0)
+        for key, doc in self._docs.items():
+            if matches(doc, query):
+                del self._docs[key]
+                self._touch()
+                return SimpleNamespace(deleted_count=1)
+        return SimpleNamespace(deleted_count=0)
+
+    async def delete_many(self, query: dict, session=None):
+        await asyncio.sleep(0)
+        keys = [key for key, doc in self._docs.items() if matches(doc, query)]
+        for key in keys:
+            del self._docs[key]
+        self._touch()
+        return SimpleNamespace(deleted_count=len(keys))
+
+    def aggregate(self, pipeline: list[dict], session=None) -> FakeCursor:
+        docs = list(self._docs.values())
+        for stage in pipeline:
+            (name, spec), = stage.items()
+            if name == "$vectorSearch":
+                docs = self._vector_search(spec)
+            elif name == "$match":
+                docs = [doc for doc in docs if matches(doc, spec)]
+            elif name == "$addFields":
+                docs = [self._add_fields(doc, spec) for doc in docs]
+            elif name == "$project":
+                docs = [project(doc, spec) for doc in docs]
+            elif name == "$sort":
+                cursor = FakeCursor(docs).sort(list(spec.items()))
+                docs = cursor._results()
+            elif name == "$limit":
+                docs = docs[:spec]
+            elif name == "$skip":
+                docs = docs[spec:]
+            elif name == "$unwind":
+                field = (spec if isinstance(spec, str) else spec["path"]).lstrip("$")
+                unwound = []
+                for doc in docs:
+                    items = _get(doc, field)
+                    if isinstance(items, list):
+                        unwound.extend({**doc, field: item} for item in items)
+                docs = unwound
+            else:
+                raise NotImplementedError(f"Aggregation stage {name} is not supported by the fake Mongo")
+        return FakeCursor([{k: v for k, v in doc.items() if k != "__score"} for doc in docs])
+
+    def _add_fields(self, doc: dict, spec: dict) -> dict:
+        doc = dict(doc)
+        for field, expression in spec.items():
+            if isinstance(expression, dict) and expression.get("$meta") == "vectorSearchScore":
+                doc[field] = doc.get("__score")
+            elif isinstance(expression, str) and expression.startswith("$"):
+                value = _get(doc, expression[1:])
+                doc[field] = None if value is _MISSING else value
+            else:
+                doc[field] = expression
+        return doc
+
+    def _vectors(self, path: str):
+        """Decoded, normalised vectors of every document carrying `path`, cached until the next write"""
+        if self._vector_cache is None or self._vector_cache[0] != (self._version, path):
+            docs = [doc for doc in self._docs.values() if doc.get(path) is not None]
+            matrix = np.asarray([decode_record(doc) for doc in docs], dtype=np.float32) if docs else None
+            if matrix is not None:
+                matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+            self._vector_cache = ((self._version, path), docs, matrix)
+        return self._vector_cache[1], self._vector_cache[2]
+
+    def _vector_search(self, spec: dict) -> list[dict]:
+        """Exact cosine search standing in for Atlas' ANN `$vectorSearch` (scores mapped to (1 + cos) / 2)"""
+        docs, matrix = self._vectors(spec.get("path", "embedding"))
+        if matrix is None:
+            return []
+        query = np.asarray(spec["queryVector"], dtype=np.float32)
+        query /= max(float(np.linalg.norm(query)), 1e-12)
+        scores = (1.0 + matrix @ query) / 2.0
+
+        results = []
+        for index in np.argsort(-scores):
+            doc = docs[index]
+            if spec.get("filter") and not matches(doc, spec["filter"]):
+                continue
+            results.append({**doc, "__score": float(scores[index])})
+            if len(results) >= spec["limit"]:
+                break
+        return results
+
+
+class FakeDatabase:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._collections = {}
+
+    def __getitem__(self, name: str) -> FakeCollection:
+        if name not in self._collections:
+            self._collections[name] = FakeCollection(name)
+        return self._collections[name]
+
+    def __getattr__(self, name: str) -> FakeCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+
+class FakeSession:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def start_transaction(self):
+        # Writes are applied immediately; a failed block is not rolled back
+        return self
+
+
+class FakeMongoClient:
+    """Drop-in for AsyncIOMotorClient(uri); every database lives in this process"""
+
+    def __init__(self, *args, **kwargs) -> None:
+        self._databases = {}
+
+    def __getitem__(self, name: str) -> FakeDatabase:
+        if name not in self._databases:
+            self._databases[name] = FakeDatabase(name)
+        return self._databases[name]
+
+    async def start_session(self) -> FakeSession:
+        return FakeSession()
+
+    def close(self) -> None:
+        pass
@@ -0,0 +1,154 @@
+"""
+Deterministic stand-in for the AsyncOpenAI client used by backend/llm_gateway.py.
+Embeddings are feature-hashed bags of words (similar texts get similar vectors), chat answers are
+canned per pipeline stage, and every call sleeps for a configurable latency to model the network.
+"""
+import asyncio
+import hashlib
+import json
+from functools import lru_cache
+from types import SimpleNamespace
+import numpy as np
+from backend.bm25 import tokenize
+
+EMBEDDING_DIM = 1536
+
+_ANSWER_WORDS = (
+    "Leasing payments are recorded monthly and the lessee keeps the asset on the balance sheet "
+    "while VAT is charged on each instalment according to the contract schedule"
+).split()
+
+
+@lru_cache(maxsize=100_000)
+def _token_slot(token: str) -> tuple[int, float]:
+    digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+    value = int.from_bytes(digest, "little")
+    return value % EMBEDDING_DIM, 1.0 if value >> 63 else -1.0
+
+
+def fake_embedding(text: str) -> list[float]:
+    vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    for token in tokenize(text):
+        slot, sign = _token_slot(token)
+        vector[slot] += sign
+    if not vector.any():
+        seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=4).digest(), "little")
+        vector = np.random.default_rng(seed).standard_normal(EMBEDDING_DIM).astype(np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def _usage(prompt_tokens: int, completion_tokens: int = 0):
+    return SimpleNamespace(
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        total_tokens=prompt_tokens + completion_tokens,
+        prompt_tokens_details=SimpleNamespace(cached_tokens=0),
+    )
+
+
+def _estimate_tokens(messages) -> int:
+    return sum(len(str(m.get("content") or "")) for m in messages) // 4 + 3 * len(messages)
+
+
+class _Completions:
+    def __init__(self, owner) -> None:
+        self.owner = owner
+
+    def _reply(self, params) -> str:
+        messages = params["messages"]
+        system = " ".join(str(m.get("content")) for m in messages if m["role"] == "system")
+        question = next((str(m["content"]) for m in reversed(messages) if m["role"] == "user"), "")
+        if params.get("response_format", {}).get("type") == "json_object" or "Conversation Context Extractor" in system:
+            return json.dumps({"goal": question[:80], "constraints": [], "facts": [], "open_questions": [],
+                               "output_language": "en"})
+        if "related questions" in system:
+            return "\n".join([question, f"What are the rules for {question}", f"Examples of {question}"])
+        if "Query Enhancer" in system:
+            return question
+        return " ".join(_ANSWER_WORDS[i % len(_ANSWER_WORDS)] for i in range(self.owner.answer_tokens))
+
+    async def create(self, stream: bool = False, **params):
+        self.owner.calls["chat"] += 1
+        reply = self._reply(params)
+        prompt_tokens = _estimate_tokens(params["messages"])
+        completion_tokens = len(reply.split())
+        await asyncio.sleep(self.owner.chat_latency)
+
+        if not stream:
+            return SimpleNamespace(
+                choices=[SimpleNamespace(message=SimpleNamespace(content=reply), finish_reason="stop")],
+                usage=_usage(prompt_tokens, completion_tokens),
+            )
+
+        async def events():
+            for word in reply.split(" "):
+                if self.owner.token_latency:
+                    await asyncio.sleep(self.owner.token_latency)
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=word + " "))], usage=None)
+            if (params.get("stream_options") or {}).get("include_usage"):
+                yield SimpleNamespace(choices=[], usage=_usage(prompt_tokens, completion_tokens))
+
+        return events()
+
+
+class _Embeddings:
+    def __init__(self, owner) -> None:
+        self.owner = owner
+
+    async def create(self, model: str, input):
+        self.owner.calls["embedding"] += 1
+        texts = [input] if isinstance(input, str) else list(input)
+        await asyncio.sleep(self.owner.embedding_latency)
+        return SimpleNamespace(
+            data=[SimpleNamespace(index=i, embedding=fake_embedding(text)) for i, text in enumerate(texts)],
+            usage=_usage(sum(len(text) for text in texts) // 4),
+        )
+
+
+class _Speech:
+    def __init__(self, owner) -> None:
+        self.owner = owner
+
+    async def create(self, **params):
+        self.owner.calls["speech"] += 1
+        await asyncio.sleep(self.owner.speech_latency)
+        # Roughly the size of a 64 kbit/s mp3 of the text
+        audio = b"\xff\xfb" * (len(params.get("input", "")) * 40)
+        return SimpleNamespace(
+            content=audio,
+            iter_bytes=lambda chunk_size=1024: (audio[i:i + chunk_size] for i in range(0, len(audio), chunk_size)),
+        )
+
+
+class _Transcriptions:
+    def __init__(self, owner) -> None:
+        self.owner = owner
+
+    async def create(self, **params):
+        self.owner.calls["transcription"] += 1
+        await asyncio.sleep(self.owner.speech_latency)
+        return SimpleNamespace(text="What is the VAT rate on leasing payments?", language="english",
+                               duration=3.0, segments=[])
+
+
+class FakeOpenAI:
+    """Set as `gateway._client`; exposes chat.completions, embeddings, audio.speech and audio.transcriptions"""
+
+    def __init__(self, chat_latency: float = 0.05, token_latency: float = 0.0, embedding_latency: float = 0.02,
+                 speech_latency: float = 0.05, answer_tokens: int = 120) -> None:
+        self.chat_latency = chat_latency
+        self.token_latency = token_latency
+        self.embedding_latency = embedding_latency
+        self.speech_latency = speech_latency
+        self.answer_tokens = answer_tokens
+        self.calls = {"chat": 0, "embedding": 0, "speech": 0, "transcription": 0}
+
+        self.chat = SimpleNamespace(completions=_Completions(self))
+        self.embeddings = _Embeddings(self)
+        self.audio = SimpleNamespace(speech=_Speech(self), transcriptions=_Transcriptions(self))
+
+    def with_options(self, **options) -> "FakeOpenAI":
+        return self
+
+    async def close(self) -> None:
+        pass
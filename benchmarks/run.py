@@ -0,0 +1,357 @@
+"""
+Offline end-to-end benchmark of the API: chat, document upload and TTS chunks.
+
+The FastAPI app in backend/api.py is driven in-process through httpx's ASGI transport, with MongoDB replaced by
+benchmarks/fake_mongo.py (including `$vectorSearch`) and OpenAI by benchmarks/fake_openai.py, so it runs
+anywhere and only measures our own code plus the simulated OpenAI latency.
+
+Usage:
+    python -m benchmarks.run
+    python -m benchmarks.run --scenarios chat,tts --concurrency 1,8,32 --requests 64 --output bench.json
+    python -m benchmarks.run --baseline bench.json --max-regression 0.25   # exit 1 if p95 regressed
+    python -m benchmarks.run --types .pdf,.txt,.csv,.html                     # CSV/HTML need nltk data
+
+Exits 1 when any request failed, so a broken scenario cannot pass as a fast one.
+"""
+import argparse
+import asyncio
+import contextlib
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+QUESTIONS = [
+    "What is the VAT rate on leasing payments?",
+    "How is the residual value of a leased asset recorded?",
+    "Leasing sözleşmesinde erken fesih ücreti nasıl hesaplanır?",
+    "Who insures the asset during the operating lease?",
+    "When does the lessee start depreciating the asset?",
+    "KDV-2023/15 kapsamında hangi ödemeler vergilendirilir?",
+]
+
+TTS_TEXT = (
+    "Leasing payments are recorded monthly. The lessee keeps the asset on the balance sheet, "
+    "and VAT is charged on each instalment according to the contract schedule. "
+) * 4
+
+
+def log(message: str) -> None:
+    # stdout is silenced while the app runs, progress goes to stderr
+    print(message, file=sys.stderr, flush=True)
+
+
+def summarize(latencies: list[float], statuses: list[int], wall: float, concurrency: int) -> dict:
+    ok = [latency for latency, status in zip(latencies, statuses) if status < 400]
+    codes = {}
+    for status in statuses:
+        codes[str(status)] = codes.get(str(status), 0) + 1
+    result = {
+        "concurrency": concurrency,
+        "requests": len(statuses),
+        "ok": len(ok),
+        "errors": len(statuses) - len(ok),
+        "status_codes": codes,
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(ok) / wall, 2) if wall else 0.0,
+    }
+    if ok:
+        values = np.asarray(ok) * 1000
+        result["latency_ms"] = {
+            "mean": round(float(values.mean()), 2),
+            "p50": round(float(np.percentile(values, 50)), 2),
+            "p95": round(float(np.percentile(values, 95)), 2),
+            "p99": round(float(np.percentile(values, 99)), 2),
+            "max": round(float(values.max()), 2),
+        }
+    return result
+
+
+async def run_level(concurrency: int, total: int, make_request) -> tuple:
+    """Run `total` requests with `concurrency` workers; make_request(i) returns (status, extra)"""
+    latencies, statuses, extras = [], [], []
+    counter = iter(range(total))
+
+    async def worker():
+        for i in counter:
+            started = time.perf_counter()
+            try:
+                status, extra = await make_request(i)
+            except Exception as e:
+                status, extra = 599, {"exception": type(e).__name__}
+            latencies.append(time.perf_counter() - started)
+            statuses.append(status)
+            extras.append(extra)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    result = summarize(latencies, statuses, time.perf_counter() - started, concurrency)
+    return result, latencies, statuses, extras
+
+
+async def warm_up(args, make_request) -> None:
+    """Unmeasured requests paying one-off costs (lazy imports, model and tokenizer loading)"""
+    for i in range(args.warmup):
+        await make_request(i)
+
+
+async def bench_chat(http, args) -> list[dict]:
+    async def warmup_request(i):
+        response = await http.post("/conversations", json={"title": "warmup", "user_id": "bench"})
+        conversation_id = response.json()["conversation"]["conversation_id"]
+        await http.post(f"/chat/{conversation_id}",
+                        json={"conversation_id": conversation_id, "question": QUESTIONS[i % len(QUESTIONS)]})
+
+    await warm_up(args, warmup_request)
+    results = []
+    for concurrency in args.concurrency:
+        # One conversation per worker slot, so every level starts with first turns and continues with follow-ups
+        conversations = []
+        for i in range(concurrency):
+            response = await http.post("/conversations", json={"title": f"bench {i}", "user_id": "bench"})
+            conversations.append(response.json()["conversation"]["conversation_id"])
+
+        async def request(i):
+            conversation_id = conversations[i % concurrency]
+            question = QUESTIONS[i % len(QUESTIONS)]
+            response = await http.post(f"/chat/{conversation_id}",
+                                       json={"conversation_id": conversation_id, "question": question})
+            return response.status_code, {}
+
+        result, *_ = await run_level(concurrency, args.requests, request)
+        log(f"chat      c={concurrency:<3} {result.get('latency_ms')} {result['throughput_rps']} rps")
+        results.append(result)
+    return results
+
+
+async def wait_for_ingestion(http, document_id: str) -> str:
+    """Poll the document status until the background job has left the `processing` state"""
+    while True:
+        await asyncio.sleep(0.01)
+        status = (await http.get(f"/documents/{document_id}/status")).json()["status"]
+        if status != "processing":
+            return status
+
+
+async def bench_upload(http, args) -> list[dict]:
+    from benchmarks.samples import sample_document
+
+    extensions = sorted(args.types)
+    # Every upload gets content of its own, otherwise the parse cache and the chunk embedding store
+    # would answer all but the first upload of each type
+    variants = itertools.count(1)
+
+    async def request(i):
+        ext = extensions[i % len(extensions)]
+        payload = sample_document(ext, args.document_size, variant=next(variants))
+        started = time.perf_counter()
+        response = await http.post("/upload-document", files={
+            "file": (f"bench_{i}{ext}", payload, "application/octet-stream")
+        })
+        extra = {"type": ext, "accept_ms": (time.perf_counter() - started) * 1000}
+        if response.status_code != 200:
+            return response.status_code, extra
+        # Ingestion runs in the background: measure until parsing, embedding and indexing are done
+        status = await wait_for_ingestion(http, response.json()["document_id"])
+        return (500 if status == "error" else 200), extra
+
+    await warm_up(args, request)
+    results = []
+    for concurrency in args.concurrency:
+        result, latencies, statuses, extras = await run_level(concurrency, args.upload_requests, request)
+        by_type = {}
+        for ext in extensions:
+            picked = [(l, s) for l, s, e in zip(latencies, statuses, extras) if e.get("type") == ext]
+            if picked:
+                summary = summarize([l for l, _ in picked], [s for _, s in picked], result["wall_seconds"], concurrency)
+                by_type[ext] = {k: summary[k] for k in ("requests", "ok", "errors", "latency_ms") if k in summary}
+        result["by_type"] = by_type
+        accepted = [e["accept_ms"] for e in extras if "accept_ms" in e]
+        if accepted:
+            result["accept_latency_ms"] = {"p50": round(float(np.percentile(accepted, 50)), 2),
+                                           "p95": round(float(np.percentile(accepted, 95)), 2)}
+        log(f"upload    c={concurrency:<3} {result.get('latency_ms')} {result['throughput_rps']} rps")
+        results.append(result)
+    return results
+
+
+async def bench_tts(http, args) -> list[dict]:
+    async def request(i):
+        response = await http.post("/voice/text-to-speech/chunk/0",
+                                   json={"text": TTS_TEXT, "language": "auto", "voice": "nova"})
+        return response.status_code, {}
+
+    await warm_up(args, request)
+    results = []
+    for concurrency in args.concurrency:
+        result, *_ = await run_level(concurrency, args.requests, request)
+        log(f"tts       c={concurrency:<3} {result.get('latency_ms')} {result['throughput_rps']} rps")
+        results.append(result)
+    return results
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def compare(results: dict, baseline: dict, max_regression: float) -> list[str]:
+    """p95 regressions beyond the allowed ratio, per scenario and concurrency level"""
+    regressions = []
+    for scenario, levels in results["scenarios"].items():
+        previous = {level["concurrency"]: level for level in baseline.get("scenarios", {}).get(scenario, [])}
+        for level in levels:
+            before = previous.get(level["concurrency"], {}).get("latency_ms", {}).get("p95")
+            after = level.get("latency_ms", {}).get("p95")
+            if before and after and after > before * (1 + max_regression):
+                regressions.append(f"{scenario} c={level['concurrency']}: p95 {before} ms -> {after} ms")
+    return regressions
+
+
+def failed_levels(results: dict) -> list[str]:
+    """Scenario levels with failed requests; their latencies would not describe a working system"""
+    return [f"{scenario} c={level['concurrency']}: {level['errors']} of {level['requests']} ({level['status_codes']})"
+            for scenario, levels in results["scenarios"].items() for level in levels if level["errors"]]
+
+
+async def main(args) -> dict:
+    workdir = tempfile.mkdtemp(prefix="rag-bench-")
+    # Configuration must be in place before backend modules read it at import time
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    os.environ.setdefault("MONGO_URI", "mongodb://benchmark")
+    os.environ["VECTOR_BACKEND"] = args.vector_backend
+    os.environ["VECTOR_STORE_PATH"] = os.path.join(workdir, "vector_store")
+    os.environ["INGESTION_SPOOL_DIR"] = os.path.join(workdir, "uploads")
+    os.environ["PARSE_CACHE_DIR"] = os.path.join(workdir, "parse_cache")
+
+    import motor.motor_asyncio
+    import httpx
+    from benchmarks.fake_mongo import FakeMongoClient
+    from benchmarks.fake_openai import FakeOpenAI
+    from benchmarks.samples import write_samples
+
+    motor.motor_asyncio.AsyncIOMotorClient = FakeMongoClient
+    from backend import api
+    from backend.llm_gateway import gateway
+
+    fake_openai = FakeOpenAI(
+        chat_latency=args.chat_latency,
+        token_latency=args.token_latency,
+        embedding_latency=args.embedding_latency,
+        speech_latency=args.speech_latency,
+        answer_tokens=args.answer_tokens,
+    )
+    gateway._client = fake_openai
+    samples = write_samples(os.path.join(workdir, "samples"), size=args.document_size, types=args.types)
+
+    results = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "config": {
+            "scenarios": args.scenarios,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "upload_requests": args.upload_requests,
+            "seed_documents": args.seed_documents,
+            "warmup": args.warmup,
+            "vector_backend": args.vector_backend,
+            "types": args.types,
+            "chat_latency": args.chat_latency,
+            "token_latency": args.token_latency,
+            "embedding_latency": args.embedding_latency,
+            "speech_latency": args.speech_latency,
+            "answer_tokens": args.answer_tokens,
+        },
+        "scenarios": {},
+    }
+
+    transport = httpx.ASGITransport(app=api.app)
+    with contextlib.redirect_stdout(None if args.verbose else open(os.devnull, "w")):
+        # ASGITransport does not run the lifespan, enter it by hand
+        async with api.lifespan(api.app):
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as http:
+                if "chat" in args.scenarios:
+                    # Give retrieval something to find
+                    for i in range(args.seed_documents):
+                        ext = sorted(samples)[i % len(samples)]
+                        response = await http.post("/upload-document", files={
+                            "file": (f"seed_{i}{ext}", open(samples[ext], "rb").read(), "application/octet-stream")
+                        })
+                        await wait_for_ingestion(http, response.json()["document_id"])
+                    results["scenarios"]["chat"] = await bench_chat(http, args)
+                if "upload" in args.scenarios:
+                    results["scenarios"]["upload"] = await bench_upload(http, args)
+                if "tts" in args.scenarios:
+                    results["scenarios"]["tts"] = await bench_tts(http, args)
+
+            # Background work (verification, state updates) is not part of the measurement
+            pending = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    results["openai_calls"] = dict(fake_openai.calls)
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline latency/throughput benchmark for the RAG API")
+    parser.add_argument("--scenarios", default="chat,upload,tts",
+                        type=lambda v: [s.strip() for s in v.split(",") if s.strip()])
+    parser.add_argument("--concurrency", default="1,4,16", type=lambda v: [int(c) for c in v.split(",")])
+    parser.add_argument("--requests", type=int, default=48, help="chat/TTS requests per concurrency level")
+    parser.add_argument("--upload-requests", type=int, default=12, help="uploads per concurrency level")
+    parser.add_argument("--seed-documents", type=int, default=4, help="documents uploaded before the chat runs")
+    parser.add_argument("--warmup", type=int, default=2, help="unmeasured requests before each scenario")
+    parser.add_argument("--document-size", type=int, default=1, help="scales the sample documents")
+    # The CSV and HTML loaders fetch nltk data on first use, so they are only offline once it is installed
+    parser.add_argument("--types", default=".pdf,.txt", help="uploaded file types (.pdf,.txt,.csv,.html)",
+                        type=lambda v: [t.strip() for t in v.split(",") if t.strip()])
+    parser.add_argument("--vector-backend", default="atlas", choices=["atlas", "local", "ivf"])
+    parser.add_argument("--chat-latency", type=float, default=0.05, help="seconds per fake chat completion")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="seconds per streamed token")
+    parser.add_argument("--embedding-latency", type=float, default=0.02, help="seconds per fake embeddings call")
+    parser.add_argument("--speech-latency", type=float, default=0.05, help="seconds per fake TTS/STT call")
+    parser.add_argument("--answer-tokens", type=int, default=120)
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    parser.add_argument("--baseline", help="previous results to compare p95 latencies against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="allowed p95 growth ratio")
+    parser.add_argument("--verbose", action="store_true", help="keep the application's own output")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    results = asyncio.run(main(args))
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.max_regression)
+        results["regressions"] = regressions
+
+    report = json.dumps(results, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+        log(f"Results written to {args.output}")
+    else:
+        print(report)
+
+    failed = failed_levels(results)
+    if failed:
+        log("requests failed: " + "; ".join(failed))
+    if args.baseline and results["regressions"]:
+        log("p95 regressions: " + "; ".join(results["regressions"]))
+    if failed or (args.baseline and results["regressions"]):
+        sys.exit(1)
@@ -0,0 +1,127 @@
+"""
+Deterministic sample documents (PDF, TXT, CSV, HTML) about leasing, generated on the fly
+so the benchmark needs no binary fixtures in the repository.
+"""
+import csv
+import html
+import io
+import os
+import random
+
+_SUBJECTS = ["The lessee", "The lessor", "The leasing company", "The customer", "Finansal kiralama şirketi"]
+_VERBS = ["pays", "records", "reports", "invoices", "depreciates", "insures", "öder", "kaydeder"]
+_OBJECTS = [
+    "the monthly instalment", "the VAT on each payment", "the residual value", "the asset on its balance sheet",
+    "the interest component", "the early termination fee", "KDV-2023/15 kapsamındaki vergi", "the operating lease",
+]
+_QUALIFIERS = [
+    "according to the contract schedule", "under article 12 of the leasing law", "before the end of the term",
+    "when the asset is delivered", "at the start of each fiscal year", "sözleşme süresince",
+]
+
+
+def paragraphs(count: int, seed: int = 7) -> list[str]:
+    rng = random.Random(seed)
+    result = []
+    for _ in range(count):
+        sentences = [
+            f"{rng.choice(_SUBJECTS)} {rng.choice(_VERBS)} {rng.choice(_OBJECTS)} {rng.choice(_QUALIFIERS)}."
+            for _ in range(rng.randint(4, 8))
+        ]
+        result.append(" ".join(sentences))
+    return result
+
+
+def _pdf_escape(text: str) -> str:
+    # Built-in fonts only cover Latin-1
+    text = text.encode("latin-1", "replace").decode("latin-1")
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def build_pdf(pages: list[list[str]]) -> bytes:
+    """Minimal multi-page PDF with one Helvetica text line per entry"""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for lines in pages:
+        stream = "BT /F1 10 Tf 14 TL 50 780 Td " + " ".join(f"({_pdf_escape(line)}) '" for line in lines) + " ET"
+        content = f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream".encode("latin-1")
+        objects.append(content)
+        content_id = len(objects)
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] /Resources << /Font << /F1 3 0 R >> >> "
+            f"/Contents {content_id} 0 R >>".encode("latin-1")
+        )
+        page_ids.append(len(objects))
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode("latin-1")
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(f"{number} 0 obj\n".encode() + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    for offset in offsets:
+        out.write(f"{offset:010d} 00000 n \n".encode())
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    return out.getvalue()
+
+
+def _wrap(text: str, width: int = 95) -> list[str]:
+    lines, line = [], ""
+    for word in text.split():
+        if len(line) + len(word) + 1 > width:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}".strip()
+    return lines + [line] if line else lines
+
+
+SAMPLE_TYPES = (".pdf", ".txt", ".csv", ".html")
+_SAMPLE_NAMES = {".pdf": "leasing_contract.pdf", ".txt": "leasing_guide.txt", ".csv": "leasing_payments.csv",
+                 ".html": "leasing_faq.html"}
+
+
+def sample_document(extension: str, size: int = 1, variant: int = 0) -> bytes:
+    """
+    One sample file of the given type; `size` scales the amount of text and every `variant`
+    has different content, so repeated uploads are not served from the parse or embedding caches.
+    """
+    text = paragraphs(12 * size, seed=7 + variant)
+
+    if extension == ".txt":
+        return "\n\n".join(text).encode("utf-8")
+
+    if extension == ".csv":
+        rng = random.Random(11 + variant)
+        out = io.StringIO(newline="")
+        writer = csv.writer(out)
+        writer.writerow(["contract", "month", "instalment", "vat", "note"])
+        for row in range(40 * size):
+            writer.writerow([f"KDV-2023/{row % 30}", row % 12 + 1, rng.randint(1000, 9000),
+                             rng.choice([1, 10, 20]), rng.choice(_QUALIFIERS)])
+        return out.getvalue().encode("utf-8")
+
+    if extension == ".html":
+        body = "".join(f"<h2>Question {i + 1}</h2><p>{html.escape(p)}</p>" for i, p in enumerate(text))
+        return f"<html><head><title>Leasing FAQ</title></head><body>{body}</body></html>".encode("utf-8")
+
+    if extension == ".pdf":
+        lines = [line for paragraph in text for line in _wrap(paragraph) + [""]]
+        return build_pdf([lines[i:i + 50] for i in range(0, len(lines), 50)])
+
+    raise ValueError(f"No sample for {extension}")
+
+
+def write_samples(directory: str, size: int = 1, types=SAMPLE_TYPES) -> dict[str, str]:
+    """Write one file per requested type; `size` scales the amount of text. Returns {extension: path}"""
+    os.makedirs(directory, exist_ok=True)
+    files = {}
+    for extension in types:
+        files[extension] = os.path.join(directory, _SAMPLE_NAMES[extension])
+        with open(files[extension], "wb") as f:
+            f.write(sample_document(extension, size))
+    return files
@@ -122,7 +122,7 @@ const DocumentUploadPanel = () => {
                 chunks: statusData.chunks_count || f.chunks,
                 currentChunks: statusData.current_chunks || 0,
                 error: statusData.error_message,
-                progressPercentage: getProgressPercentage(statusData.status)
+                progressPercentage: statusData.progress_percentage ?? getProgressPercentage(statusData.status)
               }
             : f
         ));
@@ -347,16 +347,18 @@ const DocumentUploadPanel = () => {
   const deleteFile = async (fileId, documentId) => {
     try {
       if (documentId) {
-        // Stop polling for this document
-        stopPollingForDocument(documentId);
-
         const response = await fetch(`${API_BASE_URL}/documents/${documentId}`, {
           method: 'DELETE'
         });
         
         if (!response.ok) {
-          throw new Error('Failed to delete from server');
+          // 409 while the document is still being ingested: keep polling, it can be deleted once ready
+          const errorData = await response.json().catch(() => ({}));
+          throw new Error(errorData.detail || 'Failed to delete from server');
         }
+
+        // Stop polling for this document
+        stopPollingForDocument(documentId);
       }
       
       setUploadedFiles(prev => prev.filter(f => f.id !== fileId));
@@ -364,7 +366,7 @@ const DocumentUploadPanel = () => {
       
     } catch (error) {
       console.error('Delete error:', error);
-      showNotification('Failed to delete document', 'error');
+      showNotification(`Failed to delete document: ${error.message}`, 'error');
     }
   };
 
@@ -0,0 +1,57 @@
+import asyncio
+import contextlib
+import os
+import tempfile
+
+import pytest
+
+# Backend modules read their configuration at import time, so it has to be in place first
+_WORKDIR = tempfile.mkdtemp(prefix="rag-tests-")
+os.environ.update({
+    "OPENAI_API_KEY": "test",
+    "MONGO_URI": "mongodb://test",
+    "VECTOR_BACKEND": "local",
+    "VECTOR_STORE_PATH": os.path.join(_WORKDIR, "vector_store"),
+    "INGESTION_SPOOL_DIR": os.path.join(_WORKDIR, "uploads"),
+    "PARSE_CACHE_DIR": os.path.join(_WORKDIR, "parse_cache"),
+})
+
+
+@pytest.fixture(scope="session")
+def api():
+    """backend.api on top of the in-memory MongoDB stand-in used by the benchmarks"""
+    import motor.motor_asyncio
+    from benchmarks.fake_mongo import FakeMongoClient
+    motor.motor_asyncio.AsyncIOMotorClient = FakeMongoClient
+    from backend import api
+    return api
+
+
+@pytest.fixture
+def running_app(api):
+    """`async with running_app() as http:` runs the app lifespan with a fake OpenAI client"""
+    import httpx
+    from benchmarks.fake_openai import FakeOpenAI
+    from backend.llm_gateway import gateway
+
+    @contextlib.asynccontextmanager
+    async def run(**fake_options):
+        gateway._client = FakeOpenAI(**fake_options)
+        async with api.lifespan(api.app):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app), base_url="http://test") as http:
+                yield http
+
+    return run
+
+
+@pytest.fixture
+def wait_for_ingestion():
+    """`await wait_for_ingestion(http, document_id)` polls until the document left the processing states"""
+    async def wait(http, document_id: str) -> dict:
+        while True:
+            status = (await http.get(f"/documents/{document_id}/status")).json()
+            if status["status"] not in ("processing", "processing_index"):
+                return status
+            await asyncio.sleep(0.01)
+
+    return wait
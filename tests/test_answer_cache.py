@@ -0,0 +1,47 @@
+import asyncio
+
+from benchmarks.fake_mongo import FakeCollection
+from backend.answer_cache import AnswerCache
+
+
+def make_cache(collection, state):
+    cache = AnswerCache(collection=collection, state_collection=state, threshold=0.95)
+    cache.enabled = True
+    return cache
+
+
+def test_similar_query_with_same_chunks_is_served():
+    cache = make_cache(FakeCollection("answer_cache"), FakeCollection("corpus_state"))
+
+    async def run():
+        await cache.store("vat on leasing?", [1.0, 0.0], ["c2", "c1"], "en", "18%", ["c1", "c2"])
+        hit = await cache.lookup([0.99, 0.05], ["c1", "c2"], "en")
+        other_chunks = await cache.lookup([0.99, 0.05], ["c1"], "en")
+        other_language = await cache.lookup([0.99, 0.05], ["c1", "c2"], "tr")
+        far = await cache.lookup([0.0, 1.0], ["c1", "c2"], "en")
+        return hit, other_chunks, other_language, far
+
+    hit, other_chunks, other_language, far = asyncio.run(run())
+    assert hit["answer"] == "18%" and hit["similarity"] > 0.95
+    assert other_chunks is None and other_language is None and far is None
+
+
+def test_corpus_change_in_another_worker_drops_entries():
+    collection, state = FakeCollection("answer_cache"), FakeCollection("corpus_state")
+    worker_a = make_cache(collection, state)
+    worker_b = make_cache(collection, state)
+
+    async def run():
+        await worker_a.store("vat on leasing?", [1.0, 0.0], ["c1"], "en", "18%", ["c1"])
+        shared = await worker_b.lookup([1.0, 0.0], ["c1"], "en")
+        # An upload handled by worker B bumps the corpus version in corpus_state
+        await worker_b.invalidate()
+        stale = await worker_a.lookup([1.0, 0.0], ["c1"], "en")
+        version = (await state.find_one({"_id": "corpus"}))["version"]
+        return shared, stale, version
+
+    shared, stale, version = asyncio.run(run())
+    assert shared["answer"] == "18%"
+    assert stale is None
+    assert version == 1
+    assert worker_a.stats()["entries"] == 0
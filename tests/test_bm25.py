@@ -0,0 +1,95 @@
+from backend.bm25 import BM25Index, tokenize
+
+
+def test_tokenize_lowercases_words():
+    assert tokenize("The Lessee PAYS") == ["the", "lessee", "pays"]
+
+
+def test_tokenize_folds_every_i_variant():
+    # English capital I, Turkish dotted İ and dotless ı all meet on "i"
+    assert tokenize("INVOICE") == ["invoice"]
+    assert tokenize("İNDİRİM") == tokenize("indirim") == tokenize("ındırım") == ["indirim"]
+
+
+def test_tokenize_indexes_codes_whole_and_by_part():
+    assert tokenize("KDV-2023/15 madde.12") == ["kdv-2023/15", "kdv", "2023", "15", "madde.12", "madde", "12"]
+
+
+def test_tokenize_empty():
+    assert tokenize("") == []
+    assert tokenize(None) == []
+
+
+def test_search_ranks_matching_chunk_first():
+    index = BM25Index()
+    index.enabled = True
+    index.add([
+        {"_id": 1, "document_id": "a", "content": "VAT is charged on each leasing instalment"},
+        {"_id": 2, "document_id": "b", "content": "The lessee insures the asset"},
+    ])
+    results = index.search("VAT instalment")
+    assert [r["_id"] for r in results] == [1]
+
+    index.remove(chunk_ids=[1])
+    assert index.search("VAT") == []
+
+
+class _SlowCursor:
+    """Async cursor over chunk records that lets the test act between batches"""
+
+    def __init__(self, records, between=None):
+        self.records = records
+        self.between = between
+
+    def find(self, *args, **kwargs):
+        return self
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for position, record in enumerate(self.records):
+            if position and self.between:
+                await self.between(position)
+            yield record
+
+
+def test_load_keeps_serving_the_old_index_until_the_swap():
+    import asyncio
+
+    index = BM25Index()
+    index.enabled = True
+    index.add([{"_id": "old", "document_id": "a", "content": "lease payment schedule"}])
+    seen = []
+
+    async def between(position):
+        seen.append([hit["_id"] for hit in index.search("lease")])
+        await asyncio.sleep(0)
+
+    records = [{"_id": f"new-{i}", "document_id": "b", "content": "lease terms"} for i in range(3)]
+    asyncio.run(index.load(_SlowCursor(records, between)))
+    assert seen == [["old"], ["old"]]
+    assert sorted(hit["_id"] for hit in index.search("lease")) == ["new-0", "new-1", "new-2"]
+
+
+def test_changes_during_load_survive_the_swap():
+    import asyncio
+
+    index = BM25Index()
+    index.enabled = True
+
+    async def between(position):
+        if position == 1:
+            # An upload finishing and a delete landing while the rebuild reads the collection
+            index.add([{"_id": "added", "document_id": "c", "content": "invoice reminder"}])
+            index.remove(chunk_ids=["gone"])
+            index.update_metadata({"kept": {"title": "renamed"}})
+
+    records = [
+        {"_id": "kept", "document_id": "a", "content": "invoice due", "metadata": {"title": "old"}},
+        {"_id": "gone", "document_id": "b", "content": "invoice overdue"},
+    ]
+    asyncio.run(index.load(_SlowCursor(records, between)))
+    hits = {hit["_id"]: hit for hit in index.search("invoice")}
+    assert set(hits) == {"kept", "added"}
+    assert hits["kept"]["metadata"] == {"title": "renamed"}
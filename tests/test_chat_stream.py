@@ -0,0 +1,44 @@
+import asyncio
+import json
+
+from benchmarks.samples import sample_document
+
+
+def parse_sse(body: str) -> list[tuple[str, dict]]:
+    events = []
+    for frame in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in frame.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_stream_sends_chunks_then_tokens_then_done(api, running_app, wait_for_ingestion):
+    async def run():
+        async with running_app(answer_tokens=12) as http:
+            uploaded = await http.post("/upload-document",
+                                       files={"file": ("lease.txt", sample_document(".txt", size=4, variant=7))})
+            await wait_for_ingestion(http, uploaded.json()["document_id"])
+            conversation = (await http.post("/conversations", json={"title": "VAT", "user_id": "u1"})).json()["conversation"]
+            conversation_id = conversation["conversation_id"]
+            response = await http.post(f"/chat/{conversation_id}/stream", json={
+                "conversation_id": conversation_id, "question": "How is VAT charged on leasing payments?"})
+            stored = await api.db.messages.find({"conversation_id": conversation_id}).to_list(None)
+            return response, stored
+
+    response, stored = asyncio.run(run())
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = parse_sse(response.text)
+    names = [name for name, _ in events]
+    assert names[0] == "chunks" and names[-1] == "done"
+    assert set(names[1:-1]) == {"token"}
+    assert events[0][1]["sources"]
+
+    answer = "".join(data["text"] for name, data in events if name == "token")
+    assert len(answer.split()) == 12
+    done = events[-1][1]
+    assert done["from_cache"] is False
+    messages = {message["message_id"]: message for message in stored}
+    assert messages[done["assistant_message_id"]]["content"] == answer
+    assert done["user_message_id"] in messages
@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from benchmarks.fake_mongo import FakeCollection
+from benchmarks.fake_openai import FakeOpenAI
+from backend.embedder import Embedder
+from backend.embedding_cache import EmbeddingCache
+from backend.llm_gateway import gateway
+
+
+@pytest.fixture
+def fake_openai():
+    previous = gateway._client
+    gateway._client = FakeOpenAI(embedding_latency=0)
+    yield gateway._client
+    gateway._client = previous
+
+
+def make_embedder(collection):
+    store = EmbeddingCache(max_entries=10, collection=collection, touch_on_hit=True)
+    return Embedder(cache=EmbeddingCache(max_entries=10), chunk_store=store)
+
+
+def test_repeated_chunks_are_embedded_once(fake_openai):
+    embedder = make_embedder(FakeCollection("chunk_embedding_store"))
+    chunks = ["lessee pays monthly", "vat applies", "lessee pays monthly"]
+
+    vectors = asyncio.run(embedder.aembed_chunks(chunks))
+    assert vectors[0] == vectors[2] and vectors[0] != vectors[1]
+    assert embedder.last_stats["chunks"] == 2 and embedder.last_stats["reused"] == 0
+
+
+def test_reuploaded_chunks_come_from_the_store(fake_openai):
+    collection = FakeCollection("chunk_embedding_store")
+    first_upload = ["lessee pays monthly", "vat applies"]
+    second_upload = ["vat applies", "a new annex", "lessee pays monthly"]
+
+    first = asyncio.run(make_embedder(collection).aembed_chunks(first_upload))
+    calls = fake_openai.calls["embedding"]
+    # Another worker (empty memory tier) embedding a revised version of the document
+    embedder = make_embedder(collection)
+    second = asyncio.run(embedder.aembed_chunks(second_upload))
+
+    assert second[0] == first[1] and second[2] == first[0]
+    assert embedder.last_stats["reused"] == 2 and embedder.last_stats["chunks"] == 1
+    assert fake_openai.calls["embedding"] == calls + 1
+
+
+def test_fully_stored_upload_makes_no_calls(fake_openai):
+    collection = FakeCollection("chunk_embedding_store")
+    chunks = ["lessee pays monthly", "vat applies"]
+    asyncio.run(make_embedder(collection).aembed_chunks(chunks))
+    calls = fake_openai.calls["embedding"]
+
+    embedder = make_embedder(collection)
+    asyncio.run(embedder.aembed_chunks(chunks))
+    assert fake_openai.calls["embedding"] == calls
+    assert embedder.last_stats == {"chunks": 0, "tokens": 0, "batches": 0, "retries": 0, "seconds": 0.0, "reused": 2}
@@ -0,0 +1,70 @@
+import asyncio
+
+from bson import ObjectId
+from pymongo.errors import AutoReconnect
+
+from benchmarks.fake_mongo import FakeCollection
+from backend.chunk_writer import ChunkWriter
+
+
+def records(count: int) -> list[dict]:
+    return [{"content": f"chunk {i}"} for i in range(count)]
+
+
+def test_batches_are_bounded_by_count_and_bytes():
+    writer = ChunkWriter(FakeCollection("embeddings"), max_docs=5, max_bytes=10_000)
+    assert [len(batch) for batch in writer.split(records(12))] == [5, 5, 2]
+    large = [{"content": "x" * 4000} for _ in range(5)]
+    assert [len(batch) for batch in writer.split(large)] == [2, 2, 1]
+
+
+def test_duplicate_does_not_stop_the_rest_of_its_batch():
+    collection = FakeCollection("embeddings")
+    batch = records(12)
+    batch[7]["_id"] = "taken"
+
+    async def run():
+        await collection.insert_one({"_id": "taken", "content": "already there"})
+        inserted, failures = await ChunkWriter(collection, max_docs=5).write(batch)
+        return inserted, failures, await collection.count_documents({})
+
+    inserted, failures, stored = asyncio.run(run())
+    assert len(inserted) == 11 and stored == 12
+    assert failures == [{"index": 7, "code": 11000, "error": "E11000 duplicate key error"}]
+
+
+def _dropping_connection(collection, applied: int):
+    """insert_many that writes the first `applied` records, then loses the connection"""
+    insert_many = collection.insert_many
+
+    async def flaky(documents, ordered=True, session=None):
+        for document in documents:
+            document.setdefault("_id", ObjectId())
+        await insert_many(documents[:applied], ordered=ordered)
+        raise AutoReconnect("connection reset")
+
+    return flaky
+
+
+def test_partial_write_without_error_details_is_checked_against_the_collection():
+    collection = FakeCollection("embeddings")
+    collection.insert_many = _dropping_connection(collection, applied=3)
+
+    inserted, failures = asyncio.run(ChunkWriter(collection).write(records(6)))
+    assert [record["content"] for record in inserted] == ["chunk 0", "chunk 1", "chunk 2"]
+    assert [failure["index"] for failure in failures] == [3, 4, 5]
+    assert failures[0]["code"] is None and "connection reset" in failures[0]["error"]
+
+
+def test_unverifiable_partial_write_reports_the_whole_batch(capsys):
+    collection = FakeCollection("embeddings")
+    collection.insert_many = _dropping_connection(collection, applied=3)
+
+    def unreachable(*args, **kwargs):
+        raise AutoReconnect("still down")
+
+    collection.find = unreachable
+
+    inserted, failures = asyncio.run(ChunkWriter(collection).write(records(6)))
+    assert inserted == [] and len(failures) == 6
+    assert "Could not check which chunks were written" in capsys.readouterr().out
@@ -0,0 +1,63 @@
+import pytest
+
+from backend.calculate_cost import CostProjection
+from backend.context_packer import ContextPacker
+
+
+@pytest.fixture
+def packer(monkeypatch):
+    """One token per word, so the budget arithmetic does not depend on the tokenizer being available"""
+    cost = CostProjection(default_model="gpt-4o-mini")
+    monkeypatch.setattr(cost, "calculate_token", lambda text, model=None: len((text or "").split()))
+    monkeypatch.setattr(cost, "count_tokens_batch", lambda texts, model=None: [len(t.split()) for t in texts])
+    monkeypatch.setattr(cost, "truncate_to_tokens", lambda text, max_tokens, model=None: " ".join(text.split()[:max_tokens]))
+
+    def make(budget, min_chunk_tokens=3):
+        return ContextPacker("gpt-4o-mini", budget=budget, min_chunk_tokens=min_chunk_tokens, cost=cost)
+
+    return make
+
+
+def words(count: int, word: str = "w") -> str:
+    return " ".join([word] * count)
+
+
+def test_everything_fits(packer):
+    result = packer(100).pack([words(10)], words(5), [{"content": words(20)}, {"content": words(20)}], words(8))
+    report = result["report"]
+    assert len(result["chunks"]) == 2 and result["history"] == words(8)
+    assert report["total_tokens"] == 10 + 5 + 2 * 21 + 8
+    assert report["chunks_dropped"] == 0 and report["chunks_truncated"] == 0
+
+
+def test_last_chunk_that_does_not_fit_is_truncated_and_the_rest_dropped(packer):
+    chunks = [{"content": words(20, "a")}, {"content": words(20, "b")}, {"content": words(20, "c")}]
+    result = packer(50).pack([words(10)], words(5), chunks, words(8))
+    report = result["report"]
+    # 35 tokens left: the first chunk takes 21, the second is cut to 13 words (+1 separator)
+    assert [c["content"] for c in result["chunks"]] == [words(20, "a"), words(13, "b")]
+    assert result["chunks"][1]["truncated"] is True
+    assert report["chunks_truncated"] == 1 and report["chunks_dropped"] == 1
+    assert result["history"] == "" and report["total_tokens"] == 50
+
+
+def test_too_small_a_remainder_drops_the_chunk_instead(packer):
+    chunks = [{"content": words(20, "a")}, {"content": words(20, "b")}]
+    result = packer(38, min_chunk_tokens=5).pack([words(10)], words(5), chunks, "")
+    # 2 tokens left after the first chunk, under min_chunk_tokens
+    assert [c["content"] for c in result["chunks"]] == [words(20, "a")]
+    assert result["report"]["chunks_truncated"] == 0 and result["report"]["chunks_dropped"] == 1
+
+
+def test_history_gets_what_is_left(packer):
+    result = packer(40).pack([words(10)], words(5), [{"content": words(10)}], words(30, "h"))
+    assert result["history"] == words(14, "h")
+    assert result["report"]["total_tokens"] == 40
+
+
+def test_budget_comes_from_the_environment_or_the_model(monkeypatch):
+    monkeypatch.delenv("PROMPT_TOKEN_BUDGET", raising=False)
+    assert ContextPacker("gpt-5").budget == 8000
+    assert ContextPacker("unknown-model").budget == 6000
+    monkeypatch.setenv("PROMPT_TOKEN_BUDGET", "3000")
+    assert ContextPacker("gpt-5").budget == 3000
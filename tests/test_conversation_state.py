@@ -0,0 +1,25 @@
+import asyncio
+import json
+
+
+def test_overlapping_updates_fold_every_turn(api, monkeypatch):
+    async def slow_update(self, previous_state, user_message, assistant_message):
+        facts = json.loads(previous_state)["facts"] if previous_state else []
+        # The first update is the slower one, so without serializing the second would start from no state
+        await asyncio.sleep(0.05 if user_message == "first" else 0.01)
+        return json.dumps({"facts": facts + [user_message]})
+
+    monkeypatch.setattr(api.Prompts, "update_conversation_state", slow_update)
+
+    async def run():
+        await api.db.conversations.insert_one({"conversation_id": "state-race", "user_id": "u1", "message_count": 4})
+        await asyncio.gather(
+            api.refresh_conversation_state("state-race", "first", "answer", 2),
+            api.refresh_conversation_state("state-race", "second", "answer", 4),
+        )
+        return await api.db.conversations.find_one({"conversation_id": "state-race"})
+
+    conversation = asyncio.run(run())
+    assert json.loads(conversation["conversation_state"]) == {"facts": ["first", "second"]}
+    assert conversation["conversation_state_turn"] == 4
+    assert "state-race" not in api.conversation_state_locks
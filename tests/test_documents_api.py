@@ -0,0 +1,26 @@
+import asyncio
+
+from benchmarks.samples import sample_document
+
+
+def test_delete_is_refused_while_ingestion_runs(api, running_app, wait_for_ingestion):
+    async def run():
+        # Slow embeddings keep the job running while the delete comes in
+        async with running_app(embedding_latency=0.2) as http:
+            response = await http.post("/upload-document",
+                                       files={"file": ("guide.txt", sample_document(".txt", size=8, variant=101))})
+            document_id = response.json()["document_id"]
+
+            refused = await http.delete(f"/documents/{document_id}")
+            await wait_for_ingestion(http, document_id)
+            deleted = await http.delete(f"/documents/{document_id}")
+            missing = await http.delete(f"/documents/{document_id}")
+            leftover = await api.db.embeddings.count_documents({"document_id": document_id})
+            lexical = api.lexical_index.search("lessee", limit=1000, filters={"document_id": document_id})
+            return refused, deleted, missing, leftover, lexical
+
+    refused, deleted, missing, leftover, lexical = asyncio.run(run())
+    assert refused.status_code == 409
+    assert deleted.status_code == 200 and deleted.json()["deleted_chunks"] > 0
+    assert missing.status_code == 404
+    assert leftover == 0 and lexical == []
@@ -0,0 +1,85 @@
+import asyncio
+
+from benchmarks.fake_mongo import FakeCollection
+from backend.embedding_cache import EmbeddingCache, cache_key
+
+MODEL = "text-embedding-3-small"
+
+
+def test_keys_ignore_whitespace_differences_but_not_the_model():
+    assert cache_key("lease  payment\n", MODEL) == cache_key(" lease payment", MODEL)
+    assert cache_key("lease payment", MODEL) != cache_key("lease payment", "text-embedding-3-large")
+
+
+def test_lookups_go_through_memory_then_mongo():
+    collection = FakeCollection("embedding_cache")
+    writer = EmbeddingCache(collection=collection)
+    reader = EmbeddingCache(collection=collection)
+
+    async def run():
+        await writer.put_many(["vat rate"], MODEL, [[0.5, 0.25]])
+        # A second worker with an empty memory tier
+        first = await reader.get_many(["vat rate", "unknown"], MODEL)
+        second = await reader.get_many(["vat  rate"], MODEL)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == [[0.5, 0.25], None]
+    assert second == [[0.5, 0.25]]
+    assert (reader.mongo_hits, reader.memory_hits, reader.misses) == (1, 1, 1)
+
+
+def test_memory_tier_is_bounded():
+    cache = EmbeddingCache(max_entries=2)
+
+    async def run():
+        await cache.put_many(["a", "b", "c"], MODEL, [[1.0], [2.0], [3.0]])
+        return await cache.get_many(["a", "b", "c"], MODEL)
+
+    assert asyncio.run(run()) == [None, [2.0], [3.0]]
+
+
+def test_duplicate_writes_from_concurrent_workers_are_ignored(capsys):
+    collection = FakeCollection("embedding_cache")
+    cache = EmbeddingCache(collection=collection)
+
+    async def run():
+        await cache.put_many(["vat rate"], MODEL, [[1.0]])
+        await cache.put_many(["vat rate", "lease"], MODEL, [[1.0], [2.0]])
+        return await collection.count_documents({})
+
+    assert asyncio.run(run()) == 2
+    assert "write failed" not in capsys.readouterr().out
+
+
+def test_ttl_index_follows_the_retention_field():
+    queries = EmbeddingCache(collection=FakeCollection("embedding_cache"), ttl_days=30)
+    chunks = EmbeddingCache(collection=FakeCollection("chunk_embedding_store"), ttl_days=1, touch_on_hit=True)
+    forever = EmbeddingCache(collection=FakeCollection("forever"), ttl_days=0)
+
+    async def run():
+        for cache in (queries, chunks, forever):
+            await cache.ensure_indexes()
+
+    asyncio.run(run())
+    assert queries.collection.indexes == {"created_at": {"expireAfterSeconds": 30 * 86400}}
+    assert chunks.collection.indexes == {"last_used_at": {"expireAfterSeconds": 86400}}
+    assert forever.collection.indexes == {}
+
+
+def test_lookups_keep_store_entries_alive():
+    from datetime import datetime, timezone
+
+    collection = FakeCollection("chunk_embedding_store")
+    store = EmbeddingCache(collection=collection, touch_on_hit=True)
+    old = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+    async def run():
+        await store.put_many(["clause", "annex"], MODEL, [[1.0], [2.0]])
+        await collection.update_many({}, {"$set": {"last_used_at": old}})
+        await EmbeddingCache(collection=collection, touch_on_hit=True).get_many(["clause"], MODEL)
+        return {doc["_id"]: doc["last_used_at"] async for doc in collection.find({})}
+
+    used = asyncio.run(run())
+    assert used[cache_key("clause", MODEL)] > old
+    assert used[cache_key("annex", MODEL)] == old
@@ -0,0 +1,56 @@
+import pytest
+
+from backend import embedding_executor
+from backend.embedding_executor import EmbeddingExecutor
+
+
+@pytest.fixture(autouse=True)
+def word_tokens(monkeypatch):
+    """One token per word, so batch boundaries do not depend on the tokenizer being available"""
+    monkeypatch.setattr(embedding_executor.cost, "count_tokens_batch",
+                        lambda texts, model=None: [len(text.split()) for text in texts])
+    monkeypatch.setattr(embedding_executor.cost, "truncate_to_tokens",
+                        lambda text, max_tokens, model=None: " ".join(text.split()[:max_tokens]))
+
+
+def _executor(batch_tokens=10, max_inputs=100, max_input_tokens=8191):
+    executor = EmbeddingExecutor(batch_tokens=batch_tokens, max_inputs=max_inputs)
+    executor.max_input_tokens = max_input_tokens
+    return executor
+
+
+def test_batches_are_packed_by_token_budget():
+    texts = ["a b c d"] * 5  # 4 tokens each
+    planned, batches, total = _executor(batch_tokens=10).plan_batches(texts)
+    assert planned == texts
+    assert batches == [(0, 2), (2, 4), (4, 5)]
+    assert total == 20
+
+
+def test_batches_respect_input_limit():
+    _, batches, _ = _executor(batch_tokens=1000, max_inputs=2).plan_batches(["a"] * 5)
+    assert batches == [(0, 2), (2, 4), (4, 5)]
+
+
+def test_oversized_text_gets_a_batch_of_its_own():
+    texts = ["a", "a " * 30, "a"]
+    _, batches, _ = _executor(batch_tokens=10).plan_batches(texts)
+    assert batches == [(0, 1), (1, 2), (2, 3)]
+
+
+def test_texts_over_the_model_limit_are_truncated():
+    planned, batches, total = _executor(batch_tokens=100, max_input_tokens=5).plan_batches(["w " * 8, "x y"])
+    assert planned == ["w w w w w", "x y"]
+    assert batches == [(0, 2)]
+    assert total == 7
+
+
+def test_batches_cover_every_text_in_order():
+    texts = [" ".join(["t"] * (i % 7 + 1)) for i in range(50)]
+    _, batches, _ = _executor(batch_tokens=12, max_inputs=4).plan_batches(texts)
+    assert batches[0][0] == 0 and batches[-1][1] == len(texts)
+    assert all(end == next_start for (_, end), (next_start, _) in zip(batches, batches[1:]))
+
+
+def test_no_texts():
+    assert _executor().plan_batches([]) == ([], [], 0)
@@ -0,0 +1,145 @@
+import asyncio
+
+import pytest
+
+from backend.ingestion_queue import JobProgress, progress_percentage
+
+
+def _processing(stage, **progress):
+    return {"status": "processing", "stage": stage, "progress": progress}
+
+
+@pytest.mark.parametrize("status, expected", [("ready", 100), ("processing_index", 90), ("error", 0)])
+def test_terminal_statuses(status, expected):
+    assert progress_percentage({"status": status}) == expected
+
+
+def test_parsing_covers_the_first_fifth():
+    assert progress_percentage(_processing("parsing", pages_parsed=0, pages_total=10)) == 0
+    assert progress_percentage(_processing("parsing", pages_parsed=5, pages_total=10)) == 10
+    assert progress_percentage(_processing("parsing", pages_parsed=10, pages_total=10)) == 20
+    # Non-PDF files have no page count
+    assert progress_percentage(_processing("parsing", pages_parsed=None, pages_total=None)) == 0
+
+
+def test_embedding_averages_embedded_and_inserted():
+    document = _processing("embedding", chunks_total=100, chunks_embedded=100, chunks_inserted=0)
+    assert progress_percentage(document) == 55
+    document["progress"]["chunks_inserted"] = 100
+    assert progress_percentage(document) == 90
+
+
+@pytest.mark.parametrize("stage", ["indexing", "swapping"])
+def test_stages_without_counters(stage):
+    assert progress_percentage(_processing(stage)) == 90
+
+
+def test_unknown_stage_keeps_last_percentage():
+    assert progress_percentage(_processing("starting", percent=55)) == 55
+    assert progress_percentage(_processing("queued")) == 0
+
+
+class _Documents:
+    def __init__(self):
+        self.updates = []
+
+    async def update_one(self, query, update):
+        self.updates.append(update["$set"])
+
+
+def test_job_progress_records_percentage():
+    documents = _Documents()
+    progress = JobProgress(documents, "doc")
+
+    async def run():
+        await progress.update("embedding", chunks_total=10, chunks_embedded=10, chunks_inserted=10)
+        await progress.update("indexing")
+        await progress.update("retrying")
+
+    asyncio.run(run())
+    assert documents.updates[0]["stage"] == "embedding"
+    assert documents.updates[0]["progress.percent"] == 90
+    # Unchanged percentages are not written again
+    assert "progress.percent" not in documents.updates[1]
+    assert "progress.percent" not in documents.updates[2]
+
+
+def _queue_with_jobs(tmp_path, jobs, **settings):
+    from datetime import datetime, timedelta, timezone
+
+    from benchmarks.fake_mongo import FakeCollection
+    from backend.ingestion_queue import IngestionQueue
+
+    queue = IngestionQueue(workers=1, spool_dir=str(tmp_path))
+    for name, value in settings.items():
+        setattr(queue, name, value)
+    documents = FakeCollection("documents")
+    stale = datetime.now(timezone.utc) - timedelta(seconds=queue.stale_after * 2)
+    records = []
+    for job_id, fields in jobs.items():
+        spool_path = queue.spool_path(job_id, ".txt")
+        with open(spool_path, "w") as f:
+            f.write("text")
+        records.append({"document_id": job_id, "job_id": job_id, "status": "processing", "stage": "parsing",
+                        "heartbeat_at": stale, "spool_path": spool_path, "attempts": 1, **fields})
+    return queue, documents, records
+
+
+def test_stale_jobs_are_recovered_while_running(tmp_path):
+    queue, documents, records = _queue_with_jobs(tmp_path, {"crashed": {}}, recover_every=0.01)
+    handled = []
+
+    async def handler(job):
+        handled.append(job["job_id"])
+
+    async def run():
+        await queue.start(documents, handler)
+        # The job's worker process dies after startup recovery already ran
+        await documents.insert_many(records)
+        for _ in range(100):
+            if handled:
+                break
+            await asyncio.sleep(0.01)
+        await queue.stop()
+
+    asyncio.run(run())
+    assert handled == ["crashed"]
+
+
+def test_recovery_skips_jobs_already_queued_here(tmp_path):
+    queue, documents, records = _queue_with_jobs(tmp_path, {"queued": {"stage": "queued"}})
+
+    async def run():
+        await documents.insert_many(records)
+        queue.documents = documents
+        queue._queue = asyncio.Queue()
+        await queue.submit(records[0])
+        await queue.recover()
+        return queue._queue.qsize()
+
+    assert asyncio.run(run()) == 1
+
+
+def test_exhausted_jobs_fail_and_drop_their_upload(tmp_path):
+    queue, documents, records = _queue_with_jobs(tmp_path, {
+        "upload": {},
+        "replace": {"mode": "replace", "previous_status": "ready", "replacement_filename": "new.txt"},
+    }, max_attempts=1)
+    handled = []
+
+    async def handler(job):
+        handled.append(job["job_id"])
+
+    async def run():
+        await documents.insert_many(records)
+        await queue.start(documents, handler)
+        await queue._queue.join()
+        await queue.stop()
+        return {job_id: await documents.find_one({"job_id": job_id}) for job_id in ("upload", "replace")}
+
+    results = asyncio.run(run())
+    assert handled == []
+    assert results["upload"]["status"] == "error"
+    assert results["replace"]["status"] == "ready" and results["replace"]["stage"] == "replace_failed"
+    assert "mode" not in results["replace"]
+    assert list(tmp_path.iterdir()) == []
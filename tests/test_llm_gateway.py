@@ -0,0 +1,42 @@
+import asyncio
+import time
+
+from benchmarks.fake_openai import FakeOpenAI
+from backend.llm_gateway import LLMGateway
+
+
+def test_open_streams_do_not_hold_back_other_calls():
+    gateway = LLMGateway(max_concurrency=1, max_streams=1)
+    gateway._client = FakeOpenAI(chat_latency=0, token_latency=0.01, embedding_latency=0, answer_tokens=20)
+
+    async def consume_stream():
+        async for _ in gateway.chat_stream(model="gpt-4o-mini", messages=[{"role": "user", "content": "VAT?"}]):
+            pass
+        return time.perf_counter()
+
+    async def run():
+        stream = asyncio.create_task(consume_stream())
+        await asyncio.sleep(0.02)
+        vectors = await gateway.embed(["lease"])
+        embedded = time.perf_counter()
+        return vectors, embedded, await stream
+
+    vectors, embedded, stream_done = asyncio.run(run())
+    assert len(vectors) == 1
+    assert embedded < stream_done
+
+
+def test_streams_are_bounded_by_their_own_limit():
+    gateway = LLMGateway(max_streams=1)
+    gateway._client = FakeOpenAI(chat_latency=0, token_latency=0.01, answer_tokens=5)
+    order = []
+
+    async def consume_stream(name):
+        async for _ in gateway.chat_stream(model="gpt-4o-mini", messages=[{"role": "user", "content": "VAT?"}]):
+            order.append(name)
+
+    async def run():
+        await asyncio.gather(consume_stream("first"), consume_stream("second"))
+
+    asyncio.run(run())
+    assert order == ["first"] * 5 + ["second"] * 5
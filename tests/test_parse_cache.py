@@ -0,0 +1,58 @@
+import os
+
+from langchain_core.documents import Document
+
+from backend.parse_cache import ParseCache, file_sha256
+
+SETTINGS = {"chunk_size": 500, "chunk_overlap": 100}
+
+
+def make_cache(tmp_path, max_bytes=1024 * 1024):
+    cache = ParseCache(directory=str(tmp_path), max_bytes=max_bytes)
+    cache.enabled = True
+    return cache
+
+
+def test_hit_returns_the_stored_chunks(tmp_path):
+    cache = make_cache(tmp_path)
+    key = cache.key("abc", ".pdf", SETTINGS)
+    assert cache.get(key) is None
+
+    cache.put(key, [Document(page_content="Madde 1 — Kira bedeli", metadata={"page": 1, "source": "a.pdf"})])
+    documents = cache.get(key)
+    assert [(d.page_content, d.metadata) for d in documents] == [("Madde 1 — Kira bedeli", {"page": 1, "source": "a.pdf"})]
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_key_depends_on_content_and_settings(tmp_path):
+    cache = make_cache(tmp_path)
+    key = cache.key("abc", ".pdf", SETTINGS)
+    assert key == cache.key("abc", ".pdf", dict(reversed(list(SETTINGS.items()))))
+    assert key != cache.key("abd", ".pdf", SETTINGS)
+    assert key != cache.key("abc", ".pdf", {**SETTINGS, "chunk_size": 800})
+    assert key != cache.key("abc", ".txt", SETTINGS)
+
+
+def test_file_hash_matches_content(tmp_path):
+    first, second = tmp_path / "a.txt", tmp_path / "b.txt"
+    first.write_bytes(b"lease")
+    second.write_bytes(b"lease")
+    assert file_sha256(str(first), block_size=2) == file_sha256(str(second))
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = make_cache(tmp_path)
+    keys = [cache.key(str(i), ".txt", SETTINGS) for i in range(3)]
+    # Random text, so gzip cannot shrink the entries and their sizes are predictable
+    payload = [Document(page_content=os.urandom(3000).hex(), metadata={})]
+    for age, key in enumerate(keys):
+        cache.put(key, payload)
+        os.utime(cache._path(key), (1000 + age, 1000 + age))
+    entry_size = os.path.getsize(cache._path(keys[0]))
+
+    cache.get(keys[0])  # recently used again
+    cache.max_bytes = int(entry_size * 2.5)
+    cache.put(cache.key("3", ".txt", SETTINGS), payload)
+
+    remaining = {name.split(".")[0] for name in os.listdir(tmp_path)}
+    assert remaining == {keys[0], cache.key("3", ".txt", SETTINGS)}
@@ -0,0 +1,73 @@
+import asyncio
+import uuid
+
+from langchain_core.documents import Document
+
+from backend.embedding_cache import cache_key
+
+MODEL = "text-embedding-3-small"
+
+
+def _stored(document_id, contents, hashed=True):
+    return [{
+        "_id": f"{document_id}-{i}",
+        "document_id": document_id,
+        "content": content,
+        "metadata": {"page_number": i + 1},
+        **({"content_hash": cache_key(content, MODEL)} if hashed else {}),
+    } for i, content in enumerate(contents)]
+
+
+def _diff(api, stored, new_contents):
+    document_id = stored[0]["document_id"] if stored else str(uuid.uuid4())
+    chunks = [Document(page_content=content, metadata={"page_number": i + 1})
+              for i, content in enumerate(new_contents)]
+
+    async def run():
+        if stored:
+            await api.db.embeddings.insert_many(stored)
+        return await api.diff_document_chunks(document_id, chunks, MODEL)
+
+    return asyncio.run(run())
+
+
+def test_only_changed_chunks_are_added_and_removed(api):
+    stored = _stored(str(uuid.uuid4()), ["alpha", "beta", "gamma"])
+    added, removed_ids, unchanged = _diff(api, stored, ["alpha", "delta", "gamma"])
+    assert [doc.page_content for doc in added] == ["delta"]
+    assert removed_ids == [stored[1]["_id"]]
+    assert [(old["_id"], new.page_content) for old, new in unchanged] == [
+        (stored[0]["_id"], "alpha"), (stored[2]["_id"], "gamma")]
+
+
+def test_repeated_chunks_match_one_to_one(api):
+    stored = _stored(str(uuid.uuid4()), ["same", "same", "same"])
+    added, removed_ids, unchanged = _diff(api, stored, ["same", "same"])
+    assert added == []
+    assert removed_ids == [stored[2]["_id"]]
+    assert len(unchanged) == 2
+
+    stored = _stored(str(uuid.uuid4()), ["same"])
+    added, removed_ids, _ = _diff(api, stored, ["same", "same"])
+    assert [doc.page_content for doc in added] == ["same"]
+    assert removed_ids == []
+
+
+def test_unchanged_chunks_carry_the_new_metadata(api):
+    stored = _stored(str(uuid.uuid4()), ["intro", "body"])
+    _, _, unchanged = _diff(api, stored, ["preface", "intro", "body"])
+    assert [(old["metadata"]["page_number"], new.metadata["page_number"]) for old, new in unchanged] == [(1, 2), (2, 3)]
+
+
+def test_chunks_without_content_hash_are_hashed_on_the_fly(api):
+    stored = _stored(str(uuid.uuid4()), ["legacy", "old"], hashed=False)
+    added, removed_ids, unchanged = _diff(api, stored, ["legacy"])
+    assert added == []
+    assert removed_ids == [stored[1]["_id"]]
+    assert [old["_id"] for old, _ in unchanged] == [stored[0]["_id"]]
+
+
+def test_new_document_adds_everything(api):
+    added, removed_ids, unchanged = _diff(api, [], ["one", "two"])
+    assert [doc.page_content for doc in added] == ["one", "two"]
+    assert removed_ids == [] and unchanged == []
@@ -0,0 +1,35 @@
+import numpy as np
+
+from backend.reranker import mmr_order
+
+
+def _unit(rows):
+    rows = np.asarray(rows, dtype=np.float32)
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+
+def test_pure_relevance_keeps_score_order():
+    relevance = np.array([0.2, 0.9, 0.5], dtype=np.float32)
+    vectors = _unit([[1, 0], [1, 0], [1, 0]])
+    assert mmr_order(relevance, vectors, k=3, lambda_mult=1.0) == [1, 2, 0]
+
+
+def test_near_duplicate_is_pushed_down():
+    relevance = np.array([0.9, 0.89, 0.7], dtype=np.float32)
+    # 0 and 1 are the same direction, 2 is orthogonal
+    vectors = _unit([[1, 0], [1, 0.01], [0, 1]])
+    assert mmr_order(relevance, vectors, k=3, lambda_mult=0.7) == [0, 2, 1]
+
+
+def test_candidates_without_vectors_count_as_novel():
+    relevance = np.array([0.9, 0.8, 0.7], dtype=np.float32)
+    vectors = np.zeros((3, 2), dtype=np.float32)
+    vectors[:2] = _unit([[1, 0], [1, 0]])
+    assert mmr_order(relevance, vectors, k=3, lambda_mult=0.5)[:2] == [0, 2]
+
+
+def test_k_is_capped_at_candidate_count():
+    relevance = np.array([0.5, 0.4], dtype=np.float32)
+    vectors = _unit([[1, 0], [0, 1]])
+    assert sorted(mmr_order(relevance, vectors, k=10)) == [0, 1]
+    assert mmr_order(relevance[:0], vectors[:0], k=5) == []
@@ -0,0 +1,34 @@
+import pytest
+
+from backend.retriever import reciprocal_rank_fusion
+
+
+def test_rrf_scores_sum_over_lists():
+    merged = reciprocal_rank_fusion([
+        [{"_id": "a"}, {"_id": "b"}],
+        [{"_id": "b"}, {"_id": "c"}],
+    ], k=60)
+    assert [doc["_id"] for doc in merged] == ["b", "a", "c"]
+    assert merged[0]["rrf_score"] == pytest.approx(1 / 62 + 1 / 61)
+    assert merged[1]["rrf_score"] == pytest.approx(1 / 61)
+
+
+def test_rrf_keeps_first_copy_of_duplicates():
+    first = {"_id": "a", "score": 0.9}
+    merged = reciprocal_rank_fusion([[first], [{"_id": "a", "score": 0.1}]])
+    assert len(merged) == 1
+    assert merged[0]["score"] == 0.9
+    # The input documents are not modified
+    assert "rrf_score" not in first
+
+
+def test_rrf_compares_keys_as_strings():
+    from bson import ObjectId
+    oid = ObjectId()
+    merged = reciprocal_rank_fusion([[{"_id": oid}], [{"_id": str(oid)}]])
+    assert len(merged) == 1
+
+
+def test_rrf_empty():
+    assert reciprocal_rank_fusion([]) == []
+    assert reciprocal_rank_fusion([[], []]) == []
@@ -0,0 +1,67 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI, File, UploadFile
+
+
+@pytest.fixture
+def limited_app(api):
+    """A small app behind UploadLimitMiddleware with a 1000 byte limit"""
+    app = FastAPI()
+    seen = []
+
+    @app.post("/upload-document")
+    async def upload(file: UploadFile = File(...)):
+        seen.append(file.filename)
+        return {"size": len(await file.read())}
+
+    @app.post("/echo")
+    async def echo(file: UploadFile = File(...)):
+        return {"size": len(await file.read())}
+
+    app.add_middleware(api.UploadLimitMiddleware, max_bytes=1000)
+    return app, seen
+
+
+def post(app, path, **kwargs):
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http:
+            return await http.post(path, **kwargs)
+
+    return asyncio.run(run())
+
+
+def test_small_upload_passes(limited_app):
+    app, seen = limited_app
+    response = post(app, "/upload-document", files={"file": ("a.txt", b"x" * 500)})
+    assert response.status_code == 200 and response.json() == {"size": 500}
+    assert seen == ["a.txt"]
+
+
+def test_declared_length_over_the_limit_is_refused_before_the_route(limited_app):
+    app, seen = limited_app
+    response = post(app, "/upload-document", files={"file": ("a.txt", b"x" * 5000)})
+    assert response.status_code == 413 and "File too large" in response.json()["detail"]
+    assert seen == []
+
+
+def test_streamed_body_is_cut_off_once_over_the_limit(limited_app):
+    app, seen = limited_app
+
+    async def body():
+        # Chunked transfer, so no Content-Length to check up front
+        yield b'--zz\r\nContent-Disposition: form-data; name="file"; filename="a.txt"\r\n\r\n'
+        for _ in range(20):
+            yield b"y" * 400
+
+    response = post(app, "/upload-document", content=body(),
+                    headers={"content-type": "multipart/form-data; boundary=zz"})
+    assert response.status_code == 413
+    assert seen == []
+
+
+def test_other_routes_are_not_limited(limited_app):
+    app, _ = limited_app
+    response = post(app, "/echo", files={"file": ("a.txt", b"x" * 5000)})
+    assert response.status_code == 200 and response.json() == {"size": 5000}
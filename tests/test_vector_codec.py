@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from backend.vector_codec import FORMATS, check_backend_format, decode_record, encode_embedding
+
+
+@pytest.fixture
+def vector():
+    return np.random.default_rng(0).standard_normal(1536).astype(np.float32)
+
+
+def _cosine(a, b):
+    return float(a @ b / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+
+@pytest.mark.parametrize("fmt", ["double", "float32"])
+def test_lossless_formats_round_trip(vector, fmt):
+    record = encode_embedding(vector, fmt)
+    assert record["embedding_format"] == fmt
+    np.testing.assert_array_equal(decode_record(record), vector)
+
+
+def test_int8_round_trip_keeps_direction(vector):
+    record = encode_embedding(vector, "int8")
+    assert record["embedding_scale"] > 0
+    decoded = decode_record(record)
+    assert decoded.dtype == np.float32
+    assert _cosine(decoded, vector) > 0.999
+    np.testing.assert_allclose(decoded, vector, atol=record["embedding_scale"])
+
+
+def test_float16_round_trip(vector):
+    decoded = decode_record(encode_embedding(vector, "float16"))
+    np.testing.assert_allclose(decoded, vector, rtol=1e-3, atol=1e-3)
+
+
+def test_int8_zero_vector():
+    record = encode_embedding(np.zeros(8), "int8")
+    np.testing.assert_array_equal(decode_record(record), np.zeros(8, dtype=np.float32))
+
+
+def test_legacy_list_without_format(vector):
+    decoded = decode_record({"embedding": vector.astype(np.float64).tolist()})
+    np.testing.assert_allclose(decoded, vector)
+
+
+def test_default_format_comes_from_environment(vector, monkeypatch):
+    monkeypatch.setenv("EMBEDDING_STORAGE_FORMAT", "int8")
+    assert encode_embedding(vector)["embedding_format"] == "int8"
+    monkeypatch.setenv("EMBEDDING_STORAGE_FORMAT", "bogus")
+    assert encode_embedding(vector)["embedding_format"] == "float32"
+
+
+def test_unknown_format_is_rejected(vector):
+    with pytest.raises(ValueError):
+        encode_embedding(vector, "bfloat16")
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_only_float16_is_refused_for_atlas(fmt):
+    if fmt == "float16":
+        with pytest.raises(ValueError):
+            check_backend_format("atlas", fmt)
+    else:
+        check_backend_format("atlas", fmt)
+    check_backend_format("local", fmt)
+    check_backend_format("ivf", fmt)
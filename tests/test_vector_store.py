@@ -0,0 +1,176 @@
+import asyncio
+import os
+
+import numpy as np
+
+from benchmarks.fake_mongo import FakeCollection
+from backend.vector_codec import encode_embedding
+from backend.vector_store import LocalVectorBackend
+
+DIM = 8
+
+
+def chunk_records(document_id: str, count: int, seed: int) -> list[dict]:
+    rng = np.random.default_rng(seed)
+    return [{"_id": f"{document_id}-{i}", "document_id": document_id, "user_id": "u1", "content": f"chunk {i}",
+             "metadata": {"page": i}, **encode_embedding(rng.standard_normal(DIM).tolist(), "float32")}
+            for i in range(count)]
+
+
+async def stored(collection, backend, records):
+    await collection.insert_many(records)
+    await backend.add(records)
+
+
+def top_ids(backend, query, limit=5, **options):
+    return [hit["_id"] for hit in asyncio.run(backend.search(query, limit, **options))]
+
+
+def test_changes_are_journaled_and_replayed_on_reload(tmp_path):
+    collection = FakeCollection("embeddings")
+    backend = LocalVectorBackend(collection, path=str(tmp_path), dim=DIM)
+    query = np.random.default_rng(99).standard_normal(DIM).tolist()
+
+    async def run():
+        await backend.load()
+        await stored(collection, backend, chunk_records("a", 20, 1))
+        await stored(collection, backend, chunk_records("b", 20, 2))
+        await backend.remove(document_id="a")
+        await collection.delete_many({"document_id": "a"})
+        await backend.update_metadata({"b-3": {"page": 3, "title": "renamed"}})
+
+    asyncio.run(run())
+    assert os.path.exists(tmp_path / "journal.pkl")
+
+    reloaded = LocalVectorBackend(collection, path=str(tmp_path), dim=DIM)
+    asyncio.run(reloaded.load())
+    assert top_ids(reloaded, query, 10) == top_ids(backend, query, 10)
+    assert reloaded.stats()["vectors"] == 20 and reloaded.stats()["tombstones"] == 20
+    metadata = {hit["_id"]: hit["metadata"] for hit in asyncio.run(reloaded.search(query, 40))}
+    assert metadata["b-3"] == {"page": 3, "title": "renamed"}
+    assert not any(chunk_id.startswith("a-") for chunk_id in metadata)
+
+
+def test_tombstones_are_compacted_into_a_new_snapshot(tmp_path):
+    collection = FakeCollection("embeddings")
+    backend = LocalVectorBackend(collection, path=str(tmp_path), dim=DIM)
+    query = np.random.default_rng(7).standard_normal(DIM).tolist()
+
+    async def run():
+        await backend.load()
+        await stored(collection, backend, chunk_records("big", 1500, 3))
+        await stored(collection, backend, chunk_records("small", 100, 4))
+        await backend.remove(document_id="big")
+        await collection.delete_many({"document_id": "big"})
+
+    asyncio.run(run())
+    assert backend.stats()["tombstones"] == 0 and backend.stats()["vectors"] == 100
+    assert not os.path.exists(tmp_path / "journal.pkl")
+    assert len([name for name in os.listdir(tmp_path) if name.endswith(".f32")]) == 1
+
+    reloaded = LocalVectorBackend(collection, path=str(tmp_path), dim=DIM)
+    asyncio.run(reloaded.load())
+    assert top_ids(reloaded, query) == top_ids(backend, query)
+
+
+def test_stale_snapshot_is_rebuilt_from_mongo(tmp_path):
+    collection = FakeCollection("embeddings")
+    backend = LocalVectorBackend(collection, path=str(tmp_path), dim=DIM)
+
+    async def run():
+        await backend.load()
+        await stored(collection, backend, chunk_records("a", 10, 5))
+        # Another worker wrote chunks this snapshot never saw
+        await collection.insert_many(chunk_records("b", 5, 6))
+        reloaded = LocalVectorBackend(collection, path=str(tmp_path), dim=DIM)
+        await reloaded.load()
+        return reloaded
+
+    reloaded = asyncio.run(run())
+    assert reloaded.stats()["vectors"] == 15
+
+
+def test_filters_restrict_candidates(tmp_path):
+    collection = FakeCollection("embeddings")
+    backend = LocalVectorBackend(collection, path=str(tmp_path), dim=DIM)
+    query = np.random.default_rng(11).standard_normal(DIM).tolist()
+
+    async def run():
+        await backend.load()
+        await stored(collection, backend, chunk_records("a", 10, 8))
+        await stored(collection, backend, chunk_records("b", 10, 9))
+
+    asyncio.run(run())
+    hits = asyncio.run(backend.search(query, 5, filters={"document_id": "b"}))
+    assert len(hits) == 5 and {hit["document_id"] for hit in hits} == {"b"}
+
+
+def test_ivf_trains_in_the_background_and_keeps_rows_added_meanwhile(tmp_path):
+    from backend.vector_store import IVFVectorBackend
+
+    collection = FakeCollection("embeddings")
+    backend = IVFVectorBackend(collection, path=str(tmp_path), dim=DIM, nlist=8, train_min=200)
+    query = np.random.default_rng(12).standard_normal(DIM).tolist()
+
+    async def run():
+        await backend.load()
+        await stored(collection, backend, chunk_records("a", 150, 13))
+        untrained = backend._training is None and not backend.stats()["trained"]
+        await stored(collection, backend, chunk_records("b", 100, 14))
+        training = backend._training
+        # Written while the quantizer is being fitted in its thread
+        await stored(collection, backend, chunk_records("c", 30, 15))
+        await training
+        exact = await LocalVectorBackend.search(backend, query, 5)
+        approximate = await backend.search(query, 5, num_candidates=1000)
+        return untrained, training is not None, exact, approximate
+
+    untrained, scheduled, exact, approximate = asyncio.run(run())
+    assert untrained and scheduled
+    assert backend.stats()["trained"] and backend.stats()["cells"] == 8
+    assert (backend._assignments[:backend._size] >= 0).all()
+    # Probing every cell ranks the same as exact search
+    assert [hit["_id"] for hit in approximate] == [hit["_id"] for hit in exact]
+
+
+def test_ivf_reload_keeps_the_trained_quantizer(tmp_path):
+    from backend.vector_store import IVFVectorBackend
+
+    collection = FakeCollection("embeddings")
+    backend = IVFVectorBackend(collection, path=str(tmp_path), dim=DIM, nlist=8, train_min=100)
+    query = np.random.default_rng(16).standard_normal(DIM).tolist()
+
+    async def run():
+        await backend.load()
+        await stored(collection, backend, chunk_records("a", 120, 17))
+        await backend._training
+        await stored(collection, backend, chunk_records("b", 10, 18))
+        reloaded = IVFVectorBackend(collection, path=str(tmp_path), dim=DIM, nlist=8, train_min=100)
+        await reloaded.load()
+        return reloaded
+
+    reloaded = asyncio.run(run())
+    assert reloaded._training is None
+    assert np.array_equal(reloaded._centroids, backend._centroids)
+    assert np.array_equal(reloaded._assignments[:reloaded._size], backend._assignments[:backend._size])
+    assert top_ids(reloaded, query, num_candidates=50) == top_ids(backend, query, num_candidates=50)
+
+
+def test_ivf_retrains_after_the_corpus_grew(tmp_path):
+    from backend.vector_store import IVFVectorBackend
+
+    collection = FakeCollection("embeddings")
+    backend = IVFVectorBackend(collection, path=str(tmp_path), dim=DIM, nlist=8, train_min=50)
+
+    async def run():
+        await backend.load()
+        await stored(collection, backend, chunk_records("a", 60, 19))
+        await backend._training
+        first = backend._centroids
+        await stored(collection, backend, chunk_records("b", 200, 20))
+        await backend._training
+        return first
+
+    first = asyncio.run(run())
+    assert backend._trained_size == 260
+    assert not np.array_equal(first, backend._centroids)